@@ -1,6 +1,15 @@
-import pkg_resources
+from typing import Any
 
-# It is known that this will fail if package is not "installed" in the
-# current environment. Additional support is pending defined use-case-driven
-# requirements.
-__version__ = pkg_resources.get_distribution(__name__).version
+
+def __getattr__(name: str) -> Any:
+    # the version is looked up on first access, as importlib.metadata takes
+    # longer to import than the rest of the package
+    if name == "__version__":
+        from importlib.metadata import version
+
+        # It is known that this will fail if package is not "installed" in the
+        # current environment. Additional support is pending defined
+        # use-case-driven requirements.
+        globals()["__version__"] = version(__name__)
+        return globals()["__version__"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
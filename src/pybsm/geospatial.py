@@ -14,10 +14,9 @@ Public release approval for version 0.1: 88ABW-2018-5226
 Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
 # standard library imports
-import inspect
 import os
 import warnings
-from typing import Tuple
+from typing import Tuple, Union, overload
 
 # 3rd party imports
 import numpy as np
@@ -31,8 +30,7 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
 
 # define some useful physical constants
 r_earth = 6378.164e3  # radius of the earth (m)
@@ -101,7 +99,17 @@ def ground_sample_distance(ifov: float, slant_range: float) -> float:
     return gsd
 
 
-def nadir_angle(h_target: float, h_sensor: float, slant_range: float) -> float:
+@overload
+def nadir_angle(h_target: float, h_sensor: float, slant_range: float) -> float: ...
+
+
+@overload
+def nadir_angle(h_target: float, h_sensor: np.ndarray, slant_range: np.ndarray) -> np.ndarray: ...
+
+
+def nadir_angle(
+    h_target: float, h_sensor: Union[float, np.ndarray], slant_range: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
     """Work through the law of cosines to calculate the sensor nadir angle above a circular earth.
 
     Work through the law of cosines to calculate the sensor nadir angle above a
@@ -131,9 +139,17 @@ def nadir_angle(h_target: float, h_sensor: float, slant_range: float) -> float:
     return nadir
 
 
+@overload
+def curved_earth_slant_range(h_target: float, h_sensor: float, ground_range: float) -> float: ...
+
+
+@overload
+def curved_earth_slant_range(h_target: float, h_sensor: np.ndarray, ground_range: np.ndarray) -> np.ndarray: ...
+
+
 def curved_earth_slant_range(
-    h_target: float, h_sensor: float, ground_range: float
-) -> float:
+    h_target: float, h_sensor: Union[float, np.ndarray], ground_range: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
     """Returns the slant range from target to sensor above a curved (circular) Earth.
 
     :param h_target:
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Opt-in timing and memory instrumentation of the pyBSM processing stages.
+
+The atmosphere lookup, radiometry, OTF components, blur kernel, filtering,
+resampling, noise and the simulate_image, niirs and niirs5 entry points are
+wrapped in named stages.  While instrumentation is disabled (the default) a
+stage costs one global flag check; enable_instrumentation starts recording
+the wall time, and optionally the peak traced memory allocation, of every
+stage, aggregated per stage name across calls::
+
+    from pybsm import instrumentation
+
+    instrumentation.enable_instrumentation(track_memory=True)
+    ...  # run simulations
+    print(instrumentation.instrumentation_to_json(indent=2))
+
+Stages nest, so the time of a stage includes the time of the stages run
+inside it.  Memory is traced with tracemalloc, which slows allocation-heavy
+code down noticeably, and is shared by all threads, so the peak allocation
+of a stage also counts allocations made concurrently by other threads.
+
+Maintainer: Kitware, Inc. <nrtk@kitware.com>
+"""
+# standard library imports
+import contextlib
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar, cast
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# called with the stage name, its wall time (s) and its peak allocation
+# (bytes, None unless memory is tracked) whenever a stage completes
+StageCallback = Callable[[str, float, Optional[int]], None]
+
+_enabled = False
+_track_memory = False
+_started_tracemalloc = False
+_stats: Dict[str, Dict[str, float]] = {}
+_callbacks: List[StageCallback] = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Frame:
+    """Traced memory at the start of a running stage and the peak seen since."""
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.peak = start
+
+
+def enable_instrumentation(track_memory: bool = False) -> None:
+    """Starts recording the processing stages.
+
+    :param track_memory:
+        if True, also record the peak memory allocation of each stage using
+        tracemalloc, which is started if it is not already running
+    """
+    global _enabled, _track_memory, _started_tracemalloc
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _track_memory = track_memory
+    _enabled = True
+
+
+def disable_instrumentation() -> None:
+    """Stops recording the processing stages; the recorded statistics are kept."""
+    global _enabled, _track_memory, _started_tracemalloc
+    _enabled = False
+    _track_memory = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def instrumentation_enabled() -> bool:
+    """Returns True if the processing stages are being recorded."""
+    return _enabled
+
+
+def clear_instrumentation() -> None:
+    """Discards the recorded statistics."""
+    with _lock:
+        _stats.clear()
+
+
+def add_instrumentation_callback(callback: StageCallback) -> None:
+    """Registers a function called with the name, wall time (s) and peak allocation (bytes or None) of every stage.
+
+    Callbacks are only called while instrumentation is enabled, from the
+    thread that ran the stage.
+    """
+    with _lock:
+        _callbacks.append(callback)
+
+
+def remove_instrumentation_callback(callback: StageCallback) -> None:
+    """Unregisters a function registered with add_instrumentation_callback.
+
+    :raises:
+        ValueError:
+            if callback is not registered
+    """
+    with _lock:
+        _callbacks.remove(callback)
+
+
+def instrumentation_info() -> Dict[str, Dict[str, float]]:
+    """Returns the statistics recorded for each stage.
+
+    :return:
+        stats:
+            dictionary keyed on stage name whose values hold "calls", the
+            number of completed calls, "total_time", "min_time" and
+            "max_time", their wall times (s), and, if memory was tracked for
+            any call, "peak_memory", the largest peak allocation of a call
+            above the memory in use when it started (bytes)
+    """
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def instrumentation_to_json(indent: Optional[int] = None) -> str:
+    """Returns the statistics of instrumentation_info as a JSON string."""
+    return json.dumps(instrumentation_info(), indent=indent, sort_keys=True)
+
+
+def stage(name: str) -> "contextlib.AbstractContextManager[None]":
+    """Returns a context manager that records the code it wraps as the stage 'name'.
+
+    While instrumentation is disabled, a shared no-op context manager is
+    returned.
+    """
+    if not _enabled:
+        return _null_stage
+    return _stage(name)
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    """Decorator that records every call of the decorated function as the stage 'name'."""
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _stage(name):
+                return function(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+_null_stage = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def _stage(name: str) -> Iterator[None]:
+    frames = _frames()
+    frame = None
+    if _track_memory and tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak is reset for this stage, so the running stages take the
+        # peak reached so far first
+        for outer in frames:
+            outer.peak = max(outer.peak, peak)
+        tracemalloc.reset_peak()
+        frame = _Frame(current)
+        frames.append(frame)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        peak_memory = None
+        if frame is not None:
+            frames.remove(frame)
+            if tracemalloc.is_tracing():
+                frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            if frames:
+                frames[-1].peak = max(frames[-1].peak, frame.peak)
+            peak_memory = frame.peak - frame.start
+        _record(name, elapsed, peak_memory)
+
+
+def _frames() -> List[_Frame]:
+    """Returns the stages running in this thread whose memory is traced, outermost first."""
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def _record(name: str, elapsed: float, peak_memory: Optional[int]) -> None:
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {"calls": 0, "total_time": 0.0, "min_time": elapsed, "max_time": elapsed}
+        stats["calls"] += 1
+        stats["total_time"] += elapsed
+        stats["min_time"] = min(stats["min_time"], elapsed)
+        stats["max_time"] = max(stats["max_time"], elapsed)
+        if peak_memory is not None:
+            stats["peak_memory"] = max(stats.get("peak_memory", 0), peak_memory)
+        callbacks = list(_callbacks)
+
+    for callback in callbacks:
+        callback(name, elapsed, peak_memory)
@@ -15,12 +15,11 @@ Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
 
 # standard library imports
-import inspect
+import copy
+import functools
 import os
 import warnings
-from typing import Any, Optional, Tuple
-
-import matplotlib.pyplot as plt
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, overload
 
 # 3rd party imports
 import numpy as np
@@ -28,7 +27,7 @@ import numpy as np
 # local imports
 import pybsm.otf as otf
 import pybsm.radiance as radiance
-from pybsm import geospatial, noise, utils
+from pybsm import geospatial, instrumentation, noise, utils
 from pybsm.simulation import Scenario, Sensor
 
 from .metrics import Metrics
@@ -42,16 +41,36 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
+
+
+@overload
+def giqe3(rer: float, gsd: float, eho: float, ng: float, snr: float) -> float: ...
+
 
+@overload
+def giqe3(
+    rer: np.ndarray,
+    gsd: Union[float, np.ndarray],
+    eho: Union[float, np.ndarray],
+    ng: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+) -> np.ndarray: ...
 
-def giqe3(rer: float, gsd: float, eho: float, ng: float, snr: float) -> float:
+
+def giqe3(
+    rer: Union[float, np.ndarray],
+    gsd: Union[float, np.ndarray],
+    eho: Union[float, np.ndarray],
+    ng: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+) -> Union[float, np.ndarray]:
     """IBSM Equation 3-56.  The General Image Quality Equation version 3.0.
 
         The GIQE returns values on the National Image Interpretability Rating
         Scale. Note: geometric mean values are simply sqrt(value_x * value_y),
-        where x and y are orthogonal directions in the image.
+        where x and y are orthogonal directions in the image.  Arrays of
+        inputs are evaluated element-wise.
 
     :param rer:
         geometric mean relative edge response (unitless)
@@ -75,12 +94,34 @@ def giqe3(rer: float, gsd: float, eho: float, ng: float, snr: float) -> float:
     return niirs
 
 
-def giqe4(rer: float, gsd: float, eho: float, ng: float, snr: float, elev_angle: float) -> Tuple[float, float]:
+@overload
+def giqe4(rer: float, gsd: float, eho: float, ng: float, snr: float, elev_angle: float) -> Tuple[float, float]: ...
+
+
+@overload
+def giqe4(
+    rer: np.ndarray,
+    gsd: Union[float, np.ndarray],
+    eho: Union[float, np.ndarray],
+    ng: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+    elev_angle: Union[float, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray]: ...
+
+
+def giqe4(
+    rer: Union[float, np.ndarray],
+    gsd: Union[float, np.ndarray],
+    eho: Union[float, np.ndarray],
+    ng: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+    elev_angle: Union[float, np.ndarray],
+) -> Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
     """General Image Quality Equation version 4 from Leachtenauer, et al.
 
     "General Image Quality Equation: GIQE," Applied Optics, Vol 36, No 32,
     1997. The use of GIQE 4 is not endorsed but it is added to pyBSM for
-    historical completeness.
+    historical completeness.  Arrays of inputs are evaluated element-wise.
 
     :param rer:
         geometric mean relative edge response (unitless)
@@ -105,12 +146,8 @@ def giqe4(rer: float, gsd: float, eho: float, ng: float, snr: float, elev_angle:
         niirs :
             a National Image Interpretability Rating Scale value (unitless)
     """
-    if rer >= 0.9:
-        c_1 = 3.32
-        c_2 = 1.559
-    else:
-        c_1 = 3.16
-        c_2 = 2.817
+    c_1 = np.where(rer >= 0.9, 3.32, 3.16)
+    c_2 = np.where(rer >= 0.9, 1.559, 2.817)
 
     gsd_gp = gsd / (np.sin(elev_angle) ** (0.5))  # note that the exponent captures the
     # fact that only one direction in the gsd is distorted by projection into
@@ -122,7 +159,27 @@ def giqe4(rer: float, gsd: float, eho: float, ng: float, snr: float, elev_angle:
     return niirs, gsd_gp
 
 
-def giqe5(rer_1: float, rer_2: float, gsd: float, snr: float, elev_angle: float) -> Tuple[float, float, float]:
+@overload
+def giqe5(rer_1: float, rer_2: float, gsd: float, snr: float, elev_angle: float) -> Tuple[float, float, float]: ...
+
+
+@overload
+def giqe5(
+    rer_1: np.ndarray,
+    rer_2: Union[float, np.ndarray],
+    gsd: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+    elev_angle: Union[float, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]: ...
+
+
+def giqe5(
+    rer_1: Union[float, np.ndarray],
+    rer_2: Union[float, np.ndarray],
+    gsd: Union[float, np.ndarray],
+    snr: Union[float, np.ndarray],
+    elev_angle: Union[float, np.ndarray],
+) -> Tuple[Union[float, np.ndarray], Union[float, np.ndarray], Union[float, np.ndarray]]:
     """NGA The General Image Quality Equation version 5.0. 16 Sep 2015.
 
     https://gwg.nga.mil/ntb/baseline/docs/GIQE-5_for_Public_Release.pdf
@@ -130,6 +187,7 @@ def giqe5(rer_1: float, rer_2: float, gsd: float, snr: float, elev_angle: float)
     in all future analyses.  See also "Airborne Validation of the General Image
     Quality Equation 5"
     https://www.osapublishing.org/ao/abstract.cfm?uri=ao-59-32-9978
+    Arrays of inputs are evaluated element-wise.
 
     :param rer_1:
         relative edge response in two directions (e.g., along- and across-
@@ -164,7 +222,7 @@ def giqe5(rer_1: float, rer_2: float, gsd: float, snr: float, elev_angle: float)
     # conversion in the niirs equation below
     gsd_w = gsd / (np.sin(elev_angle) ** (0.25))  # geometric mean of the image plane and ground plane gsds
 
-    rer = (np.max([rer_1, rer_2]) * np.min([rer_1, rer_2]) ** 2.0) ** (1.0 / 3.0)
+    rer = (np.maximum(rer_1, rer_2) * np.minimum(rer_1, rer_2) ** 2.0) ** (1.0 / 3.0)
 
     niirs = (
         9.57
@@ -231,12 +289,9 @@ def giqe_edge_terms(mtf: np.ndarray, df: float, ifov_x: float, ifov_y: float) ->
     u_slice = otf.functional.slice_otf(mtf, 0)
     v_slice = otf.functional.slice_otf(mtf, np.pi / 2)
 
-    mtf_slice_er = relative_edge_response(u_slice, df, ifov_x)
-    v_rer = relative_edge_response(v_slice, df, ifov_y)
-    rer = np.sqrt(mtf_slice_er * v_rer)
-
-    u_eho = edge_height_overshoot(u_slice, df, ifov_x)
-    v_eho = edge_height_overshoot(v_slice, df, ifov_y)
+    u_rer, u_eho = edge_response_terms(u_slice, df, ifov_x)
+    v_rer, v_eho = edge_response_terms(v_slice, df, ifov_y)
+    rer = np.sqrt(u_rer * v_rer)
     eho = np.sqrt(u_eho * v_eho)
 
     return rer, eho
@@ -275,52 +330,26 @@ def ground_resolved_distance(mtf_slice: np.ndarray, df: float, snr: float, ifov:
     return grd
 
 
-def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) -> Metrics:
-    """Returns NIIRS values and all intermediate calculations.
+@instrumentation.instrumented("giqe_snr")
+def _giqe_snr(nm: Metrics, atm: np.ndarray) -> int:
+    """Fills in the contrast SNR, noise breakdown and MTF spectral weights of nm for GIQE type targets.
 
-    This function implements the original MATLAB-based NIIRS model and can serve as a
-    template for building other sensor models.
-
-    :param sensor:
-        an object from the class sensor
-    :param scenario:
-        an object from the class scenario
+    :param nm:
+        metrics to fill in; nm.sensor must be set
+    :param atm:
+        atmosphere, see pybsm.utils.load_database_atmosphere
 
     :return:
-        nm:
-            an object containing results of the GIQE calculation along with
-            many intermediate calculations
+        is_emissive:
+            1 if the sensor band is treated as infrared (emissive) and 0
+            otherwise
     """
-    # initialize the output
-    nm = Metrics("niirs " + sensor.name + " " + scenario.name)
-    nm.sensor = sensor
-    nm.scenario = scenario
-    nm.slant_range = geospatial.curved_earth_slant_range(0.0, scenario.altitude, scenario.ground_range)
-
-    # #########CONTRAST SNR CALCULATION#########
-    # load the atmosphere model
-    if interp:
-        nm.atm = utils.load_database_atmosphere(scenario.altitude, scenario.ground_range, scenario.ihaze)
-    else:
-        nm.atm = utils.load_database_atmosphere_no_interp(scenario.altitude, scenario.ground_range, scenario.ihaze)
     # crop out out-of-band data (saves time integrating later)
-    nm.atm = nm.atm[nm.atm[:, 0] >= nm.sensor.opt_trans_wavelengths[0], :]
+    nm.atm = atm[atm[:, 0] >= nm.sensor.opt_trans_wavelengths[0], :]
     nm.atm = nm.atm[nm.atm[:, 0] <= nm.sensor.opt_trans_wavelengths[-1], :]
 
-    if nm.sensor.opt_trans_wavelengths[0] >= 2.9e-6:
-        is_emissive = 1  # toggle the GIQE to assume infrared imaging
-        # the next four lines are bookkeeping for interpreting the results
-        # since the giqe_radiance function assumes these values anyway
-        nm.scenario.target_reflectance = 0.0
-        nm.scenario.background_reflectance = 0.0
-        nm.scenario.target_temperature = 282.0
-        nm.scenario.target_temperature = 280.0
-
-    else:
-        is_emissive = 0
-        # more bookkeeping (see previous comment)
-        nm.scenario.target_reflectance = 0.15
-        nm.scenario.background_reflectance = 0.07
+    # toggle the GIQE to assume infrared imaging
+    is_emissive = 1 if nm.sensor.opt_trans_wavelengths[0] >= 2.9e-6 else 0
 
     # get aperture radiances for reflective target and background with GIQE
     # type target parameters
@@ -328,7 +357,7 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
     nm.radiance_wavelengths = nm.atm[:, 0]
 
     # now calculate now characteristics ****for a single frame******
-    nm.snr = radiance.photon_detector_SNR(sensor, nm.radiance_wavelengths, nm.tgt_radiance, nm.bkg_radiance)
+    nm.snr = radiance.photon_detector_SNR(nm.sensor, nm.radiance_wavelengths, nm.tgt_radiance, nm.bkg_radiance)
 
     # break out photon noise sources (not required for NIIRS but useful for
     # analysis) photon noise due to the scene itself (target,background, and
@@ -345,7 +374,7 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
             nm.radiance_wavelengths,
         )
         * nm.snr.int_time
-        * sensor.n_tdi
+        * nm.sensor.n_tdi
     )
     bkg_noise = np.sqrt(
         np.trapz(
@@ -359,7 +388,7 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
             nm.radiance_wavelengths,
         )
         * nm.snr.int_time
-        * sensor.n_tdi
+        * nm.sensor.n_tdi
     )  # assign the scene Noise to the larger of the target or background noise
     scene_and_path_noise = np.max([tgt_noise, bkg_noise])
     # calculate noise due to just the path scattered or emitted radiation
@@ -375,7 +404,7 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
         np.zeros(1),
         0.0,
     )
-    nm.snr.path_noise = np.sqrt(scatter_rate * nm.snr.int_time * sensor.n_tdi)
+    nm.snr.path_noise = np.sqrt(scatter_rate * nm.snr.int_time * nm.sensor.n_tdi)
     nm.snr.scene_noise = np.sqrt(scene_and_path_noise**2 - nm.snr.path_noise**2)
     # ######OTF CALCULATION#######
 
@@ -383,23 +412,53 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
     nm.mtf_wavelengths = nm.radiance_wavelengths[nm.snr.weights > 0.0]
     nm.mtf_weights = nm.snr.weights[nm.snr.weights > 0.0]
 
+    return is_emissive
+
+
+@instrumentation.instrumented("niirs")
+def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) -> Metrics:
+    """Returns NIIRS values and all intermediate calculations.
+
+    This function implements the original MATLAB-based NIIRS model and can serve as a
+    template for building other sensor models.
+
+    :param sensor:
+        an object from the class sensor
+    :param scenario:
+        an object from the class scenario
+
+    :return:
+        nm:
+            an object containing results of the GIQE calculation along with
+            many intermediate calculations
+    """
+    # initialize the output
+    nm = Metrics("niirs " + sensor.name + " " + scenario.name)
+    nm.sensor = sensor
+    nm.scenario = scenario
+    nm.slant_range = geospatial.curved_earth_slant_range(0.0, scenario.altitude, scenario.ground_range)
+
+    # #########CONTRAST SNR CALCULATION#########
+    # load the atmosphere model
+    atm = utils.get_atmosphere(scenario.altitude, scenario.ground_range, scenario.ihaze, interp)
+    is_emissive = _giqe_snr(nm, atm)
+
+    if is_emissive:
+        # the next four lines are bookkeeping for interpreting the results
+        # since the giqe_radiance function assumes these values anyway
+        nm.scenario.target_reflectance = 0.0
+        nm.scenario.background_reflectance = 0.0
+        nm.scenario.target_temperature = 282.0
+        nm.scenario.target_temperature = 280.0
+    else:
+        # more bookkeeping (see previous comment)
+        nm.scenario.target_reflectance = 0.15
+        nm.scenario.background_reflectance = 0.07
+
     # setup spatial frequency array
     nm.cutoff_frequency = sensor.D / np.min(nm.mtf_wavelengths)
-    u_rng = np.linspace(-1.0, 1.0, 101) * nm.cutoff_frequency
-    v_rng = np.linspace(1.0, -1.0, 101) * nm.cutoff_frequency
-    nm.uu, nm.vv = np.meshgrid(u_rng, v_rng)  # meshgrid of spatial frequencies out to the optics cutoff
-    nm.df = u_rng[1] - u_rng[0]  # spatial frequency step size
-
-    nm.otf = otf.functional.common_OTFs(
-        sensor,
-        scenario,
-        nm.uu,
-        nm.vv,
-        nm.mtf_wavelengths,
-        nm.mtf_weights,
-        nm.slant_range,
-        nm.snr.int_time,
-    )
+    u_slice, v_slice, nm.df = _giqe_mtf_slices(sensor, scenario, nm, nm.slant_range)
+    _set_lazy_giqe_otf(nm)
 
     # ########CALCULATE NIIRS##############
     nm.ifov_x = sensor.p_x / sensor.f
@@ -407,7 +466,10 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
     nm.gsd_x = nm.ifov_x * nm.slant_range
     nm.gsd_y = nm.ifov_y * nm.slant_range
     nm.gsd_gm = np.sqrt(nm.gsd_x * nm.gsd_y)
-    nm.rer_gm, nm.eho_gm = giqe_edge_terms(np.abs(nm.otf.system_OTF), nm.df, nm.ifov_x, nm.ifov_y)
+    u_rer, u_eho = edge_response_terms(u_slice, nm.df, nm.ifov_x)
+    v_rer, v_eho = edge_response_terms(v_slice, nm.df, nm.ifov_y)
+    nm.rer_gm = np.sqrt(u_rer * v_rer)
+    nm.eho_gm = np.sqrt(u_eho * v_eho)
 
     nm.ng = noise.noise_gain(sensor.filter_kernel)
     # note that NIIRS is calculated using the SNR ***after frame stacking****
@@ -435,6 +497,7 @@ def niirs(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) ->
     return nm
 
 
+@instrumentation.instrumented("niirs5")
 def niirs5(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) -> Metrics:
     """Returns NIIRS values calculate using GIQE 5 and all intermediate calculations.
 
@@ -460,114 +523,33 @@ def niirs5(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) -
 
     # #########CONTRAST SNR CALCULATION#########
     # load the atmosphere model
-    if interp:
-        nm.atm = utils.load_database_atmosphere(scenario.altitude, scenario.ground_range, scenario.ihaze)
-    else:
-        nm.atm = utils.load_database_atmosphere_no_interp(scenario.altitude, scenario.ground_range, scenario.ihaze)
-    # crop out out-of-band data (saves time integrating later)
-    nm.atm = nm.atm[nm.atm[:, 0] >= nm.sensor.opt_trans_wavelengths[0], :]
-    nm.atm = nm.atm[nm.atm[:, 0] <= nm.sensor.opt_trans_wavelengths[-1], :]
+    atm = utils.get_atmosphere(scenario.altitude, scenario.ground_range, scenario.ihaze, interp)
+    is_emissive = _giqe_snr(nm, atm)
 
-    if nm.sensor.opt_trans_wavelengths[0] >= 2.9e-6:
-        is_emissive = 1  # toggle the GIQE to assume infrared imaging
+    if is_emissive:
         # the next four lines are bookkeeping for interpreting the results
         # since the giqe_radiance function assumes these values anyway
         nm.scenario.target_reflectance = 0.0
         nm.scenario.background_reflectance = 0.0
         nm.scenario.target_temperature = 282.0
         nm.scenario.target_temperature = 280.0
-
     else:
-        is_emissive = 0
         # more bookkeeping (see previous comment)
         nm.scenario.target_reflectance = 0.15
         nm.scenario.background_reflectance = 0.07
 
-    # get aperture radiances for reflective target and background with GIQE
-    # type target parameters
-    nm.tgt_radiance, nm.bkg_radiance = radiance.giqe_radiance(nm.atm, is_emissive)
-    nm.radiance_wavelengths = nm.atm[:, 0]
-
-    # now calculate now characteristics ****for a single frame******
-    nm.snr = radiance.photon_detector_SNR(sensor, nm.radiance_wavelengths, nm.tgt_radiance, nm.bkg_radiance)
-
-    # break out photon noise sources (not required for NIIRS but useful for
-    # analysis) photon noise due to the scene itself (target,background, and
-    # path emissions/scattering)
-    tgt_noise = np.sqrt(
-        np.trapz(
-            radiance.photon_detection_rate(
-                nm.snr.tgt_FPA_irradiance - nm.snr.other_irradiance,
-                nm.sensor.w_x,
-                nm.sensor.w_y,
-                nm.radiance_wavelengths,
-                nm.snr.qe,
-            ),
-            nm.radiance_wavelengths,
-        )
-        * nm.snr.int_time
-        * sensor.n_tdi
-    )
-    bkg_noise = np.sqrt(
-        np.trapz(
-            radiance.photon_detection_rate(
-                nm.snr.bkg_FPA_irradiance - nm.snr.other_irradiance,
-                nm.sensor.w_x,
-                nm.sensor.w_y,
-                nm.radiance_wavelengths,
-                nm.snr.qe,
-            ),
-            nm.radiance_wavelengths,
-        )
-        * nm.snr.int_time
-        * sensor.n_tdi
-    )  # assign the scene Noise to the larger of the target or background noise
-    scene_and_path_noise = np.max([tgt_noise, bkg_noise])
-    # calculate noise due to just the path scattered or emitted radiation
-    scatter_rate, _, _ = radiance.signal_rate(
-        nm.radiance_wavelengths,
-        nm.atm[:, 2] + nm.atm[:, 4],
-        nm.snr.opt_trans,
-        nm.sensor.D,
-        nm.sensor.f,
-        nm.sensor.w_x,
-        nm.sensor.w_y,
-        nm.snr.qe,
-        np.zeros(1),
-        0.0,
-    )
-    nm.snr.path_noise = np.sqrt(scatter_rate * nm.snr.int_time * sensor.n_tdi)
-    nm.snr.scene_noise = np.sqrt(scene_and_path_noise**2 - nm.snr.path_noise**2)
-    # ######OTF CALCULATION#######
-
-    # cut down the wavelength range to only the regions of interest
-    nm.mtf_wavelengths = nm.radiance_wavelengths[nm.snr.weights > 0.0]
-    nm.mtf_weights = nm.snr.weights[nm.snr.weights > 0.0]
-
     # setup spatial frequency array
     nm.cutoff_frequency = sensor.D / np.min(nm.mtf_wavelengths)
-    u_rng = np.linspace(-1.0, 1.0, 101) * nm.cutoff_frequency
-    v_rng = np.linspace(1.0, -1.0, 101) * nm.cutoff_frequency
-    nm.uu, nm.vv = np.meshgrid(u_rng, v_rng)  # meshgrid of spatial frequencies out to the optics cutoff
-    nm.df = u_rng[1] - u_rng[0]  # spatial frequency step size
-
     sensor.filter_kernel = np.array([1])  # ensures that sharpening is turned off.  Not valid for GIQE5
-    nm.otf = otf.functional.common_OTFs(
-        sensor,
-        scenario,
-        nm.uu,
-        nm.vv,
-        nm.mtf_wavelengths,
-        nm.mtf_weights,
-        nm.slant_range,
-        nm.snr.int_time,
-    )
+    u_slice, v_slice, nm.df = _giqe_mtf_slices(sensor, scenario, nm, nm.slant_range)
+    _set_lazy_giqe_otf(nm)
 
     # ##########CALCULATE NIIRS##############
     nm.ifov_x = sensor.p_x / sensor.f
     nm.ifov_y = sensor.p_y / sensor.f
     nm.gsd_x = nm.ifov_x * nm.slant_range  # GIQE5 assumes all square detectors
-    nm.rer_0, nm.rer_90 = giqe5_RER(np.abs(nm.otf.system_OTF), nm.df, nm.ifov_x, nm.ifov_y)
+    nm.rer_0 = relative_edge_response(u_slice, nm.df, nm.ifov_x)
+    nm.rer_90 = relative_edge_response(v_slice, nm.df, nm.ifov_y)
 
     # note that NIIRS is calculated using the SNR ***after frame stacking****
     # if any
@@ -583,6 +565,356 @@ def niirs5(sensor: Sensor, scenario: Scenario, interp: Optional[bool] = False) -
     return nm
 
 
+def _giqe_mtf_slices(
+    sensor: Sensor, scenario: Scenario, nm: Metrics, slant_range: float
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Returns the system MTF along the positive u and v axes of the niirs frequency grid.
+
+    These are the slices that giqe_edge_terms and giqe5_RER would take from
+    the 101 x 101 grid of nm.otf, but the OTFs are evaluated at the 2 x 50
+    points of the slices only.
+
+    :param sensor:
+        an object from the class sensor
+    :param scenario:
+        an object from the class scenario
+    :param nm:
+        metrics filled in by _giqe_snr (mtf_wavelengths, mtf_weights and
+        snr.int_time are used)
+    :param slant_range:
+        distance between the sensor and the target (m)
+
+    :return:
+        u_slice:
+            MTF at u = 0, df, ..., 49 df along v = 0 (unitless)
+        v_slice:
+            MTF at v = 0, df, ..., 49 df along u = 0 (unitless)
+        df:
+            spatial frequency step size (cycles/radian)
+    """
+    u, v, df = _giqe_slice_frequencies(sensor.D / np.min(nm.mtf_wavelengths))
+    mtf = np.abs(
+        otf.functional.common_OTFs(
+            sensor,
+            scenario,
+            u,
+            v,
+            nm.mtf_wavelengths,
+            nm.mtf_weights,
+            slant_range,
+            nm.snr.int_time,
+        ).system_OTF
+    )
+
+    return mtf[:50], mtf[50:], df
+
+
+def _giqe_slice_frequencies(cutoff_frequency: float) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Returns the positive u axis followed by the positive v axis of the niirs frequency grid, and its step df."""
+    u_rng = np.linspace(-1.0, 1.0, 101) * cutoff_frequency
+    v_rng = np.linspace(1.0, -1.0, 101) * cutoff_frequency
+    df = u_rng[1] - u_rng[0]
+
+    u = np.concatenate([u_rng[50:100], np.full(50, u_rng[50])])
+    v = np.concatenate([np.full(50, v_rng[50]), v_rng[50:0:-1]])
+
+    return u, v, df
+
+
+def _giqe_otf_grid(
+    sensor: Sensor,
+    scenario: Scenario,
+    mtf_wavelengths: np.ndarray,
+    mtf_weights: np.ndarray,
+    slant_range: float,
+    int_time: float,
+    cutoff_frequency: float,
+) -> Tuple[np.ndarray, np.ndarray, otf.OTF]:
+    """Returns the 101 x 101 frequency grid (uu, vv) out to the optics cutoff and the OTFs evaluated on it."""
+    u_rng = np.linspace(-1.0, 1.0, 101) * cutoff_frequency
+    v_rng = np.linspace(1.0, -1.0, 101) * cutoff_frequency
+    uu, vv = np.meshgrid(u_rng, v_rng)  # meshgrid of spatial frequencies out to the optics cutoff
+    system_otf = otf.functional.common_OTFs(
+        sensor,
+        scenario,
+        uu,
+        vv,
+        mtf_wavelengths,
+        mtf_weights,
+        slant_range,
+        int_time,
+    )
+    return uu, vv, system_otf
+
+
+def _set_lazy_giqe_otf(nm: Metrics) -> None:
+    """Defers the frequency grid and OTF of niirs and niirs5 until nm.uu, nm.vv or nm.otf is accessed.
+
+    The GIQE only needs the slices from _giqe_mtf_slices, so the 2-D OTF is
+    evaluated only for callers that use it, e.g. plot_common_MTFs.  The sensor
+    and scenario are copied so that later changes to them do not affect it,
+    and the pending computation is a partial of a module-level function so
+    that nm stays picklable.
+    """
+    nm.set_lazy_otf(
+        functools.partial(
+            _giqe_otf_grid,
+            copy.copy(nm.sensor),
+            copy.copy(nm.scenario),
+            nm.mtf_wavelengths,
+            nm.mtf_weights,
+            nm.slant_range,
+            nm.snr.int_time,
+            nm.cutoff_frequency,
+        )
+    )
+
+
+def _batch_pairs(n_sensors: int, n_scenarios: int, grid: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the sensor and scenario indices of each point of a batch.
+
+    :raises:
+        ValueError:
+            if grid is False and the number of sensors and scenarios differ
+            (and neither is 1)
+    """
+    if grid:
+        sensor_index, scenario_index = np.meshgrid(np.arange(n_sensors), np.arange(n_scenarios), indexing="ij")
+        return sensor_index.ravel(), scenario_index.ravel()
+
+    n = max(n_sensors, n_scenarios)
+    if n_sensors not in (1, n) or n_scenarios not in (1, n):
+        raise ValueError(
+            "Number of sensors and scenarios must match (or one of them must be 1) unless grid is True"
+        )
+    return np.zeros(n, dtype=int) + np.arange(n_sensors), np.zeros(n, dtype=int) + np.arange(n_scenarios)
+
+
+def _giqe_batch(
+    sensors: Sequence[Sensor],
+    scenarios: Sequence[Scenario],
+    interp: bool,
+    grid: bool,
+    version: int,
+) -> Dict[str, np.ndarray]:
+    """Shared implementation of niirs_batch (version 3) and niirs5_batch (version 5)."""
+    sensor_index, scenario_index = _batch_pairs(len(sensors), len(scenarios), grid)
+    if version == 5:
+        names = ["niirs", "snr", "rer", "rer_0", "rer_90", "gsd_x", "gsd_w", "elev_angle", "slant_range"]
+    else:
+        names = ["niirs", "niirs_4", "snr", "rer_gm", "eho_gm", "ng", "gsd_gm", "gsd_gp", "elev_angle", "slant_range"]
+    results = {name: np.zeros(sensor_index.size) for name in names}
+
+    # the geometry and the turbulence profile depend only on the scenario, so
+    # they are computed for every scenario at once
+    def scenario_array(name: str) -> np.ndarray:
+        return np.array([getattr(scenario, name) for scenario in scenarios], dtype=float)
+
+    altitude = scenario_array("altitude")
+    slant_range = geospatial.curved_earth_slant_range(0.0, altitude, scenario_array("ground_range"))
+    elev_angle = np.pi / 2 - geospatial.nadir_angle(0.0, altitude, slant_range)
+    aircraft_speed = scenario_array("aircraft_speed")
+    # the coherence diameter of each scenario comes from the same cache as in
+    # niirs; inf turns turbulence off where cn2_at_1m is 0
+    r0_at_1um = np.array(
+        [
+            otf.functional.slant_path_coherence_diameter(
+                scenario.altitude, slant_range[j], scenario.ha_wind_speed, scenario.cn2_at_1m
+            )
+            if scenario.cn2_at_1m > 0.0
+            else np.inf
+            for j, scenario in enumerate(scenarios)
+        ]
+    )
+    results["slant_range"] = slant_range[scenario_index]
+    results["elev_angle"] = elev_angle[scenario_index]
+
+    # each atmosphere is loaded once
+    atmospheres: Dict[Tuple[float, float, int], np.ndarray] = {}
+
+    for i in np.unique(sensor_index):
+        sensor = sensors[i]
+        if version == 5 and sensor.filter_kernel.shape[0] > 1:
+            # sharpening is turned off for GIQE5 (without modifying the input)
+            sensor = copy.copy(sensor)
+            sensor.filter_kernel = np.array([1])
+        points = np.flatnonzero(sensor_index == i)
+        sensor_scenarios = scenario_index[points]
+
+        # the radiometry depends on the scenario only through the atmosphere,
+        # so it is computed once per atmosphere
+        radiometry: Dict[Tuple[float, float, int], Metrics] = {}
+        point_radiometry: List[Metrics] = []
+        for j in sensor_scenarios:
+            scenario = scenarios[j]
+            key = (scenario.altitude, scenario.ground_range, scenario.ihaze)
+            if key not in atmospheres:
+                atmospheres[key] = utils.get_atmosphere(*key, interp)
+            if key not in radiometry:
+                nm = Metrics("niirs " + sensor.name + " " + scenario.name)
+                nm.sensor = sensor
+                _giqe_snr(nm, atmospheres[key])
+                radiometry[key] = nm
+            point_radiometry.append(radiometry[key])
+        snr = np.array([nm.snr.snr for nm in point_radiometry])
+        int_time = np.array([nm.snr.int_time for nm in point_radiometry])
+
+        # points whose MTFs are weighted over the same wavelengths share their
+        # frequency axes and the wavelength-resampled optics terms, so their
+        # MTF slices are evaluated in one stacked call
+        groups: Dict[bytes, List[int]] = {}
+        for k, nm in enumerate(point_radiometry):
+            groups.setdefault(nm.mtf_wavelengths.tobytes(), []).append(k)
+        u_slices = np.zeros((points.size, 50))
+        v_slices = np.zeros((points.size, 50))
+        df = np.zeros(points.size)
+        for members in groups.values():
+            mtf_wavelengths = point_radiometry[members[0]].mtf_wavelengths
+            u, v, df[members] = _giqe_slice_frequencies(sensor.D / np.min(mtf_wavelengths))
+            group_scenarios = sensor_scenarios[members]
+            mtf = np.abs(
+                otf.functional._stacked_system_OTF(
+                    sensor,
+                    u,
+                    v,
+                    mtf_wavelengths,
+                    np.stack([point_radiometry[k].mtf_weights for k in members]),
+                    r0_at_1um[group_scenarios],
+                    aircraft_speed[group_scenarios],
+                    int_time[members],
+                )
+            )
+            u_slices[members] = mtf[:, :50]
+            v_slices[members] = mtf[:, 50:]
+
+        ifov_x = sensor.p_x / sensor.f
+        ifov_y = sensor.p_y / sensor.f
+        u_rer, u_eho = np.zeros(points.size), np.zeros(points.size)
+        v_rer, v_eho = np.zeros(points.size), np.zeros(points.size)
+        for d in np.unique(df):
+            same_df = df == d
+            u_rer[same_df], u_eho[same_df] = edge_response_terms(u_slices[same_df], d, ifov_x)
+            v_rer[same_df], v_eho[same_df] = edge_response_terms(v_slices[same_df], d, ifov_y)
+
+        # note that NIIRS is calculated using the SNR ***after frame stacking****
+        # if any
+        stacked_snr = np.sqrt(sensor.frame_stacks) * snr
+        point_slant_range = slant_range[sensor_scenarios]
+        point_elev_angle = elev_angle[sensor_scenarios]
+        results["snr"][points] = snr
+        if version == 5:
+            gsd_x = ifov_x * point_slant_range
+            niirs, gsd_w, rer = giqe5(u_rer, v_rer, gsd_x, stacked_snr, point_elev_angle)
+            results["rer_0"][points] = u_rer
+            results["rer_90"][points] = v_rer
+            results["gsd_x"][points] = gsd_x
+            results["gsd_w"][points] = gsd_w
+            results["rer"][points] = rer
+        else:
+            rer_gm = np.sqrt(u_rer * v_rer)
+            eho_gm = np.sqrt(u_eho * v_eho)
+            ng = noise.noise_gain(sensor.filter_kernel)
+            gsd_gm = np.sqrt(ifov_x * point_slant_range * ifov_y * point_slant_range)
+            niirs = giqe3(rer_gm, gsd_gm, eho_gm, ng, stacked_snr)
+            results["niirs_4"][points], results["gsd_gp"][points] = giqe4(
+                rer_gm, gsd_gm, eho_gm, ng, stacked_snr, point_elev_angle
+            )
+            results["rer_gm"][points] = rer_gm
+            results["eho_gm"][points] = eho_gm
+            results["ng"][points] = ng
+            results["gsd_gm"][points] = gsd_gm
+        results["niirs"][points] = niirs
+
+    results["sensor_index"] = sensor_index
+    results["scenario_index"] = scenario_index
+
+    return results
+
+
+def niirs_batch(
+    sensors: Sequence[Sensor],
+    scenarios: Sequence[Scenario],
+    interp: Optional[bool] = False,
+    grid: Optional[bool] = False,
+) -> Dict[str, np.ndarray]:
+    """Returns GIQE 3 (and GIQE 4) NIIRS values for many sensor and scenario combinations.
+
+    The results match pybsm.metrics.functional.niirs, but work that is common
+    to several points is shared and the rest is vectorized.  The geometry and
+    coherence diameter are computed once per scenario, each atmosphere is
+    loaded once, and the radiometry and SNR are computed once per sensor and
+    atmosphere.  The MTFs along the two frequency axes used by the GIQE are
+    evaluated for all the points of a sensor at once: the aperture and
+    wavefront OTFs once per wavelength, and only the turbulence, drift and
+    wavelength weights per point.  Unlike niirs, the inputs are not modified.
+
+    :param sensors:
+        a sequence of objects from the class sensor
+    :param scenarios:
+        a sequence of objects from the class scenario
+    :param interp:
+        if True, interpolate between database atmospheres (see
+        pybsm.utils.load_database_atmosphere)
+    :param grid:
+        if True, evaluate every sensor with every scenario; otherwise sensors
+        and scenarios are paired element-wise (a single sensor or scenario is
+        paired with every element of the other sequence)
+
+    :return:
+        results:
+            dictionary of 1-D arrays with one element per evaluated point:
+            niirs, niirs_4, snr (single frame), rer_gm, eho_gm, ng, gsd_gm,
+            gsd_gp, elev_angle and slant_range as defined in niirs, and
+            sensor_index and scenario_index giving the position of the sensor
+            and scenario of each point in the inputs
+
+    :raises:
+        ValueError:
+            if grid is False and the lengths of sensors and scenarios differ
+            and neither is 1
+    """
+    return _giqe_batch(sensors, scenarios, bool(interp), bool(grid), version=3)
+
+
+def niirs5_batch(
+    sensors: Sequence[Sensor],
+    scenarios: Sequence[Scenario],
+    interp: Optional[bool] = False,
+    grid: Optional[bool] = False,
+) -> Dict[str, np.ndarray]:
+    """Returns GIQE 5 NIIRS values for many sensor and scenario combinations.
+
+    The batched counterpart of pybsm.metrics.functional.niirs5; see
+    niirs_batch for how work is shared and how sensors and scenarios are
+    combined.  As in niirs5, sharpening filters are ignored, but the sensors
+    are not modified.
+
+    :param sensors:
+        a sequence of objects from the class sensor
+    :param scenarios:
+        a sequence of objects from the class scenario
+    :param interp:
+        if True, interpolate between database atmospheres (see
+        pybsm.utils.load_database_atmosphere)
+    :param grid:
+        if True, evaluate every sensor with every scenario; otherwise sensors
+        and scenarios are paired element-wise
+
+    :return:
+        results:
+            dictionary of 1-D arrays with one element per evaluated point:
+            niirs, snr (single frame), rer, rer_0, rer_90, gsd_x, gsd_w,
+            elev_angle and slant_range as defined in niirs5, and sensor_index
+            and scenario_index
+
+    :raises:
+        ValueError:
+            if grid is False and the lengths of sensors and scenarios differ
+            and neither is 1
+    """
+    return _giqe_batch(sensors, scenarios, bool(interp), bool(grid), version=5)
+
+
 def relative_edge_response(mtf_slice: np.ndarray, df: float, ifov: float) -> float:
     """IBSM Equation 3-61. The slope of the edge response of the system taken at +/-0.5 pixels from a theoretical edge.
 
@@ -601,8 +933,8 @@ def relative_edge_response(mtf_slice: np.ndarray, df: float, ifov: float) -> flo
         rer:
             relative edge response (unitless)
     """
-    rer = edge_response(0.5, mtf_slice, df, ifov) - edge_response(-0.5, mtf_slice, df, ifov)
-    return rer
+    rer, _ = edge_response_terms(mtf_slice, df, ifov)
+    return float(rer)
 
 
 def edge_height_overshoot(mtf_slice: np.ndarray, df: float, ifov: float) -> float:
@@ -627,20 +959,70 @@ def edge_height_overshoot(mtf_slice: np.ndarray, df: float, ifov: float) -> floa
         eho :
             edge height overshoot (unitless)
     """
-    rng = np.arange(1.0, 3.25, 0.25)
-    er = np.zeros(rng.size)
-    index = 0
+    _, eho = edge_response_terms(mtf_slice, df, ifov)
+    return float(eho)
 
-    for dist in rng:
-        er[index] = edge_response(dist, mtf_slice, df, ifov)
-        index = index + 1
 
-    if np.all(np.diff(er) > 0):  # when true, er is monotonically increasing
-        eho = er[1]  # the edge response at 1.25 pixels from the edge
-    else:
-        eho = np.max(er)
+def edge_response_terms(mtf_slices: np.ndarray, df: float, ifov: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Relative edge response (IBSM Equation 3-61) and edge height overshoot (IBSM Equation 3-60) of MTF slices.
+
+    Every edge response sample is a linear functional of the MTF slice, so
+    the samples needed for both terms are computed for all slices with one
+    matrix product; the weight matrix is cached for each (n, df, ifov).  See
+    relative_edge_response and edge_height_overshoot for the definitions.
+
+    :param mtf_slices:
+        1-D modulation transfer function (unitless) mtf[0] = 1 is at 0
+        cycles/radian, or an array of them stacked along the leading axes
+    :param df:
+        spatial frequency step size (cycles/radian)
+    :param ifov:
+        instantaneous field-of-view of a detector (radians)
+
+    :return:
+        rer:
+            relative edge response of each slice (unitless)
+        eho:
+            edge height overshoot of each slice (unitless)
+    """
+    weights = _edge_response_weights(mtf_slices.shape[-1], float(df), float(ifov))
+    er = 0.5 + mtf_slices @ weights
+
+    rer = er[..., 1] - er[..., 0]
+
+    # the EHO samples run from 1.0 to 3.0 pixels
+    er = er[..., 2:]
+    monotonic = np.all(np.diff(er, axis=-1) > 0, axis=-1)
+    # the edge response at 1.25 pixels from the edge when er is monotonically
+    # increasing, its maximum otherwise
+    eho = np.where(monotonic, er[..., 1], np.max(er, axis=-1))[()]
+
+    return rer, eho
+
+
+# distances from the edge (pixels) at which edge_response_terms samples the
+# edge response: +/-0.5 for the RER, then 1.0 to 3.0 in 0.25 steps for the EHO
+_edge_positions = np.concatenate((np.array([-0.5, 0.5]), np.arange(1.0, 3.25, 0.25)))
 
-    return eho
+
+@functools.lru_cache(maxsize=64)
+def _edge_response_weights(n: int, df: float, ifov: float) -> np.ndarray:
+    """Returns the (n, positions) matrix mapping an MTF slice to edge_response minus 0.5 at _edge_positions."""
+    w = df * np.arange(1.0 * n) + 1e-6  # note tiny offset to avoid infs, as in edge_response
+
+    # trapezoidal rule weights on the (uniform) grid w
+    trapezoid = np.zeros(n)
+    if n > 1:
+        dw = np.diff(w) / 2
+        trapezoid[:-1] += dw
+        trapezoid[1:] += dw
+
+    weights = (trapezoid / w / np.pi)[:, np.newaxis] * np.sin(
+        2 * np.pi * np.multiply.outer(w, ifov * _edge_positions)
+    )
+    weights.setflags(write=False)
+
+    return weights
 
 
 def edge_response(pixel_pos: float, mtf_slice: np.ndarray, df: float, ifov: float) -> float:
@@ -690,6 +1072,9 @@ def plot_common_MTFs(metrics: Metrics, orientation_angle: float = 0.0) -> int:
     :return:
         a plot
     """
+    # pyplot is slow to import, so it is only imported for plotting
+    import matplotlib.pyplot as plt
+
     # spatial frequencies in the image plane in (cycles/mm)
     rad_freq = np.sqrt(metrics.uu**2 + metrics.vv**2)
     sf = otf.functional.slice_otf(0.001 * (1.0 / metrics.sensor.f) * rad_freq, orientation_angle)
@@ -765,6 +1150,8 @@ def plot_noise_terms(metrics: Any, max_val: int = 0) -> int:
     :return:
         a plot
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots()
     ms = metrics.snr
     noise_terms = np.array(
@@ -13,18 +13,25 @@ Public release approval for version 0.1: 88ABW-2018-5226
 
 Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
-# 3rd party imports
+# standard library imports
+from typing import Callable, Optional, Tuple
 
+# 3rd party imports
 import numpy as np
 
 # local imports
-import pybsm.otf as otf
+from pybsm.otf import OTF
 from pybsm.radiance import SNRMetrics
 from pybsm.simulation import Scenario, Sensor
 
 
 class Metrics:
-    """A generic class to fill with any outputs of interest."""
+    """A generic class to fill with any outputs of interest.
+
+    The 2-D spatial frequency grid (uu, vv) and OTF may be set directly or,
+    to avoid evaluating them when only OTF slices are needed, deferred with
+    set_lazy_otf and evaluated on first access.
+    """
 
     sensor: Sensor
     scenario: Scenario
@@ -37,10 +44,7 @@ class Metrics:
     mtf_wavelengths: np.ndarray
     mtf_weights: np.ndarray
     cutoff_frequency: float
-    uu: np.ndarray
-    vv: np.ndarray
     df: float
-    otf: otf.OTF
     ifov_x: float
     ifov_y: float
     gsd_x: float
@@ -61,3 +65,62 @@ class Metrics:
     def __init__(self, name: str) -> None:
         """Returns a sensor object whose name is *name*."""
         self.name = name
+        self._uu: Optional[np.ndarray] = None
+        self._vv: Optional[np.ndarray] = None
+        self._otf: Optional[OTF] = None
+        self._compute_otf: Optional[Callable[[], Tuple[np.ndarray, np.ndarray, OTF]]] = None
+
+    def set_lazy_otf(self, compute: Callable[[], Tuple[np.ndarray, np.ndarray, OTF]]) -> None:
+        """Defers the evaluation of the frequency grid and OTF until uu, vv or otf is accessed.
+
+        :param compute:
+            function returning (uu, vv, otf); it is called at most once, on
+            the first access to (or assignment of) uu, vv or otf, so an
+            assigned value is never overwritten by the deferred one
+        """
+        self._uu = self._vv = self._otf = None
+        self._compute_otf = compute
+
+    def _evaluate_otf(self) -> None:
+        if self._compute_otf is not None:
+            self._uu, self._vv, self._otf = self._compute_otf()
+            self._compute_otf = None
+
+    @property
+    def uu(self) -> np.ndarray:
+        """Horizontal spatial frequencies of the OTF grid (cycles/radian)."""
+        self._evaluate_otf()
+        if self._uu is None:
+            raise AttributeError("'Metrics' object has no attribute 'uu'")
+        return self._uu
+
+    @uu.setter
+    def uu(self, value: np.ndarray) -> None:
+        self._evaluate_otf()
+        self._uu = value
+
+    @property
+    def vv(self) -> np.ndarray:
+        """Vertical spatial frequencies of the OTF grid (cycles/radian)."""
+        self._evaluate_otf()
+        if self._vv is None:
+            raise AttributeError("'Metrics' object has no attribute 'vv'")
+        return self._vv
+
+    @vv.setter
+    def vv(self, value: np.ndarray) -> None:
+        self._evaluate_otf()
+        self._vv = value
+
+    @property
+    def otf(self) -> OTF:
+        """OTFs evaluated on the grid (uu, vv)."""
+        self._evaluate_otf()
+        if self._otf is None:
+            raise AttributeError("'Metrics' object has no attribute 'otf'")
+        return self._otf
+
+    @otf.setter
+    def otf(self, value: OTF) -> None:
+        self._evaluate_otf()
+        self._otf = value
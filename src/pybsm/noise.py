@@ -14,9 +14,9 @@ Public release approval for version 0.1: 88ABW-2018-5226
 Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
 # standard library imports
-import inspect
 import os
 import warnings
+from typing import Optional, Union
 
 # 3rd party imports
 import numpy as np
@@ -30,8 +30,10 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
+
+# a numpy.random.Generator, or a seed for one (an int or a SeedSequence)
+RNGLike = Union[int, np.random.SeedSequence, np.random.Generator]
 
 
 def noise_gain(kernel: np.ndarray) -> float:
@@ -82,3 +84,78 @@ def quantization_noise(pe_range: float, bit_depth: float) -> float:
     """
     sigma_q = pe_range / (np.sqrt(12) * (2.0**bit_depth - 1.0))
     return sigma_q
+
+
+def add_noise(
+    blur_img: np.ndarray,
+    g_noise: float,
+    rng: Optional[RNGLike] = None,
+    gaussian_threshold: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Adds photon (Poisson) noise and additive Gaussian noise to an image.
+
+    :param blur_img:
+        the noise-free image in photoelectrons, i.e. the mean photoelectron
+        count of each pixel (e-)
+    :param g_noise:
+        standard deviation of the additive Gaussian noise, e.g. read noise and
+        quantization (e-)
+    :param rng:
+        a numpy.random.Generator, or a seed (an int or a SeedSequence) for
+        one; if None, the legacy global np.random state is used, so results
+        are reproducible with np.random.seed as in earlier versions
+    :param gaussian_threshold:
+        if given, the photon noise of pixels with a mean above this many
+        photoelectrons is drawn from a Gaussian of the same mean and variance,
+        which is faster than the Poisson distribution it approaches (their
+        skewness differs by 1/sqrt(mean)); the photon and additive noise of
+        those pixels are then drawn as a single Gaussian
+    :param out:
+        optional array of the shape of blur_img to write the result to; when
+        it is a C-contiguous float64 array and 'rng' is given, the noise is
+        drawn directly into it
+
+    :return:
+        noisy_img:
+            the noisy image (e-), 'out' if it is given, otherwise a new
+            float64 array
+    """
+    generator = None if rng is None else np.random.default_rng(rng)
+    if out is None:
+        out = np.empty(np.shape(blur_img))
+
+    if gaussian_threshold is None:
+        if generator is None:
+            out[...] = np.random.normal(np.random.poisson(lam=blur_img), g_noise)
+        else:
+            _standard_normal(generator, out)
+            out *= g_noise
+            out += generator.poisson(blur_img)
+        return out
+
+    # above the threshold, the photon and additive noise are a single
+    # Gaussian of variance mean + g_noise^2; below it, only the additive noise
+    # is Gaussian
+    above = blur_img > gaussian_threshold
+    scale = np.where(above, blur_img, 0.0)
+    scale += g_noise**2
+    np.sqrt(scale, out=scale)
+    _standard_normal(generator, out)
+    out *= scale
+    np.add(out, blur_img, out=out, where=above)
+    below = ~above
+    if below.any():
+        lam = blur_img[below]
+        out[below] += np.random.poisson(lam=lam) if generator is None else generator.poisson(lam)
+    return out
+
+
+def _standard_normal(generator: Optional[np.random.Generator], out: np.ndarray) -> None:
+    """Fills out with standard normal samples, without a temporary array where possible."""
+    if generator is None:
+        out[...] = np.random.standard_normal(out.shape)
+    elif out.dtype == np.float64 and out.flags.c_contiguous:
+        generator.standard_normal(out=out)
+    else:
+        out[...] = generator.standard_normal(out.shape)
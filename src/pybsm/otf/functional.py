@@ -60,30 +60,31 @@ of the imaging system dictating the particular mode of OTF. The return, H, is
 the OTF response (unitless) for that those spatial frequencies.
 """
 # standard library imports
-import inspect
+import functools
+import importlib.util
+import math
 import os
+import time
 import warnings
-from typing import Callable, Tuple
-
-try:
-    import cv2
-
-    is_usable = True
-except ImportError:
-    is_usable = False
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Literal, Optional, Tuple, Union, overload
 
 # 3rd party imports
 import numpy as np
-from scipy import interpolate
+from scipy import integrate, ndimage
 from scipy.special import jn
 
 # local imports
-from pybsm.geospatial import altitude_along_slant_path
+from pybsm import instrumentation, utils
+from pybsm.geospatial import nadir_angle
 from pybsm.simulation.scenario import Scenario
 from pybsm.simulation.sensor import Sensor
 
 from .otf import OTF
 
+# OpenCV is slow to import, so it is only imported by the functions that use it
+is_usable = importlib.util.find_spec("cv2") is not None
+
 # new in version 0.2.  We filter warnings associated with calculations in the
 # function circular_aperture_OTF.  These invalid values are caught as NaNs and
 # appropriately replaced.
@@ -93,8 +94,7 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
 
 # define some useful physical constants
 hc = 6.62607004e-34  # Plank's constant  (m^2 kg / s)
@@ -103,12 +103,58 @@ kc = 1.38064852e-23  # Boltzmann constant (m^2 kg / s^2 K)
 qc = 1.60217662e-19  # charge of an electron (coulombs)
 r_earth = 6378.164e3  # radius of the earth (m)
 
+# apply_otf_to_image(method="auto") filters in the frequency domain when the
+# blur kernel has at least this many times as many pixels as the image.
+# cv2.filter2D switches to its own DFT for kernels larger than about 11x11 and
+# was faster than scipy's fftconvolve and oaconvolve for every case measured
+# (64x64 to 2048x2048 images, 5x5 to 1281x1281 kernels), so the FFT path only
+# wins when the kernel is much larger than the image, e.g. small chips at long
+# slant ranges: 1.2x faster at a ratio of 25 and 3.4x at a ratio of 160.
+fft_kernel_ratio = 16
+
+# apply_otf_to_image(method="auto") evaluates the blur kernel only at the
+# output samples when that takes at most this many multiplications per
+# reference pixel, i.e. when (ky + 1) (kx + 1) times the number of output
+# pixels is at most fused_work_ratio times the number of reference pixels,
+# for kernels of at least 5x5 (cv2.filter2D is faster for smaller ones).  It
+# was 1.1 to 3.6 times faster than cv2.filter2D followed by cv2.resize below
+# this ratio (5x5 to 31x31 kernels, 4 to 30 times decimation), but the
+# kernels of simulate_image are typically several times wider than the
+# decimation, far above it.
+fused_work_ratio = 1.5
+
+# radial_OTF samples rotationally symmetric OTFs at this many radii, from zero
+# to the largest radius of the grid, and interpolates linearly.  That is ~1000
+# times fewer evaluations than the 1501x1501 grid of simulate_image, and the
+# interpolated aperture and turbulence OTFs are within 5e-6 of the exact ones.
+radial_samples = 2048
+
+# cache of the maps from grid points to the radii sampled by radial_OTF.  A
+# map holds an int32 index and a float32 weight per grid point, about 18 MB
+# for a 1501x1501 grid; simulation.clear_otf_cache also clears this cache.
+_radius_map_cache = utils.LRUCache(max_bytes=64 * 2**20)
+
+# otf_to_psf crops the blur kernel to the smallest candidate square that holds
+# more than this fraction of its energy; the value is heuristic (but seems to
+# work well)
+psf_energy_threshold = 0.95
+
+# apply_otf_to_image(workers=n) blurs and resamples the image in tiles of this
+# many reference pixels per side on a pool of n threads.  Each tile also
+# filters a halo of half the kernel size, so smaller tiles balance the load
+# better at the cost of more halo pixels.
+filter_tile_size = 512
+
+# called with the output row and column ranges ((y_0, y_1), (x_0, x_1)) of a
+# tile and its wall time (s) whenever apply_otf_to_image finishes a tile
+TileCallback = Callable[[Tuple[Tuple[int, int], Tuple[int, int]], float], None]
+
 
 # ------------------------------- OTF Models ---------------------------------
 
 
 def circular_aperture_OTF(  # noqa: N802
-    u: np.ndarray, v: np.ndarray, lambda0: float, D: float, eta: float  # noqa: N803
+    u: np.ndarray, v: np.ndarray, lambda0: Union[float, np.ndarray], D: float, eta: float  # noqa: N803
 ) -> np.ndarray:
     """IBSM Equation 3-20.  Obscured circular aperture diffraction OTF.
 
@@ -119,7 +165,8 @@ def circular_aperture_OTF(  # noqa: N802
     :param v:
         angular spatial frequency coordinates (rad^-1)
     :param lambda0:
-        wavelength (m)
+        wavelength (m); an array of wavelengths that broadcasts against u and
+        v gives one OTF per wavelength
     :param D:
         effective aperture diameter (m)
     :param eta:
@@ -408,18 +455,16 @@ def detector_OTF_with_aggregation(  # noqa: N802
         H:
             detector OTF
     :NOTE:
-        Code contributed by Matt Howard
+        Code contributed by Matt Howard; the sum over the aggregated pixels is
+        evaluated in closed form
     """
-    agg_u = 0.0
-    agg_v = 0.0
-    for i in range(n):
-        phi_u = 2.0 * np.pi * ((i * p_x * u / f) - ((n - 1.0) * p_x * u / 2.0 / f))
-        agg_u = agg_u + np.cos(phi_u)
-        phi_v = 2.0 * np.pi * ((i * p_y * v / f) - ((n - 1.0) * p_y * v / 2.0 / f))
-        agg_v = agg_v + np.cos(phi_v)
+    # the aggregation terms are sums of cosines of (i - (n - 1) / 2) * 2 pi p u / f
+    # for i = 0..n-1, i.e. Dirichlet kernels
+    agg_u = _dirichlet_kernel(p_x * u / f, n)
+    agg_v = _dirichlet_kernel(p_y * v / f, n)
 
     H = (  # noqa: N806
-        (agg_u * agg_v / n**2) * np.sinc(w_x * u / f) * np.sinc(w_y * v / f)
+        agg_u * agg_v * np.sinc(w_x * u / f) * np.sinc(w_y * v / f)
     )
 
     return H
@@ -468,7 +513,7 @@ def diffusion_OTF(  # noqa: N802
 
 
 def drift_OTF(  # noqa: N802
-    u: np.ndarray, v: np.ndarray, a_x: float, a_y: float
+    u: np.ndarray, v: np.ndarray, a_x: Union[float, np.ndarray], a_y: Union[float, np.ndarray]
 ) -> np.ndarray:
     """IBSM Equation 3-29.  Blur due to constant angular line-of-sight motion during the integration time.
 
@@ -513,42 +558,53 @@ def filter_OTF(  # noqa: N802
             optical transfer function of the filter at spatial frequencies u
             and v
     """
-    # most filter kernels are only a few pixels wide so we'll use zero-padding
-    # to make the OTF larger.  The exact size doesn't matter too much
-    # because the result is interpolated
-    n = 100  # array size for the transform
-
-    # transform of the kernel
-    xfer_fcn = np.abs(np.fft.fftshift(np.fft.fft2(kernel, [n, n])))
+    xfer_fcn = _filter_transfer_function(
+        kernel.tobytes(), kernel.shape, kernel.dtype.str
+    )
 
     nyquist = 0.5 / ifov
 
-    # spatial frequency coordinates for the transformed filter
-    u_rng = np.linspace(-nyquist, nyquist, xfer_fcn.shape[0])
-    v_rng = np.linspace(nyquist, -nyquist, xfer_fcn.shape[1])
-    n_u, n_v = np.meshgrid(u_rng, v_rng)
-
-    # reshape everything to comply with the griddata interpolator requirements
-    xfer_fcn = xfer_fcn.reshape(-1)
-    n_u = n_u.reshape(-1)
-    n_v = n_v.reshape(-1)
-
     # use this function to wrap spatial frequencies beyond Nyquist
     def wrap_val(value: np.ndarray, nyquist: float) -> np.ndarray:
         return (value + nyquist) % (2 * nyquist) - nyquist
 
-    # and interpolate up to the desired range
-    H = interpolate.griddata(  # noqa: N806
-        (n_u, n_v),
-        xfer_fcn,
-        (wrap_val(u, nyquist), wrap_val(v, nyquist)),
-        method="linear",
-        fill_value=0,
-    )
+    # the transfer function samples u from -Nyquist to Nyquist along its
+    # columns and v from Nyquist to -Nyquist along its rows, so interpolate
+    # bilinearly at the corresponding fractional indices
+    u, v = np.broadcast_arrays(u, v)
+    cols = (wrap_val(u, nyquist) + nyquist) / (2 * nyquist) * (xfer_fcn.shape[1] - 1)
+    rows = (nyquist - wrap_val(v, nyquist)) / (2 * nyquist) * (xfer_fcn.shape[0] - 1)
+    H = ndimage.map_coordinates(  # noqa: N806
+        xfer_fcn, [rows.ravel(), cols.ravel()], order=1, mode="nearest"
+    ).reshape(u.shape)
 
     return H
 
 
+@functools.lru_cache(maxsize=32)
+def _filter_transfer_function(
+    kernel_bytes: bytes, shape: Tuple[int, ...], dtype: str
+) -> np.ndarray:
+    """Returns the magnitude of the zero-padded transform of a filter kernel, centered.
+
+    The kernel is passed as its bytes, shape and dtype so that the result can
+    be cached; it does not depend on the detector ifov, which only scales the
+    frequency coordinates.
+    """
+    kernel = np.frombuffer(kernel_bytes, dtype=dtype).reshape(shape)
+
+    # most filter kernels are only a few pixels wide so we'll use zero-padding
+    # to make the OTF larger.  The exact size doesn't matter too much
+    # because the result is interpolated
+    n = 100  # array size for the transform
+
+    # transform of the kernel
+    xfer_fcn = np.abs(np.fft.fftshift(np.fft.fft2(kernel, [n, n])))
+    xfer_fcn.setflags(write=False)
+
+    return xfer_fcn
+
+
 def gaussian_OTF(  # noqa: N802
     u: np.ndarray, v: np.ndarray, blur_size_x: float, blur_size_y: float
 ) -> np.ndarray:
@@ -609,8 +665,10 @@ def jitter_OTF(  # noqa: N802
             OTF at spatial frequency (u,v) (unitless)
 
     """
-    H = np.exp(  # noqa: N806
-        (-2.0 * np.pi**2.0) * (s_x**2.0 * u**2.0 + s_y**2.0 * v**2.0)
+    # written as a product so that u and v given as a row and a column of a
+    # grid only need one exponential each
+    H = np.exp((-2.0 * np.pi**2.0) * s_x**2.0 * u**2.0) * np.exp(  # noqa: N806
+        (-2.0 * np.pi**2.0) * s_y**2.0 * v**2.0
     )
 
     return H
@@ -628,6 +686,7 @@ def polychromatic_turbulence_OTF(  # noqa: N802
     cn2_at_1m: float,
     int_time: float,
     aircraft_speed: float,
+    r0_rtol: Optional[float] = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """IBSM Eqn 3.9. Returns a polychromatic turbulence MTF.
 
@@ -660,6 +719,9 @@ def polychromatic_turbulence_OTF(  # noqa: N802
     :param cn2_at_1m:
         the refractive index structure parameter "near the ground" (e.g. at
         h = 1 m); used to calculate the turbulence profile
+    :param r0_rtol:
+        relative tolerance of the coherence diameter path integral; see
+        slant_path_coherence_diameter
 
     :return:
         turbulence_OTF:
@@ -674,25 +736,28 @@ def polychromatic_turbulence_OTF(  # noqa: N802
             if weights or altitude if empty or the lengths of weights
             or altitude are not equal
     """
-    # calculate the Structure constant along the slant path
-    (z_path, h_path) = altitude_along_slant_path(0.0, altitude, slant_range)
-    cn2 = hufnagel_valley_turbulence_profile(h_path, ha_wind_speed, cn2_at_1m)
-
     # calculate the coherence diameter over the band
-    r0_at_1um = coherence_diameter(1.0e-6, z_path, cn2)
+    r0_at_1um = slant_path_coherence_diameter(
+        altitude, slant_range, ha_wind_speed, cn2_at_1m, rtol=r0_rtol
+    )
 
-    def r0_function(wav: float) -> float:
+    def r0_function(wav: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
         return r0_at_1um * wav ** (6.0 / 5.0) * (1e-6) ** (-6.0 / 5.0)  # noqa: E731
 
-    r0_band = weighted_by_wavelength(wavelengths, weights, r0_function)
+    r0_band = weighted_by_wavelength(wavelengths, weights, r0_function, vectorized=True)
 
-    # calculate the turbulence OTF
-    turb_function = lambda wavelengths: wind_speed_turbulence_OTF(  # noqa: E731
-        u, v, wavelengths, D, r0_function(wavelengths), int_time, aircraft_speed
-    )
-    turbulence_OTF = weighted_by_wavelength(  # noqa: N806
-        wavelengths, weights, turb_function
-    )
+    # calculate the turbulence OTF; it depends only on the radial spatial
+    # frequency, so the weighting is applied to its radial profile
+    def turb_profile(rho: np.ndarray) -> np.ndarray:
+        def turb_function(wavelengths: np.ndarray) -> np.ndarray:
+            wavelengths = _expand_wavelengths(wavelengths, np.ndim(rho))
+            return wind_speed_turbulence_OTF(
+                rho, np.zeros_like(rho), wavelengths, D, r0_function(wavelengths), int_time, aircraft_speed
+            )
+
+        return weighted_by_wavelength(wavelengths, weights, turb_function, vectorized=True)
+
+    turbulence_OTF = radial_OTF(u, v, turb_profile)  # noqa: N806
 
     return turbulence_OTF, r0_band
 
@@ -726,20 +791,41 @@ def tdi_OTF(  # noqa: N802
     )  # this occurs twice, so we'll pull it out to simplify the
     # the code
 
-    exp_sum = 0.0
-    iind = np.arange(0, n_tdi * phases_n)  # goes from 0 to tdiN*phases_n-1
-    for ii in iind:
-        exp_sum = exp_sum + np.exp(-2.0j * np.pi * xx * (beta - 1.0) * ii)
+    # sum of exp(-2j pi xx (beta - 1) ii) for ii = 0..n_tdi*phases_n-1, a
+    # geometric series: a phase factor times a Dirichlet kernel
+    n_terms = np.arange(0, n_tdi * phases_n).size
+    x = xx * (beta - 1.0)
+    exp_sum = (
+        n_terms
+        * np.exp(-1.0j * np.pi * x * (n_terms - 1))
+        * _dirichlet_kernel(x, n_terms)
+    )
     H = np.sinc(xx) * exp_sum / (n_tdi * phases_n)  # noqa: N806
     return H
 
 
+def _dirichlet_kernel(x: np.ndarray, n: int) -> np.ndarray:
+    """Returns sin(pi n x) / (n sin(pi x)), i.e. the mean of cos(2 pi x (i - (n - 1) / 2)) for i = 0..n-1.
+
+    The argument is reduced to the nearest integer, k, so that the result is
+    (-1)^(k (n - 1)) sinc(n d) / sinc(d) with |d| <= 1/2, which has no
+    singularities.  Returns zeros for n < 1.
+    """
+    x = np.asarray(x, dtype=float)
+    if n < 1:
+        return np.zeros(x.shape)
+    k = np.round(x)
+    d = x - k
+    sign = np.where(np.mod(k * (n - 1), 2) == 0, 1.0, -1.0)
+    return sign * np.sinc(n * d) / np.sinc(d)
+
+
 def turbulence_OTF(  # noqa: N802
     u: np.ndarray,
     v: np.ndarray,
-    lambda0: float,
+    lambda0: Union[float, np.ndarray],
     D: float,  # noqa: N803
-    r0: float,
+    r0: Union[float, np.ndarray],
     alpha: float,
 ) -> np.ndarray:
     """IBSM Equation 3-3.  The long or short exposure turbulence OTF.
@@ -749,7 +835,8 @@ def turbulence_OTF(  # noqa: N802
     :param v:
         angular spatial frequency coordinates (rad^-1)
     :param lambda0:
-        wavelength (m)
+        wavelength (m); an array of wavelengths that broadcasts against u and
+        v gives one OTF per wavelength
     :param D:
         effective aperture diameter (m)
     :param r0:
@@ -777,8 +864,8 @@ def turbulence_OTF(  # noqa: N802
 def wavefront_OTF(  # noqa: N802
     u: np.ndarray,
     v: np.ndarray,
-    lambda0: float,
-    pv: float,
+    lambda0: Union[float, np.ndarray],
+    pv: Union[float, np.ndarray],
     L_x: float,  # noqa: N803
     L_y: float,  # noqa: N803
 ) -> np.ndarray:
@@ -795,7 +882,8 @@ def wavefront_OTF(  # noqa: N802
     :param v:
         angular spatial frequency coordinates (rad^-1)
     :param lambda0:
-        wavelength (m)
+        wavelength (m); an array of wavelengths that broadcasts against u and
+        v gives one OTF per wavelength
     :param pv:
         phase variance (rad^2) -- tip: write as (2*pi*waves of error)^2
         (pv is often defined at a specific wavelength (e.g. 633 nm), so scale
@@ -859,9 +947,9 @@ def wavefront_OTF_2(  # noqa: N802
 def wind_speed_turbulence_OTF(  # noqa: N802
     u: np.ndarray,
     v: np.ndarray,
-    lambda0: float,
+    lambda0: Union[float, np.ndarray],
     D: float,  # noqa: N803
-    r0: float,
+    r0: Union[float, np.ndarray],
     t_d: float,
     vel: float,
 ) -> np.ndarray:
@@ -872,7 +960,8 @@ def wind_speed_turbulence_OTF(  # noqa: N802
     :param v:
         angular spatial frequency coordinates (rad^-1)
     :param lambda0:
-        wavelength (m)
+        wavelength (m); an array of wavelengths that broadcasts against u and
+        v gives one OTF per wavelength
     :param D:
         effective aperture diameter (m)
     :param r0:
@@ -903,9 +992,166 @@ def wind_speed_turbulence_OTF(  # noqa: N802
 # ----------------------------- END OTF Models -------------------------------
 
 
-def otf_to_psf(otf: np.ndarray, df: float, dx_out: float) -> np.ndarray:
+def radial_OTF(  # noqa: N802
+    uu: np.ndarray,
+    vv: np.ndarray,
+    profile: Callable[[np.ndarray], np.ndarray],
+    n_samples: int = radial_samples,
+) -> np.ndarray:
+    """Evaluates a rotationally symmetric OTF on a grid of spatial frequencies from its radial profile.
+
+    circular_aperture_OTF, circular_aperture_OTF_with_defocus, turbulence_OTF,
+    wind_speed_turbulence_OTF and wavefront_OTF_2 depend only on the radial
+    spatial frequency, so they can be passed as profiles, e.g. lambda rho:
+    circular_aperture_OTF(rho, np.zeros_like(rho), wavelength, D, eta).
+
+    When uu and vv form a 2-D grid (e.g. from np.meshgrid) with more than
+    'n_samples' points, the profile is evaluated at 'n_samples' evenly spaced
+    radii and linearly interpolated onto the grid through a cached map from
+    each grid point to its place among those radii.  Any other input is
+    evaluated directly.
+
+    :param uu:
+        angular spatial frequency coordinates (rad^-1)
+    :param vv:
+        angular spatial frequency coordinates (rad^-1)
+    :param profile:
+        function of the radial spatial frequency, sqrt(u^2 + v^2) (rad^-1);
+        it is called with an array of radii and may prepend axes to its
+        result, e.g. one profile per wavelength
+    :param n_samples:
+        number of radii at which the profile is sampled, from zero to the
+        largest radius of the grid
+
+    :return:
+        H:
+            the profile at spatial frequencies (uu, vv), with any axes
+            prepended by the profile (unitless)
+    """
+    axes = _grid_axes(uu, vv)
+    if axes is not None and n_samples < uu.size:
+        radii, index, weight = _radius_index_map(axes[0], axes[1], n_samples)
+        table = profile(radii)
+        return table[..., index] * (1.0 - weight) + table[..., index + 1] * weight
+
+    return profile(np.sqrt(uu**2.0 + vv**2.0))
+
+
+def _grid_axes(
+    uu: np.ndarray, vv: np.ndarray
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Returns the u and v axes of a 2-D grid of spatial frequencies, or None if uu and vv are not such a grid.
+
+    uu must vary only along its columns and vv only along its rows, as
+    produced by np.meshgrid(u, v).
+    """
+    if np.ndim(uu) != 2 or np.shape(uu) != np.shape(vv) or min(np.shape(uu)) < 2:
+        return None
+
+    u_axis = np.asarray(uu[0], dtype=float)
+    v_axis = np.asarray(vv[:, 0], dtype=float)
+    if not ((uu == u_axis).all() and (vv == v_axis[:, np.newaxis]).all()):
+        return None
+
+    return u_axis, v_axis
+
+
+def _radius_index_map(
+    u_axis: np.ndarray, v_axis: np.ndarray, n_samples: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the radii sampled by radial_OTF for a grid and, per grid point, the index and weight to interpolate them.
+
+    The maps are cached in _radius_map_cache, keyed on the grid axes.
+    """
+
+    def compute() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rho = np.sqrt(u_axis[np.newaxis, :] ** 2.0 + v_axis[:, np.newaxis] ** 2.0)
+        radii = np.linspace(0.0, rho.max(), max(n_samples, 2))
+
+        # fractional position of each grid point among the radii; float32
+        # weights are far more precise than the linear interpolation itself
+        rho = rho / radii[1] if radii[1] > 0 else np.zeros_like(rho)
+        index = np.minimum(rho.astype(np.int32), radii.size - 2)
+        weight = (rho - index).astype(np.float32)
+
+        return radii, index, weight
+
+    return _radius_map_cache.get((u_axis.tobytes(), v_axis.tobytes(), n_samples), compute)
+
+
+def _even_OTF(  # noqa: N802
+    uu: np.ndarray, vv: np.ndarray, function: Callable[[np.ndarray, np.ndarray], np.ndarray]
+) -> np.ndarray:
+    """Evaluates an OTF that is even in u and in v once per quadrant of a grid symmetric about zero frequency.
+
+    Any other input is evaluated directly.
+
+    :param uu:
+        angular spatial frequency coordinates (rad^-1)
+    :param vv:
+        angular spatial frequency coordinates (rad^-1)
+    :param function:
+        the OTF as a function of u and v; it may prepend axes to its result,
+        e.g. one OTF per wavelength
+
+    :return:
+        H:
+            the OTF at spatial frequencies (uu, vv) (unitless)
+    """
+    axes = _grid_axes(uu, vv)
+    if axes is None or not all(
+        np.allclose(axis, -axis[::-1], rtol=0.0, atol=1e-12 * np.abs(axis).max())
+        for axis in axes
+    ):
+        return function(uu, vv)
+
+    # grid point i along an axis has the same magnitude of frequency as point
+    # n - 1 - i, so evaluate the first half of each axis and mirror it
+    n_rows, n_cols = uu.shape
+    half_rows, half_cols = (n_rows + 1) // 2, (n_cols + 1) // 2
+    H = function(uu[:half_rows, :half_cols], vv[:half_rows, :half_cols])  # noqa: N806
+    H = np.concatenate((H, H[..., : n_cols // 2][..., ::-1]), axis=-1)  # noqa: N806
+    H = np.concatenate((H, H[..., : n_rows // 2, :][..., ::-1, :]), axis=-2)  # noqa: N806
+
+    return H
+
+
+@overload
+def otf_to_psf(
+    otf: np.ndarray,
+    df: float,
+    dx_out: float,
+    energy_threshold: float = ...,
+    return_energy_curve: Literal[False] = ...,
+) -> np.ndarray: ...
+
+
+@overload
+def otf_to_psf(
+    otf: np.ndarray,
+    df: float,
+    dx_out: float,
+    energy_threshold: float = ...,
+    *,
+    return_energy_curve: Literal[True],
+) -> Tuple[np.ndarray, np.ndarray]: ...
+
+
+@instrumentation.instrumented("otf_to_psf")
+def otf_to_psf(
+    otf: np.ndarray,
+    df: float,
+    dx_out: float,
+    energy_threshold: float = psf_energy_threshold,
+    return_energy_curve: bool = False,
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
     """Transform an optical transfer function into a point spread function (i.e., image space blur filter).
 
+    The kernel is cropped to the smallest centered square, from 10 samples
+    on in steps of 5, that holds more than 'energy_threshold' of its energy.
+    The energy of each square is accumulated from the frames between
+    successive squares, so the search reads each kernel sample at most once.
+
     :param otf:
         Complex optical transfer function (OTF)
     :param df:
@@ -914,10 +1160,21 @@ def otf_to_psf(otf: np.ndarray, df: float, dx_out: float) -> np.ndarray:
         desired sample spacing of the point spread function (radians);
         WARNING: dx_out must be small enough to properly sample the blur
         kernel
+    :param energy_threshold:
+        fraction of the kernel energy that the cropped kernel must hold
+    :param return_energy_curve:
+        if True, the ensquared energy curve is returned as well
 
     :return:
         psf:
             blur kernel
+        energy_curve:
+            only if return_energy_curve is True; 2xN array whose first row is
+            the side length k (output samples) of the centered k x k square,
+            which has k + 1 samples when k and the kernel size differ in
+            parity, and whose second row is the fraction of the uncropped
+            kernel energy inside it, for k from 1 to the largest kernel
+            dimension
 
     :raises:
         IndexError:
@@ -930,47 +1187,87 @@ def otf_to_psf(otf: np.ndarray, df: float, dx_out: float) -> np.ndarray:
         raise ImportError(
             "OpenCV not found. Please install 'pybsm[graphics]' or 'pybsm[headless]'."
         )
-    # transform the psf
-    psf = np.real(np.fft.fftshift(np.fft.ifft2(np.fft.fftshift(otf))))
+    import cv2
+
+    # transform the psf; the centered OTF is shifted with ifftshift so that
+    # zero frequency lands on the first sample for odd sizes too
+    psf = np.real(np.fft.fftshift(np.fft.ifft2(np.fft.ifftshift(otf))))
 
     # determine image space sampling
     dx_in = 1 / (otf.shape[0] * df)
 
-    # resample to the desired sample size
-    new_x = max([1, int(psf.shape[1] * dx_in / dx_out)])
-    new_y = max([1, int(psf.shape[0] * dx_in / dx_out)])
+    # resample to the desired sample size; the small tolerance keeps fields
+    # of view that are a whole number of output samples from being truncated
+    # by rounding error
+    new_x = max([1, int(psf.shape[1] * dx_in / dx_out + 1e-9)])
+    new_y = max([1, int(psf.shape[0] * dx_in / dx_out + 1e-9)])
     psf = cv2.resize(psf, (new_x, new_y)).astype(np.float64)
 
     # ensure that the psf sums to 1
     psf = psf / psf.sum()
 
-    # crop function for the desired kernel size
-    get_middle = lambda x, k_size: x[  # noqa: E731
-        tuple(
-            [
-                slice(
-                    int(np.floor(d / 2 - k_size / 2)),
-                    int(np.ceil(d / 2 + k_size / 2)),
-                )
-                for d in x.shape
-            ]
-        )
-    ]
+    # find the support region of the blur kernel: the smallest candidate
+    # square that holds energy_threshold of the energy, or the largest one
+    candidates = np.arange(10, np.min(otf.shape), 5)
+    energy = _ensquared_energy(psf, candidates, energy_threshold)
+    if candidates.size == 0:
+        k_size = max(psf.shape)
+    else:
+        k_size = candidates[energy.size - 1]
 
-    # find the support region of the blur kernel
-    for ii in np.arange(10, np.min(otf.shape), 5):
-        psf_out = get_middle(psf, ii)
-        if psf_out.sum() > 0.95:  # note the 0.95 is heuristic (but seems to work well)
-            break
+    (r_0, r_1), (c_0, c_1) = (_center_crop_bounds(d, k_size) for d in psf.shape)
+    psf_out = psf[r_0:r_1, c_0:c_1]
 
     # make up for cropped out portions of the psf
     psf_out = psf_out / psf_out.sum()  # bug fix 3 April 2020
 
+    if return_energy_curve:
+        sizes = np.arange(1, max(psf.shape) + 1)
+        return psf_out, np.vstack([sizes, _ensquared_energy(psf, sizes)])
     return psf_out
 
 
+def _center_crop_bounds(d: int, k_size: int) -> Tuple[int, int]:
+    """Returns the start and stop indices of the centered crop of size k_size from an axis of length d."""
+    start = min(max(int(np.floor((d - k_size) / 2)), 0), d)
+    stop = min(max(int(np.ceil((d + k_size) / 2)), 0), d)
+    return start, stop
+
+
+def _ensquared_energy(psf: np.ndarray, sizes: np.ndarray, threshold: Optional[float] = None) -> np.ndarray:
+    """Returns the energy of psf inside its centered k x k crops for increasing sizes k.
+
+    Each crop's energy is the previous one's plus the frame between them, so
+    the cost grows with the area of the largest crop rather than with the sum
+    of the areas.  If threshold is given, the sizes after the first crop
+    holding more than threshold are skipped.
+    """
+    energy = np.empty(len(sizes))
+    r_0 = r_1 = psf.shape[0] // 2
+    c_0 = c_1 = psf.shape[1] // 2
+    total = 0.0
+    for n, k_size in enumerate(sizes):
+        (new_r_0, new_r_1), (new_c_0, new_c_1) = (_center_crop_bounds(d, k_size) for d in psf.shape)
+        total += (
+            psf[new_r_0:r_0, new_c_0:new_c_1].sum()
+            + psf[r_1:new_r_1, new_c_0:new_c_1].sum()
+            + psf[r_0:r_1, new_c_0:c_0].sum()
+            + psf[r_0:r_1, c_1:new_c_1].sum()
+        )
+        energy[n] = total
+        r_0, r_1, c_0, c_1 = new_r_0, new_r_1, new_c_0, new_c_1
+        if threshold is not None and total > threshold:
+            return energy[: n + 1]
+
+    return energy
+
+
 def weighted_by_wavelength(
-    wavelengths: np.ndarray, weights: np.ndarray, my_function: Callable
+    wavelengths: np.ndarray,
+    weights: np.ndarray,
+    my_function: Callable,
+    vectorized: bool = False,
+    max_bytes: int = 2**20,
 ) -> np.ndarray:
     """Returns a wavelength weighted composite array based on my_function.
 
@@ -983,6 +1280,17 @@ def weighted_by_wavelength(
         a lambda function parameterized by wavelength; e.g.
         otfFunction = lambda wavelengths: pybsm.otf.functional.circular_aperture_OTF
         (uu,vv,wavelengths,D,eta)
+    :param vectorized:
+        if True, my_function is called with 1-D arrays of wavelengths and must
+        return its results stacked along a new first axis, e.g.
+        lambda wavelengths: circular_aperture_OTF(uu, vv,
+        wavelengths[:, np.newaxis, np.newaxis], D, eta) for 2-D uu and vv.
+        The weighted sum is then computed as a tensor contraction over chunks
+        of wavelengths instead of one wavelength at a time.
+    :param max_bytes:
+        approximate size in bytes of the my_function results evaluated at
+        once when vectorized is True; the default keeps each chunk and the
+        temporaries of typical OTF models in cache
 
     :return:
         weighted_fcn:
@@ -997,14 +1305,31 @@ def weighted_by_wavelength(
         Output can be nan if all weights are 0.
     """
     weights = weights / weights.sum()
-    weighted_fcn = weights[0] * my_function(wavelengths[0])
 
-    for wii in wavelengths[1:]:
-        weighted_fcn = weighted_fcn + weights[wavelengths == wii] * my_function(wii)
+    if not vectorized:
+        weighted_fcn = weights[0] * my_function(wavelengths[0])
+        for i in range(1, wavelengths.size):
+            weighted_fcn = weighted_fcn + weights[i] * my_function(wavelengths[i])
+        return weighted_fcn
+
+    if wavelengths.size == 0 or weights.size < wavelengths.size:
+        raise IndexError("wavelengths must not be empty and every wavelength must have a weight")
+
+    # evaluate the first wavelength on its own to size the chunks
+    weighted_fcn = np.tensordot(weights[:1], my_function(wavelengths[:1]), axes=1)
+    chunk_size = max(1, int(max_bytes // max(weighted_fcn.nbytes, 1)))
+    for start in range(1, wavelengths.size, chunk_size):
+        stop = min(start + chunk_size, wavelengths.size)
+        weighted_fcn = weighted_fcn + np.tensordot(weights[start:stop], my_function(wavelengths[start:stop]), axes=1)
 
     return weighted_fcn
 
 
+def _expand_wavelengths(wavelengths: np.ndarray, ndim: int) -> np.ndarray:
+    """Appends ndim axes to a 1-D wavelength array so that it broadcasts against ndim-dimensional frequencies."""
+    return np.reshape(wavelengths, np.shape(wavelengths) + (1,) * ndim)
+
+
 def coherence_diameter(lambda0: float, z_path: np.ndarray, cn2: np.ndarray) -> float:
     """Improvement / replacement for calculation of Fried's coherence diameter (m) for spherical wave propagation.
 
@@ -1050,8 +1375,156 @@ def coherence_diameter(lambda0: float, z_path: np.ndarray, cn2: np.ndarray) -> f
     return r0
 
 
+def slant_path_coherence_diameter(
+    altitude: Union[float, np.ndarray],
+    slant_range: Union[float, np.ndarray],
+    ha_wind_speed: Union[float, np.ndarray],
+    cn2_at_1m: Union[float, np.ndarray],
+    rtol: Optional[float] = None,
+) -> Union[float, np.ndarray]:
+    """Fried's coherence diameter (m) at 1 um along a slant path from a target on the ground to a sensor.
+
+    The structure parameter follows the Hufnagel-Valley profile
+    (hufnagel_valley_turbulence_profile) at the heights along the path given
+    by altitude_along_slant_path, and the path integral is that of
+    coherence_diameter.  Scale to other wavelengths by lambda^6/5.
+
+    Results for scalar arguments are cached.  Array arguments are broadcast
+    against each other and the coherence diameter of every geometry is
+    computed at once.
+
+    :param altitude:
+        height of the sensor above the ground (m)
+    :param slant_range:
+        line-of-sight range between the sensor and the target (m)
+    :param ha_wind_speed:
+        the high altitude windspeed (m/s)
+    :param cn2_at_1m:
+        the refractive index structure parameter "near the ground" (e.g. at
+        h = 1 m)
+    :param rtol:
+        if None, the path integral is the trapezoidal rule over the 10,000
+        samples of altitude_along_slant_path, as in coherence_diameter;
+        otherwise it is computed by adaptive quadrature (scipy.integrate.quad)
+        to this relative tolerance, e.g. 1e-6, which takes far fewer samples
+        on long paths
+
+    :return:
+        r0:
+            correlation diameter (m) at 1 um
+
+    :raises:
+        ZeroDivisionError:
+            if slant_range is 0
+    """
+    if np.any(np.asarray(slant_range) == 0):
+        raise ZeroDivisionError("slant_range must not be 0")
+
+    if np.ndim(altitude) == np.ndim(slant_range) == np.ndim(ha_wind_speed) == np.ndim(cn2_at_1m) == 0:
+        return _cached_slant_path_coherence_diameter(
+            float(altitude), float(slant_range), float(ha_wind_speed), float(cn2_at_1m), rtol
+        )
+
+    arrays = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (altitude, slant_range, ha_wind_speed, cn2_at_1m))
+    )
+    altitude, slant_range, ha_wind_speed, cn2_at_1m = (x.ravel() for x in arrays)
+    r0 = _slant_path_coherence_diameter(altitude, slant_range, ha_wind_speed, cn2_at_1m, rtol)
+
+    return r0.reshape(arrays[0].shape)
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_slant_path_coherence_diameter(
+    altitude: float, slant_range: float, ha_wind_speed: float, cn2_at_1m: float, rtol: Optional[float]
+) -> float:
+    """Scalar slant_path_coherence_diameter, cached on the geometry and turbulence profile."""
+    r0 = _slant_path_coherence_diameter(
+        np.array([altitude]), np.array([slant_range]), np.array([ha_wind_speed]), np.array([cn2_at_1m]), rtol
+    )
+    return float(r0[0])
+
+
+def _slant_path_coherence_diameter(
+    altitude: np.ndarray,
+    slant_range: np.ndarray,
+    ha_wind_speed: np.ndarray,
+    cn2_at_1m: np.ndarray,
+    rtol: Optional[float],
+) -> np.ndarray:
+    """slant_path_coherence_diameter for 1-D arrays of geometries."""
+    if rtol is None:
+        sp_integral = _hv_path_integral(altitude, slant_range, ha_wind_speed, cn2_at_1m)
+    else:
+        sp_integral = np.array(
+            [
+                _hv_path_integral_quad(altitude[i], slant_range[i], ha_wind_speed[i], cn2_at_1m[i], rtol)
+                for i in range(altitude.size)
+            ]
+        )
+
+    return (sp_integral * 0.423 * (2 * np.pi / 1.0e-6) ** 2) ** (-3.0 / 5.0)
+
+
+def _hv_path_integral(
+    altitude: np.ndarray, slant_range: np.ndarray, ha_wind_speed: np.ndarray, cn2_at_1m: np.ndarray
+) -> np.ndarray:
+    """Trapezoidal rule path integral of coherence_diameter for 1-D arrays of geometries.
+
+    The path is sampled as in altitude_along_slant_path.  The samples are at
+    the same fractions of every path, so the trapezoidal rule and the
+    (z / z_max)^(5/3) factor are one weight vector shared by all geometries.
+    """
+    n_samples = 10000
+    frac = np.linspace(0.0, 1.0, n_samples)
+    path_weights = frac ** (5.0 / 3.0) / (n_samples - 1)
+    path_weights[[0, -1]] /= 2.0
+
+    # altitude_along_slant_path measures the path from the sensor and then
+    # reverses the heights, so reverse the weights instead
+    path_weights = path_weights[::-1]
+
+    # a few geometries at a time keeps the temporaries in cache
+    chunk_size = 8
+    sp_integral = np.empty(altitude.shape)
+    for start in range(0, altitude.size, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # the law of cosines, as in nadir_angle; the arccos makes impossible
+        # geometries nan
+        a = r_earth + altitude[chunk][:, np.newaxis]
+        nadir = np.arccos(
+            (a**2 + slant_range[chunk][:, np.newaxis] ** 2 - r_earth**2)
+            / (2.0 * a * slant_range[chunk][:, np.newaxis])
+        )
+        b = slant_range[chunk][:, np.newaxis] * frac
+        h_path = np.sqrt(a**2 + b**2 - 2 * a * b * np.cos(nadir)) - r_earth
+        cn2 = hufnagel_valley_turbulence_profile(
+            h_path, ha_wind_speed[chunk][:, np.newaxis], cn2_at_1m[chunk][:, np.newaxis]
+        )
+        sp_integral[chunk] = (cn2 @ path_weights) * slant_range[chunk]
+
+    return sp_integral
+
+
+def _hv_path_integral_quad(
+    altitude: float, slant_range: float, ha_wind_speed: float, cn2_at_1m: float, rtol: float
+) -> float:
+    """Path integral of coherence_diameter for one geometry by adaptive quadrature to relative tolerance rtol."""
+    cos_nadir = math.cos(nadir_angle(0.0, altitude, slant_range))
+    a = r_earth + altitude
+
+    def integrand(z: float) -> float:
+        b = slant_range - z  # distance from the sensor
+        h = math.sqrt(a**2 + b**2 - 2 * a * b * cos_nadir) - r_earth
+        return hufnagel_valley_turbulence_profile(h, ha_wind_speed, cn2_at_1m) * (z / slant_range) ** (5.0 / 3.0)
+
+    sp_integral, _ = integrate.quad(integrand, 0.0, slant_range, epsabs=0.0, epsrel=rtol, limit=200)
+
+    return sp_integral
+
+
 def hufnagel_valley_turbulence_profile(
-    h: np.ndarray, v: float, cn2_at_1m: float
+    h: Union[float, np.ndarray], v: Union[float, np.ndarray], cn2_at_1m: Union[float, np.ndarray]
 ) -> np.ndarray:
     """Replaces IBSM Equations 3-6 through 3-8.  The Hufnagel-Valley Turbulence profile.
 
@@ -1158,32 +1631,44 @@ def image_domain_defocus_radii(D: float, dz: float, f: float) -> float:  # noqa:
     return w
 
 
-def slice_otf(otf: np.ndarray, ang: float) -> np.ndarray:
+def slice_otf(otf: np.ndarray, ang: Union[float, np.ndarray]) -> np.ndarray:
     """Returns a one dimensional slice of a 2D OTF (or MTF) along the direction specified by the input angle.
 
+    Only the points on the slice are sampled, by bilinear interpolation;
+    points beyond the edge of otf take the value of the nearest edge sample.
+
     :param otf:
-        OTF defined by spatial frequencies (u,v) (unitless)
+        OTF defined by spatial frequencies (u,v) (unitless); columns run over
+        u from -1 to 1 and rows over v from 1 to -1 (normalized)
     :param ang:
-        slice angle (radians); a 0 radian slice is along the u axis.  The
-        angle rotates counterclockwise. Angle pi/2 is along the v axis.
+        slice angle (radians), or an array of angles; a 0 radian slice is
+        along the u axis.  The angle rotates counterclockwise. Angle pi/2 is
+        along the v axis.
     :return:
         o_slice:
             one-dimensional OTF in the direction of angle; the sample spacing
-            of o_slice is the same as the original otf
+            of o_slice is the same as the original otf.  For an array of
+            angles, an (n_angles, n_r) array with one slice per row
     """
-    u = np.linspace(-1.0, 1.0, otf.shape[0])
-    v = np.linspace(1.0, -1.0, otf.shape[1])
+    n_rows, n_cols = otf.shape
+    u = np.linspace(-1.0, 1.0, n_cols)
     r = np.arange(0.0, 1.0, u[1] - u[0])
 
-    f = interpolate.interp2d(u, v, otf)
-    o_slice = np.diag(f(r * np.cos(ang), r * np.sin(ang)))
-    # the interpolator, f, calculates a bunch of points that we don't really
-    # need since everything but the diagonal is thrown away.  It works but
-    # it's inefficient.
+    angles = np.asarray(ang, dtype=float)
+    u_points = np.multiply.outer(np.cos(angles), r)
+    v_points = np.multiply.outer(np.sin(angles), r)
 
-    return o_slice
+    # fractional array indices of the points on the slice
+    cols = (u_points + 1.0) / 2.0 * (n_cols - 1)
+    rows = (1.0 - v_points) / 2.0 * (n_rows - 1)
+    o_slice = ndimage.map_coordinates(
+        otf, [rows.ravel(), cols.ravel()], order=1, mode="nearest"
+    )
 
+    return o_slice.reshape(u_points.shape)
 
+
+@instrumentation.instrumented("apply_otf_to_image")
 def apply_otf_to_image(
     ref_img: np.ndarray,
     ref_gsd: float,
@@ -1191,6 +1676,11 @@ def apply_otf_to_image(
     otf: np.ndarray,
     df: float,
     ifov: float,
+    psf: Optional[np.ndarray] = None,
+    method: str = "auto",
+    workers: Optional[int] = None,
+    tile_size: Optional[int] = None,
+    tile_callback: Optional[TileCallback] = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Applies OTF to ideal reference image to simulate real imaging.
 
@@ -1248,19 +1738,60 @@ def apply_otf_to_image(
     :param ifov:
         instantaneous field of view (iFOV) of the virtual imaging system that
         we are modeling (radians)
+    :param psf:
+        optional blur kernel previously computed by otf_to_psf for the same
+        'otf', 'df', 'ref_gsd' and 'ref_range'; when given, the conversion
+        from the OTF is skipped
+    :param method:
+        how the image is filtered; "direct" uses cv2.filter2D with the blur
+        kernel, "fft" gives the same result by multiplying spectra (faster when
+        the kernel is much larger than the image), "auto" chooses between them
+        using fft_kernel_ratio, and "otf" skips the blur kernel altogether and
+        multiplies the image spectrum by the OTF resampled to the image's
+        frequency grid; "otf" avoids the cropping and resizing of the kernel
+        in otf_to_psf, so its results differ slightly from the other methods
+        (by up to about a pixel of shift for asymmetric kernels); "fused"
+        evaluates the blur kernel only at the output samples, without
+        allocating the filtered image, which gives the "direct" result up to
+        floating point rounding and is faster when the kernel is small
+        relative to the decimation (see fused_work_ratio, which "auto" also
+        uses); integer images give a float64 result with "fused"
+    :param workers:
+        if given, the image is filtered with cv2.filter2D and resampled tile
+        by tile on a pool of this many threads (1 processes the tiles in the
+        calling thread); each output tile is interpolated from a block of the
+        filtered image, which is filtered from a halo-padded block of
+        'ref_img'.  The result is identical for any number of workers, and
+        differs from the whole-image result (workers=None) only by floating
+        point rounding, since cv2.filter2D sums in a different order for
+        blocks than for the whole image when the kernel is larger than 7x7.
+        Integer images give a float64 result.  Requires method "auto" or
+        "direct"
+    :param tile_size:
+        side length of the tiles in reference image pixels when 'workers' is
+        given; defaults to filter_tile_size
+    :param tile_callback:
+        called with the output row and column ranges ((y_0, y_1), (x_0, x_1))
+        and the wall time (s) of every tile once it is done, from the thread
+        that processed it, when 'workers' is given
 
     :return:
         sim_img:
             the blurred and resampled image
         sim_psf :
             the resampled blur kernel (useful for checking the health of the
-            simulation)
+            simulation); with method="otf" it spans the reflected image period
+            and wraps around if the kernel is larger than that
 
     :raises:
         ZeroDivisionError:
             if ref_range is 0 or ifov is 0
         IndexError:
             if ref_img or otf are not 2D arrays
+        ValueError:
+            if method is not one of "auto", "direct", "fft", "otf" or
+            "fused", if workers is less than 1, or if workers is given with
+            method "fft", "otf" or "fused"
 
     :WARNING:
         ref_gsd *must* be small enough to properly sample the blur kernel. As a
@@ -1282,20 +1813,382 @@ def apply_otf_to_image(
         raise ImportError(
             "OpenCV not found. Please install 'pybsm[graphics]' or 'pybsm[headless]'."
         )
-    psf = otf_to_psf(otf, df, 2 * np.arctan(ref_gsd / 2 / ref_range))
+    import cv2
 
-    # filter the image
-    blur_img = cv2.filter2D(ref_img, -1, psf)
+    if method not in ("auto", "direct", "fft", "otf", "fused"):
+        raise ValueError(f"Unknown filtering method '{method}'.")
+
+    if workers is not None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if method not in ("auto", "direct"):
+            raise ValueError(f"Tiled filtering does not support the '{method}' method.")
+        if psf is None:
+            psf = otf_to_psf(otf, df, 2 * np.arctan(ref_gsd / 2 / ref_range))
+
+        sim_img = _filter_resample_tiles(
+            ref_img,
+            psf,
+            ref_gsd / ref_range,
+            ifov,
+            filter_tile_size if tile_size is None else tile_size,
+            workers,
+            tile_callback,
+        )
+        with instrumentation.stage("apply_otf_to_image.resample"):
+            sim_psf = resample_2D(psf, ref_gsd / ref_range, ifov)
 
-    # resample the image to the camera's ifov
-    sim_img = resample_2D(blur_img, ref_gsd / ref_range, ifov)
+        return sim_img, sim_psf
 
-    # resample psf (good for health checks on the simulation)
-    sim_psf = resample_2D(psf, ref_gsd / ref_range, ifov)
+    if method == "otf":
+        with instrumentation.stage("apply_otf_to_image.filter"):
+            blur_img, psf = _filter_with_otf(
+                ref_img, otf, df, 2 * np.arctan(ref_gsd / 2 / ref_range)
+            )
+    else:
+        if psf is None:
+            psf = otf_to_psf(otf, df, 2 * np.arctan(ref_gsd / 2 / ref_range))
+
+        if method == "auto":
+            floating = np.issubdtype(ref_img.dtype, np.floating)
+            use_fft = ref_img.ndim == 2 and floating and psf.size >= fft_kernel_ratio * ref_img.size
+            if use_fft:
+                method = "fft"
+            elif floating and psf.size >= 25:
+                out_shape = _resampled_shape(ref_img.shape, ref_gsd / ref_range, ifov)
+                fused_work = (psf.shape[0] + 1) * (psf.shape[1] + 1) * out_shape[0] * out_shape[1]
+                use_fused = fused_work <= fused_work_ratio * ref_img.shape[0] * ref_img.shape[1]
+                method = "fused" if use_fused else "direct"
+            else:
+                method = "direct"
+
+        if method == "fused":
+            with instrumentation.stage("apply_otf_to_image.fused"):
+                sim_img = _filter_resample_fused(ref_img, psf, ref_gsd / ref_range, ifov)
+            with instrumentation.stage("apply_otf_to_image.resample"):
+                sim_psf = resample_2D(psf, ref_gsd / ref_range, ifov)
+
+            return sim_img, sim_psf
+
+        # filter the image
+        with instrumentation.stage("apply_otf_to_image.filter"):
+            if method == "fft":
+                blur_img = _filter_with_fft(ref_img, psf)
+            else:
+                blur_img = cv2.filter2D(ref_img, -1, psf)
+
+    with instrumentation.stage("apply_otf_to_image.resample"):
+        # resample the image to the camera's ifov
+        sim_img = resample_2D(blur_img, ref_gsd / ref_range, ifov)
+
+        # resample psf (good for health checks on the simulation)
+        sim_psf = resample_2D(psf, ref_gsd / ref_range, ifov)
 
     return sim_img, sim_psf
 
 
+def _reflected_period(img: np.ndarray) -> np.ndarray:
+    """Returns one period of the reflect-101 extension of img, i.e. cv2.BORDER_REFLECT_101.
+
+    The extension of an N pixel axis repeats every 2 (N - 1) pixels, so
+    filtering it is a circular convolution over one period.
+    """
+    if img.ndim != 2:
+        raise IndexError("Frequency domain filtering requires a 2D image.")
+    period = [max(2 * (n - 1), 1) for n in img.shape]
+    return np.pad(
+        img, ((0, period[0] - img.shape[0]), (0, period[1] - img.shape[1])), mode="reflect"
+    )
+
+
+def _filter_with_fft(img: np.ndarray, psf: np.ndarray) -> np.ndarray:
+    """Reproduces cv2.filter2D(img, -1, psf) by multiplying spectra.
+
+    The kernel is folded onto one period of the reflected image, so the cost
+    does not depend on the kernel size.
+    """
+    extended = _reflected_period(img)
+    period = extended.shape
+
+    # fold the kernel, anchored at its center as cv2.filter2D does, onto the
+    # period
+    rows = (np.arange(psf.shape[0]) - psf.shape[0] // 2) % period[0]
+    cols = (np.arange(psf.shape[1]) - psf.shape[1] // 2) % period[1]
+    folded_rows = np.zeros((period[0], psf.shape[1]))
+    np.add.at(folded_rows, rows, psf)
+    kernel = np.zeros((period[1], period[0]))
+    np.add.at(kernel, cols, folded_rows.T)
+
+    # cv2.filter2D correlates, hence the conjugate
+    blur_img = np.fft.irfft2(
+        np.fft.rfft2(extended) * np.conj(np.fft.rfft2(kernel.T)), s=period
+    )
+
+    return blur_img[: img.shape[0], : img.shape[1]].astype(img.dtype, copy=False)
+
+
+def _filter_with_otf(
+    img: np.ndarray, otf: np.ndarray, df: float, dx: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Filters img by the OTF resampled to the frequency grid of its reflected period.
+
+    The OTF is bilinearly interpolated, is zero beyond its extent, and is
+    treated the way otf_to_psf and cv2.filter2D treat it, so only the energy
+    cropping of otf_to_psf is skipped.
+
+    :return:
+        blur_img:
+            the filtered image
+        psf:
+            the blur kernel at the image sampling, centered on one period
+    """
+    if otf.ndim != 2:
+        raise IndexError("otf must be a 2D array.")
+    extended = _reflected_period(img)
+    period = extended.shape
+
+    # bilinear interpolation weights along each axis, with zero padding
+    # beyond the sampled frequencies
+    padded_otf = np.pad(otf, 1)
+    weights = []
+    for axis in range(2):
+        n = otf.shape[axis]
+        position = np.fft.fftfreq(period[axis], dx) / df + n // 2 + 1
+        position = np.clip(position, 0, n + 1)
+        index = np.minimum(np.floor(position).astype(int), n)
+        weights.append((index, position - index))
+    (rows, row_weights), (cols, col_weights) = weights
+    sampled = (
+        padded_otf[rows] * (1 - row_weights[:, np.newaxis])
+        + padded_otf[rows + 1] * row_weights[:, np.newaxis]
+    )
+    sampled = sampled[:, cols] * (1 - col_weights) + sampled[:, cols + 1] * col_weights
+
+    # transfer function of the real kernel np.real(ifft2(otf)), conjugated
+    # because cv2.filter2D correlates; index -k holds the frequency -f
+    negated = np.roll(sampled[::-1, ::-1], 1, axis=(0, 1))
+    transfer = (np.conj(sampled) + negated) / 2
+    transfer /= transfer[0, 0].real
+
+    blur_img = np.real(np.fft.ifft2(np.fft.fft2(extended) * transfer))
+    psf = np.fft.fftshift(np.real(np.fft.ifft2(np.conj(transfer))))
+
+    return blur_img[: img.shape[0], : img.shape[1]], psf
+
+
+def _filter_resample_fused(
+    img: np.ndarray, psf: np.ndarray, dx_in: float, dx_out: float, block_bytes: int = 2**25
+) -> np.ndarray:
+    """Filters img by psf as cv2.filter2D does and resamples it from dx_in to dx_out as cv2.resize does, in one pass.
+
+    Each output pixel interpolates bilinearly between 2x2 samples of the
+    filtered image, so it is a weighted sum of the (ky + 1) x (kx + 1)
+    reference pixels under the kernel placed at those samples.  For every row
+    of that window, the window columns of each output pixel are gathered and
+    multiplied by the kernel rows and columns that fall on them for each of
+    the 2x2 samples, which are interpolated at the end.  Only the output
+    pixels are evaluated, in blocks of output rows whose gathered windows
+    take about 'block_bytes'.
+    """
+    if img.ndim == 3:
+        return np.stack(
+            [_filter_resample_fused(img[..., c], psf, dx_in, dx_out, block_bytes) for c in range(img.shape[2])],
+            axis=-1,
+        )
+
+    out_shape = _resampled_shape(img.shape, dx_in, dx_out)
+    rows = _linear_resize_coefficients(img.shape[0], out_shape[0])
+    cols = _linear_resize_coefficients(img.shape[1], out_shape[1])
+    k_y, k_x = psf.shape
+
+    # the window columns of each output column, anchored as in cv2.filter2D
+    taps = _reflect_101(
+        cols[0][:, np.newaxis] + np.arange(k_x + 1) - k_x // 2, img.shape[1]
+    ).ravel()
+
+    # weights[u, 2 a + b, v] = psf[u - a, v - b] weighs window pixel (u, v)
+    # for the filtered sample (r0 + a, c0 + b), and is zero off the kernel
+    padded = np.pad(psf, 1)
+    weights = np.empty((k_y + 1, 4, k_x + 1))
+    for a in range(2):
+        for b in range(2):
+            weights[:, 2 * a + b] = padded[1 - a : k_y + 2 - a, 1 - b : k_x + 2 - b]
+
+    sim_img = np.empty(out_shape, dtype=img.dtype if np.issubdtype(img.dtype, np.floating) else np.float64)
+    block_rows = max(1, block_bytes // (8 * max(img.shape[1], taps.size, 1)))
+    for y_0 in range(0, out_shape[0], block_rows):
+        y_1 = min(y_0 + block_rows, out_shape[0])
+        samples = np.zeros(((y_1 - y_0) * out_shape[1], 4))
+        for u in range(k_y + 1):
+            window_rows = _reflect_101(rows[0][y_0:y_1] + u - k_y // 2, img.shape[0])
+            window = np.asarray(img[window_rows], dtype=np.float64).take(taps, axis=1)
+            samples += window.reshape(-1, k_x + 1) @ weights[u].T
+
+        samples = samples.reshape(y_1 - y_0, out_shape[1], 4)
+        row_weight = rows[2][y_0:y_1, np.newaxis]
+        col_weight = cols[2]
+        sim_img[y_0:y_1] = (1.0 - row_weight) * (
+            samples[..., 0] * (1.0 - col_weight) + samples[..., 1] * col_weight
+        ) + row_weight * (samples[..., 2] * (1.0 - col_weight) + samples[..., 3] * col_weight)
+
+    return sim_img
+
+
+def _reflect_101(index: np.ndarray, n: int) -> np.ndarray:
+    """Maps indices outside 0..n-1 into it as cv2.BORDER_REFLECT_101 does (..., 2, 1, 0, 1, 2, ...)."""
+    if n == 1:
+        return np.zeros_like(index)
+    period = 2 * (n - 1)
+    index = np.abs(index) % period
+    return np.where(index >= n, period - index, index)
+
+
+def _filter_resample_tiles(
+    img: np.ndarray,
+    psf: np.ndarray,
+    dx_in: float,
+    dx_out: float,
+    tile_size: int,
+    workers: int,
+    tile_callback: Optional[TileCallback],
+) -> np.ndarray:
+    """Filters img by psf and resamples it from dx_in to dx_out tile by tile on a pool of 'workers' threads.
+
+    Every tile is written to its own part of the output, so the result does
+    not depend on the order in which the tiles are processed.
+    """
+    out_shape = _resampled_shape(img.shape, dx_in, dx_out)
+    rows = _linear_resize_coefficients(img.shape[0], out_shape[0])
+    cols = _linear_resize_coefficients(img.shape[1], out_shape[1])
+    dtype = img.dtype if np.issubdtype(img.dtype, np.floating) else np.float64
+    sim_img = np.empty(out_shape + img.shape[2:], dtype=dtype)
+
+    def process(tile: Tuple[Tuple[int, int], Tuple[int, int]]) -> None:
+        start = time.perf_counter()
+        (y_0, y_1), (x_0, x_1) = tile
+        sim_img[y_0:y_1, x_0:x_1] = _filter_resample_tile(img, psf, rows, cols, tile, "apply_otf_to_image")
+        if tile_callback is not None:
+            tile_callback(tile, time.perf_counter() - start)
+
+    out_tile = (
+        max(1, tile_size * out_shape[0] // img.shape[0]),
+        max(1, tile_size * out_shape[1] // img.shape[1]),
+    )
+    tiles = list(_tiles(out_shape, out_tile))
+    if workers == 1:
+        for tile in tiles:
+            process(tile)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # consuming the results raises the first error of any tile
+            list(executor.map(process, tiles))
+
+    return sim_img
+
+
+def _filter_resample_tile(
+    img: np.ndarray,
+    psf: np.ndarray,
+    rows: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    cols: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    tile: Tuple[Tuple[int, int], Tuple[int, int]],
+    stage: str,
+) -> np.ndarray:
+    """Returns a tile of img filtered by psf with cv2.filter2D and resampled on the grid of rows and cols.
+
+    The tile, given by its output row and column ranges, is interpolated from
+    a block of the filtered image, which is filtered from that block of img
+    plus a halo of half the kernel size; cv2.filter2D reflects the block at
+    its edges, which matches the whole image only where the block is at the
+    edge of the image, and the halo keeps the other edges out of the result.
+    The filtering and resampling are recorded as the stages 'stage'.filter
+    and 'stage'.resample.
+
+    :param rows:
+        the resampling coefficients of the rows, from _linear_resize_coefficients
+    :param cols:
+        the resampling coefficients of the columns
+    """
+    import cv2
+
+    (y_0, y_1), (x_0, x_1) = tile
+    halo = (psf.shape[0] // 2, psf.shape[1] // 2)
+    r_0 = max(rows[0][y_0] - halo[0], 0)
+    r_1 = min(rows[1][y_1 - 1] + 1 + halo[0], img.shape[0])
+    c_0 = max(cols[0][x_0] - halo[1], 0)
+    c_1 = min(cols[1][x_1 - 1] + 1 + halo[1], img.shape[1])
+
+    with instrumentation.stage(stage + ".filter"):
+        block = cv2.filter2D(np.asarray(img[r_0:r_1, c_0:c_1]), -1, psf)
+
+    with instrumentation.stage(stage + ".resample"):
+        return _resize_linear(
+            block,
+            (rows[0][y_0:y_1] - r_0, rows[1][y_0:y_1] - r_0, rows[2][y_0:y_1]),
+            (cols[0][x_0:x_1] - c_0, cols[1][x_0:x_1] - c_0, cols[2][x_0:x_1]),
+        )
+
+
+def _tiles(
+    shape: Tuple[int, ...], tile_shape: Tuple[int, ...]
+) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """Yields the row and column ranges of the tiles covering the first two axes of an array of the given shape."""
+    for y_0 in range(0, shape[0], tile_shape[0]):
+        for x_0 in range(0, shape[1], tile_shape[1]):
+            yield (y_0, min(y_0 + tile_shape[0], shape[0])), (x_0, min(x_0 + tile_shape[1], shape[1]))
+
+
+def _resampled_shape(shape: Tuple[int, ...], dx_in: float, dx_out: float) -> Tuple[int, int]:
+    """Returns the number of rows and columns resample_2D gives an image of the given shape."""
+    return (
+        int(np.round(shape[0] * dx_in / dx_out)),
+        int(np.round(shape[1] * dx_in / dx_out)),
+    )
+
+
+def _linear_resize_coefficients(n_in: int, n_out: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the input samples and weights that cv2.resize interpolates each output sample from along an axis.
+
+    :return:
+        index_0:
+            first input sample of each output sample
+        index_1:
+            second input sample of each output sample
+        weight:
+            weight of the second sample; the first has 1 - weight
+    """
+    x = (np.arange(n_out) + 0.5) * (n_in / n_out) - 0.5
+    index_0 = np.floor(x).astype(int)
+    weight = x - index_0
+    # outside the input, the edge sample is replicated
+    weight[index_0 < 0] = 0.0
+    index_0[index_0 < 0] = 0
+    weight[index_0 >= n_in - 1] = 0.0
+    index_0[index_0 >= n_in - 1] = n_in - 1
+    index_1 = np.minimum(index_0 + 1, n_in - 1)
+    return index_0, index_1, weight
+
+
+def _resize_linear(
+    img: np.ndarray,
+    rows: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    cols: Tuple[np.ndarray, np.ndarray, np.ndarray],
+) -> np.ndarray:
+    """Bilinearly interpolates img at the rows and columns given by _linear_resize_coefficients.
+
+    This reproduces cv2.resize(img, dsize) with cv2.INTER_LINEAR up to
+    floating point error, but for any block of the output.
+    """
+    col_weight = cols[2].reshape((1, -1) + (1,) * (img.ndim - 2))
+    row_weight = rows[2].reshape((-1,) + (1,) * (img.ndim - 1))
+    img_rows = [img[index] for index in rows[:2]]
+    resized_rows = [
+        img_row[:, cols[0]] * (1.0 - col_weight) + img_row[:, cols[1]] * col_weight for img_row in img_rows
+    ]
+    return resized_rows[0] * (1.0 - row_weight) + resized_rows[1] * row_weight
+
+
+@instrumentation.instrumented("common_OTFs")
 def common_OTFs(  # noqa: N802
     sensor: Sensor,
     scenario: Scenario,
@@ -1310,7 +2203,9 @@ def common_OTFs(  # noqa: N802
 
     This code originally served the NIIRS model but has been abstracted for other
     uses. OTFs for the aperture, detector, turbulence, jitter, drift, wavefront
-    errors, and image filtering are all explicitly considered.
+    errors, and image filtering are all explicitly considered, as are detector
+    aggregation (sensor.n_aggregate) and TDI clocking mismatch
+    (sensor.tdi_beta) when configured.
 
     :param sensor:
         an object from the class sensor
@@ -1345,80 +2240,228 @@ def common_OTFs(  # noqa: N802
     """
     otf = OTF()
 
+    # the OTFs that are products of a function of u and a function of v are
+    # evaluated along the grid axes and broadcast
+    grid_shape = np.broadcast(uu, vv).shape
+    axes = _grid_axes(uu, vv)
+    if axes is not None:
+        u_sep, v_sep = axes[0][np.newaxis, :], axes[1][:, np.newaxis]
+    else:
+        u_sep, v_sep = uu, vv
+
     # aperture OTF
-    ap_function = lambda wavelengths: circular_aperture_OTF(  # noqa: E731
-        uu, vv, wavelengths, sensor.D, sensor.eta
-    )
-    otf.ap_OTF = weighted_by_wavelength(mtf_wavelengths, mtf_weights, ap_function)
+    with instrumentation.stage("common_OTFs.aperture"):
+        def ap_profile(rho: np.ndarray) -> np.ndarray:
+            ap_function = lambda wavelengths: circular_aperture_OTF(  # noqa: E731
+                rho, np.zeros_like(rho), _expand_wavelengths(wavelengths, rho.ndim), sensor.D, sensor.eta
+            )
+            return weighted_by_wavelength(mtf_wavelengths, mtf_weights, ap_function, vectorized=True)
+
+        otf.ap_OTF = radial_OTF(uu, vv, ap_profile)
 
     # turbulence OTF
-    if (
-        scenario.cn2_at_1m > 0.0
-    ):  # this option allows you to turn off turbulence completely
-        # by setting cn2 at the ground level to 0
-        otf.turb_OTF, otf.r0_band = polychromatic_turbulence_OTF(
-            uu,
-            vv,
-            mtf_wavelengths,
-            mtf_weights,
-            scenario.altitude,
-            slant_range,
-            sensor.D,
-            scenario.ha_wind_speed,
-            scenario.cn2_at_1m,
-            int_time * sensor.n_tdi,
-            scenario.aircraft_speed,
-        )
-    else:
-        otf.turb_OTF = np.ones(uu.shape)
-        otf.r0_band = 1e6 * np.ones(uu.shape)
+    with instrumentation.stage("common_OTFs.turbulence"):
+        if (
+            scenario.cn2_at_1m > 0.0
+        ):  # this option allows you to turn off turbulence completely
+            # by setting cn2 at the ground level to 0
+            otf.turb_OTF, otf.r0_band = polychromatic_turbulence_OTF(
+                uu,
+                vv,
+                mtf_wavelengths,
+                mtf_weights,
+                scenario.altitude,
+                slant_range,
+                sensor.D,
+                scenario.ha_wind_speed,
+                scenario.cn2_at_1m,
+                int_time * sensor.n_tdi,
+                scenario.aircraft_speed,
+            )
+        else:
+            otf.turb_OTF = np.ones(uu.shape)
+            otf.r0_band = 1e6 * np.ones(uu.shape)
 
     # detector OTF
-    otf.det_OTF = detector_OTF(uu, vv, sensor.w_x, sensor.w_y, sensor.f)
+    with instrumentation.stage("common_OTFs.detector"):
+        if sensor.n_aggregate > 1:
+            det_OTF = detector_OTF_with_aggregation(  # noqa: N806
+                u_sep, v_sep, sensor.w_x, sensor.w_y, sensor.p_x, sensor.p_y, sensor.f, sensor.n_aggregate
+            )
+        else:
+            det_OTF = detector_OTF(u_sep, v_sep, sensor.w_x, sensor.w_y, sensor.f)  # noqa: N806
+        otf.det_OTF = np.broadcast_to(det_OTF, grid_shape).copy()
+
+    # TDI OTF (clocking rate mismatch), applied along the y direction
+    with instrumentation.stage("common_OTFs.tdi"):
+        if sensor.tdi_beta is not None:
+            otf.tdi_OTF = np.broadcast_to(
+                tdi_OTF(v_sep, sensor.w_y, sensor.n_tdi, sensor.tdi_phases_n, sensor.tdi_beta, sensor.f),
+                grid_shape,
+            ).copy()
+        else:
+            otf.tdi_OTF = np.ones(uu.shape)
 
     # jitter OTF
-    otf.jit_OTF = jitter_OTF(uu, vv, sensor.s_x, sensor.s_y)
+    with instrumentation.stage("common_OTFs.jitter"):
+        otf.jit_OTF = np.broadcast_to(jitter_OTF(u_sep, v_sep, sensor.s_x, sensor.s_y), grid_shape).copy()
 
     # drift OTF
-    otf.drft_OTF = drift_OTF(
-        uu,
-        vv,
-        sensor.da_x * int_time * sensor.n_tdi,
-        sensor.da_y * int_time * sensor.n_tdi,
-    )
-
-    # wavefront OTF
-    wav_function = lambda wavelengths: wavefront_OTF(  # noqa: E731
-        uu,
-        vv,
-        wavelengths,
-        sensor.pv * (sensor.pv_wavelength / wavelengths) ** 2,
-        sensor.L_x,
-        sensor.L_y,
-    )
-    otf.wav_OTF = weighted_by_wavelength(mtf_wavelengths, mtf_weights, wav_function)
+    with instrumentation.stage("common_OTFs.drift"):
+        otf.drft_OTF = np.broadcast_to(
+            drift_OTF(
+                u_sep,
+                v_sep,
+                sensor.da_x * int_time * sensor.n_tdi,
+                sensor.da_y * int_time * sensor.n_tdi,
+            ),
+            grid_shape,
+        ).copy()
+
+    # wavefront OTF; it is rotationally symmetric when the correlation
+    # lengths are equal and otherwise even in u and in v
+    with instrumentation.stage("common_OTFs.wavefront"):
+        def wav_OTF(u: np.ndarray, v: np.ndarray) -> np.ndarray:  # noqa: N802
+            wav_function = lambda wavelengths: wavefront_OTF(  # noqa: E731
+                u,
+                v,
+                _expand_wavelengths(wavelengths, np.ndim(u)),
+                sensor.pv * (sensor.pv_wavelength / _expand_wavelengths(wavelengths, np.ndim(u))) ** 2,
+                sensor.L_x,
+                sensor.L_y,
+            )
+            return weighted_by_wavelength(mtf_wavelengths, mtf_weights, wav_function, vectorized=True)
+
+        if sensor.L_x == sensor.L_y:
+            otf.wav_OTF = radial_OTF(uu, vv, lambda rho: wav_OTF(rho, np.zeros_like(rho)))
+        else:
+            otf.wav_OTF = _even_OTF(uu, vv, wav_OTF)
 
     # filter OTF (e.g. a sharpening filter but it could be anything)
-    if sensor.filter_kernel.shape[0] > 1:
-        # note that we're assuming equal ifovs in the x and y directions
-        otf.filter_OTF = filter_OTF(uu, vv, sensor.filter_kernel, sensor.p_x / sensor.f)
-    else:
-        otf.filter_OTF = np.ones(uu.shape)
+    with instrumentation.stage("common_OTFs.filter"):
+        if sensor.filter_kernel.shape[0] > 1:
+            # note that we're assuming equal ifovs in the x and y directions
+            otf.filter_OTF = filter_OTF(uu, vv, sensor.filter_kernel, sensor.p_x / sensor.f)
+        else:
+            otf.filter_OTF = np.ones(uu.shape)
 
     # system OTF
-    otf.system_OTF = (
-        otf.ap_OTF
-        * otf.turb_OTF
-        * otf.det_OTF
-        * otf.jit_OTF
-        * otf.drft_OTF
-        * otf.wav_OTF
-        * otf.filter_OTF
-    )
+    with instrumentation.stage("common_OTFs.system"):
+        otf.system_OTF = (
+            otf.ap_OTF
+            * otf.turb_OTF
+            * otf.det_OTF
+            * otf.tdi_OTF
+            * otf.jit_OTF
+            * otf.drft_OTF
+            * otf.wav_OTF
+            * otf.filter_OTF
+        )
 
     return otf
 
 
+def _stacked_system_OTF(  # noqa: N802
+    sensor: Sensor,
+    u: np.ndarray,
+    v: np.ndarray,
+    mtf_wavelengths: np.ndarray,
+    mtf_weights: np.ndarray,
+    r0_at_1um: np.ndarray,
+    aircraft_speed: np.ndarray,
+    int_time: np.ndarray,
+    max_bytes: int = 2**24,
+) -> np.ndarray:
+    """Returns the system OTF of common_OTFs for one sensor and a stack of scenarios, at the same frequencies.
+
+    Used by the batched NIIRS functions.  The terms that depend only on the
+    sensor and the frequencies (detector, TDI, jitter and filter) are
+    evaluated once, the aperture and wavefront OTFs once per wavelength, and
+    only the turbulence and drift OTFs and the wavelength weighting are
+    evaluated per scenario, stacked along a leading axis.
+
+    :param sensor:
+        an object from the class sensor
+    :param u:
+        1-D array of angular spatial frequency coordinates (rad^-1)
+    :param v:
+        1-D array of angular spatial frequency coordinates (rad^-1), the same
+        size as u
+    :param mtf_wavelengths:
+        a numpy array of wavelengths (m) shared by every scenario
+    :param mtf_weights:
+        (scenarios, wavelengths) array of the weights of each wavelength
+        contribution (arb)
+    :param r0_at_1um:
+        coherence diameter at 1 um along the slant path of each scenario (m),
+        see slant_path_coherence_diameter; turbulence is turned off where it
+        is inf, as common_OTFs does for cn2_at_1m = 0
+    :param aircraft_speed:
+        apparent atmospheric velocity for each scenario (m/s)
+    :param int_time:
+        integration time for each scenario (s)
+    :param max_bytes:
+        approximate size in bytes of the per-wavelength turbulence OTFs
+        evaluated at once
+
+    :return:
+        system_OTF:
+            (scenarios, frequencies) array; row k equals
+            common_OTFs(...).system_OTF for scenario k (unitless)
+    """
+    rho = np.sqrt(u**2.0 + v**2.0)
+    weights = mtf_weights / mtf_weights.sum(axis=1, keepdims=True)
+    wavelengths = mtf_wavelengths[:, np.newaxis]
+
+    # terms that are weighted by wavelength are evaluated per wavelength and
+    # weighted for every scenario with one matrix product
+    ap_otf = weights @ circular_aperture_OTF(rho, np.zeros_like(rho), wavelengths, sensor.D, sensor.eta)
+    pv = sensor.pv * (sensor.pv_wavelength / wavelengths) ** 2
+    if sensor.L_x == sensor.L_y:
+        wav_otf = wavefront_OTF(rho, np.zeros_like(rho), wavelengths, pv, sensor.L_x, sensor.L_y)
+    else:
+        wav_otf = wavefront_OTF(u, v, wavelengths, pv, sensor.L_x, sensor.L_y)
+    system_otf = ap_otf * (weights @ wav_otf)
+
+    # terms that depend only on the sensor
+    if sensor.n_aggregate > 1:
+        system_otf *= detector_OTF_with_aggregation(
+            u, v, sensor.w_x, sensor.w_y, sensor.p_x, sensor.p_y, sensor.f, sensor.n_aggregate
+        )
+    else:
+        system_otf *= detector_OTF(u, v, sensor.w_x, sensor.w_y, sensor.f)
+    if sensor.tdi_beta is not None:
+        system_otf = system_otf * tdi_OTF(v, sensor.w_y, sensor.n_tdi, sensor.tdi_phases_n, sensor.tdi_beta, sensor.f)
+    system_otf *= jitter_OTF(u, v, sensor.s_x, sensor.s_y)
+    if sensor.filter_kernel.shape[0] > 1:
+        system_otf *= filter_OTF(u, v, sensor.filter_kernel, sensor.p_x / sensor.f)
+
+    # drift depends on the integration time of each scenario
+    dwell_time = (int_time * sensor.n_tdi)[:, np.newaxis]
+    system_otf *= drift_OTF(u, v, sensor.da_x * dwell_time, sensor.da_y * dwell_time)
+
+    # turbulence, one scenario per row of the stacks, with chunks of
+    # scenarios sized like those of weighted_by_wavelength
+    turbulent = np.flatnonzero(np.isfinite(r0_at_1um))
+    chunk_size = max(1, int(max_bytes // (8 * mtf_wavelengths.size * rho.size)))
+    for start in range(0, turbulent.size, chunk_size):
+        rows = turbulent[start : start + chunk_size]
+        # scaled to each wavelength as in polychromatic_turbulence_OTF
+        r0 = r0_at_1um[rows, np.newaxis] * mtf_wavelengths ** (6.0 / 5.0) * (1e-6) ** (-6.0 / 5.0)
+        turb_otf = wind_speed_turbulence_OTF(
+            rho,
+            np.zeros_like(rho),
+            wavelengths,
+            sensor.D,
+            r0[..., np.newaxis],
+            dwell_time[rows, np.newaxis],
+            aircraft_speed[rows, np.newaxis, np.newaxis],
+        )
+        system_otf[rows] *= np.einsum("kw,kwn->kn", weights[rows], turb_otf)
+
+    return system_otf
+
+
 def resample_2D(  # noqa: N802
     img_in: np.ndarray, dx_in: float, dx_out: float
 ) -> np.ndarray:
@@ -1448,6 +2491,8 @@ def resample_2D(  # noqa: N802
         raise ImportError(
             "OpenCV not found. Please install 'pybsm[graphics]' or 'pybsm[headless]'."
         )
+    import cv2
+
     new_x = int(np.round(img_in.shape[1] * dx_in / dx_out))
     new_y = int(np.round(img_in.shape[0] * dx_in / dx_out))
     img_out = cv2.resize(img_in, (new_x, new_y))
@@ -24,6 +24,7 @@ class OTF:
     turb_OTF: np.ndarray  # noqa: N815
     r0_band: np.ndarray
     det_OTF: np.ndarray  # noqa: N815
+    tdi_OTF: np.ndarray  # noqa: N815
     jit_OTF: np.ndarray  # noqa: N815
     drft_OTF: np.ndarray  # noqa: N815
     wav_OTF: np.ndarray  # noqa: N815
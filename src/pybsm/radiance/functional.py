@@ -20,17 +20,16 @@ electromagnetic radiation according to Planck's law and its temperature,
 spectral emissivity.
 """
 # standard library imports
-import inspect
 import logging
 import os
 import warnings
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple, Union
 
 # 3rd party imports
 import numpy as np
 
 # local imports
-from pybsm import noise
+from pybsm import instrumentation, noise
 from pybsm.simulation.sensor import Sensor
 
 from .snr_metrics import SNRMetrics
@@ -44,8 +43,7 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
 
 # define some useful physical constants
 hc = 6.62607004e-34  # Plank's constant  (m^2 kg / s)
@@ -532,8 +530,110 @@ def photon_detector_SNR(  # noqa: N802
     return snr
 
 
+def _photoelectron_rates(
+    atm: np.ndarray, sensor: Sensor, target_temp: float
+) -> Tuple[float, float, np.ndarray, np.ndarray]:
+    """Returns the photoelectron rates for reflectances 0 and 1, the in-band wavelengths and the spectral rate at 1.
+
+    The target radiance (see total_radiance) is affine in reflectance and the
+    signal rate is linear in radiance, so the rate at any reflectance r is
+    (1 - r) * rate_0 + r * rate_1.
+    """
+    atm = atm[atm[:, 0] >= sensor.opt_trans_wavelengths[0], :]
+    atm = atm[atm[:, 0] <= sensor.opt_trans_wavelengths[-1], :]
+    wavelengths = atm[:, 0]
+
+    opt_trans = (
+        sensor.cold_filter_transmission
+        * (1.0 - sensor.eta**2)
+        * resample_by_wavelength(
+            sensor.opt_trans_wavelengths,
+            sensor.optics_transmission,
+            wavelengths,
+        )
+    )
+
+    qe = resample_by_wavelength(sensor.qe_wavelengths, sensor.qe, wavelengths)
+
+    # The components of the imaging system is at a non-zero temperature and
+    # itself generates radiative emissions. So, we account for these
+    # emissions here. This is only relevant in the thermal infrared bands.
+    other_irradiance = cold_shield_self_emission(
+        wavelengths, sensor.cold_shield_temperature, sensor.D, sensor.f
+    )
+    other_irradiance = other_irradiance + optics_self_emission(
+        wavelengths,
+        sensor.optics_temperature,
+        sensor.optics_emissivity,
+        sensor.cold_filter_transmission,
+        sensor.D,
+        sensor.f,
+    )
+    other_irradiance = other_irradiance + cold_stop_self_emission(
+        wavelengths,
+        sensor.cold_filter_temperature,
+        sensor.cold_filter_emissivity,
+        sensor.D,
+        sensor.f,
+    )
+
+    rates = []
+    for reflectance in (0.0, 1.0):
+        # Calculate the total radiance from the target including both
+        # reflection of the solar illumination and the radiative emission from
+        # the object itself.
+        target_radiance = total_radiance(atm, reflectance, target_temp)
+
+        tgt_n_rate, _, weights = signal_rate(
+            wavelengths,
+            target_radiance,
+            opt_trans,
+            sensor.D,
+            sensor.f,
+            sensor.w_x,
+            sensor.w_y,
+            qe,
+            other_irradiance,
+            sensor.dark_current,
+        )
+        rates.append(tgt_n_rate)
+
+    return rates[0], rates[1], wavelengths, weights
+
+
+def _photoelectrons_from_rates(
+    rate_0: float,
+    rate_1: float,
+    sensor: Sensor,
+    int_time: Union[float, np.ndarray],
+    ref: np.ndarray,
+) -> np.ndarray:
+    """Returns saturation limited photoelectrons with shape int_time.shape + ref.shape."""
+    int_time = np.asarray(int_time, dtype=float)
+    pe = ((1.0 - ref) * rate_0 + ref * rate_1) * (int_time[..., np.newaxis] * sensor.n_tdi)
+
+    sat = pe.max(axis=-1) / sensor.max_n
+    if np.any(sat > 1):
+        sat = np.where(sat > 1, sat, 1.0)
+        logging.info(
+            f"Reducing integration time from {int_time} to {int_time/sat}"
+            " to avoid overexposure"
+        )
+        pe = pe / sat[..., np.newaxis]
+
+    # Clip to the maximum number of photoelectrons that can be held.
+    pe[pe > sensor.max_n] = sensor.max_n
+
+    return pe
+
+
+@instrumentation.instrumented("reflectance_to_photoelectrons")
 def reflectance_to_photoelectrons(
-    atm: np.ndarray, sensor: Sensor, int_time: float, target_temp: int = 300
+    atm: np.ndarray,
+    sensor: Sensor,
+    int_time: Union[float, np.ndarray],
+    target_temp: float = 300,
+    reflectance: Optional[np.ndarray] = None,
 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """Provides a mapping between reflectance on the ground and photoelectrons collected in the sensor well.
 
@@ -548,22 +648,31 @@ def reflectance_to_photoelectrons(
     system that are sensitive to the thermal emission wavebands. Dark current
     is included.
 
+    Since the target radiance is affine in reflectance, the mapping is
+    computed in closed form from the signal at reflectances 0 and 1, so any
+    number of reflectance values cost the same.
+
     :param atm:
         atmospheric data as defined in utils.loadDatabaseAtmosphere; the slant
         range between the target and sensor are implied by this choice
     :param sensor:
         sensor parameters as defined in the pybsm sensor class
     :param int_time:
-        camera integration time (s)
+        camera integration time (s); an array of integration times gives one
+        row of photoelectrons per integration time
     :param target_temp: float
         Temperature of the target (Kelvin)
+    :param reflectance:
+        reflectance values (unitless) to map; defaults to 0 to 1 in 100 steps
 
     :return:
         ref :
-            array of reflectance values (unitless) from 0 to 1 in 100 steps
+            array of reflectance values (unitless), from 0 to 1 in 100 steps
+            unless reflectance is given
         pe :
             photoelectrons generated during the integration time corresponding
-            to the reflectance values in ref
+            to the reflectance values in ref; the shape is
+            int_time.shape + ref.shape
         spectral_weights :
             2xN arraylike details of the relative spectral contributions to the collected
             signal, which is useful for wavelength-weighted OTF calculations;
@@ -575,80 +684,66 @@ def reflectance_to_photoelectrons(
         IndexError:
             if atm is not a 2D array
     """
-    ref = np.linspace(0.0, 1.0, 100)
-    pe = np.zeros(ref.shape)
-    atm = atm[atm[:, 0] >= sensor.opt_trans_wavelengths[0], :]
-    atm = atm[atm[:, 0] <= sensor.opt_trans_wavelengths[-1], :]
+    ref = np.linspace(0.0, 1.0, 100) if reflectance is None else np.asarray(reflectance, dtype=float)
 
-    for idx in np.arange(ref.size):
-        # Calculate the total radiance from the target including both
-        # reflection of the solar illumination and the radiative emission from
-        # the object assumed to be at 300 K.
-        target_radiance = total_radiance(atm, ref[idx], 300.0)
-
-        wavelengths = atm[:, 0]
-
-        opt_trans = (
-            sensor.cold_filter_transmission
-            * (1.0 - sensor.eta**2)
-            * resample_by_wavelength(
-                sensor.opt_trans_wavelengths,
-                sensor.optics_transmission,
-                wavelengths,
-            )
-        )
+    rate_0, rate_1, wavelengths, weights = _photoelectron_rates(atm, sensor, target_temp)
+    pe = _photoelectrons_from_rates(rate_0, rate_1, sensor, int_time, ref)
 
-        qe = resample_by_wavelength(sensor.qe_wavelengths, sensor.qe, wavelengths)
+    # the spectral weights are those of a fully reflective target
+    spectral_weights = np.vstack([wavelengths, weights / np.max(weights)])
 
-        # The components of the imaging system is at a non-zero temperature and
-        # itself generates radiative emissions. So, we account for these
-        # emissions here. This is only relevant in the thermal infrared bands.
-        other_irradiance = cold_shield_self_emission(
-            wavelengths, sensor.cold_shield_temperature, sensor.D, sensor.f
-        )
-        other_irradiance = other_irradiance + optics_self_emission(
-            wavelengths,
-            sensor.optics_temperature,
-            sensor.optics_emissivity,
-            sensor.cold_filter_transmission,
-            sensor.D,
-            sensor.f,
-        )
-        other_irradiance = other_irradiance + cold_stop_self_emission(
-            wavelengths,
-            sensor.cold_filter_temperature,
-            sensor.cold_filter_emissivity,
-            sensor.D,
-            sensor.f,
-        )
+    return ref, pe, spectral_weights
 
-        tgt_n_rate, tgt_FPA_irradiance, weights = signal_rate(  # noqa: N806
-            wavelengths,
-            target_radiance,
-            opt_trans,
-            sensor.D,
-            sensor.f,
-            sensor.w_x,
-            sensor.w_y,
-            qe,
-            other_irradiance,
-            sensor.dark_current,
-        )
 
-        pe[idx] = tgt_n_rate * int_time * sensor.n_tdi
+def reflectance_to_photoelectrons_batch(
+    atm: np.ndarray,
+    sensors: Sequence[Sensor],
+    int_times: Union[float, Sequence[float], np.ndarray],
+    target_temp: float = 300,
+    reflectance: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """Reflectance to photoelectron mappings for several sensors viewing the same atmosphere.
 
-    sat = pe.max() / sensor.max_n
-    if sat > 1:
-        logging.info(
-            f"Reducing integration time from {int_time} to {int_time/sat}"
-            " to avoid overexposure"
-        )
-        pe = pe / sat
+    See reflectance_to_photoelectrons for details.
 
-    # Clip to the maximum number of photoelectrons that can be held.
-    pe[pe > sensor.max_n] = sensor.max_n
+    :param atm:
+        atmospheric data as defined in utils.loadDatabaseAtmosphere
+    :param sensors:
+        sequence of sensors as defined in the pybsm sensor class
+    :param int_times:
+        camera integration time (s) for each sensor, or a single integration
+        time for all of them
+    :param target_temp: float
+        Temperature of the target (Kelvin)
+    :param reflectance:
+        reflectance values (unitless) to map; defaults to 0 to 1 in 100 steps
 
-    spectral_weights = np.vstack([wavelengths, weights / max(weights)])
+    :return:
+        ref :
+            array of reflectance values (unitless)
+        pe :
+            photoelectrons of shape (len(sensors), ref.size); row i is the
+            mapping for sensors[i]
+        spectral_weights :
+            list with the 2xN spectral weights of each sensor (N depends on the
+            sensor band)
+
+    :raises:
+        IndexError:
+            if atm is not a 2D array
+        ValueError:
+            if the number of integration times does not match the number of
+            sensors
+    """
+    ref = np.linspace(0.0, 1.0, 100) if reflectance is None else np.asarray(reflectance, dtype=float)
+    int_times = np.broadcast_to(np.asarray(int_times, dtype=float), (len(sensors),))
+
+    pe = np.zeros((len(sensors), ref.size))
+    spectral_weights = []
+    for i, sensor in enumerate(sensors):
+        rate_0, rate_1, wavelengths, weights = _photoelectron_rates(atm, sensor, target_temp)
+        pe[i] = _photoelectrons_from_rates(rate_0, rate_1, sensor, int_times[i], ref)
+        spectral_weights.append(np.vstack([wavelengths, weights / np.max(weights)]))
 
     return ref, pe, spectral_weights
 
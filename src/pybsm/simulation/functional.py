@@ -14,11 +14,10 @@ Public release approval for version 0.1: 88ABW-2018-5226
 Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
 # standard library imports
-import inspect
 import logging
 import os
 import warnings
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 # 3rd party imports
 import numpy as np
@@ -27,7 +26,7 @@ from scipy import interpolate
 # local imports
 import pybsm.otf as otf
 import pybsm.radiance as radiance
-from pybsm import noise
+from pybsm import instrumentation, noise, utils
 
 from .ref_image import RefImage
 from .scenario import Scenario
@@ -42,8 +41,170 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
+
+# System OTFs and blur kernels used by simulate_image, keyed on the sensor and
+# scenario fingerprints.  A 1501 x 1501 complex OTF is about 36 MB.
+_otf_cache = utils.LRUCache(max_bytes=256 * 2**20)
+
+
+def set_otf_cache_size(max_bytes: int) -> None:
+    """Sets the maximum total size of the OTF/PSF cache used by simulate_image.
+
+    :param max_bytes:
+        maximum size in bytes; least recently used entries are evicted to
+        fit, and 0 disables in-memory caching
+    """
+    _otf_cache.resize(max_bytes)
+
+
+def set_otf_cache_dir(disk_dir: Optional[str]) -> None:
+    """Sets the directory used as a persistent backing store for the OTF/PSF cache.
+
+    System OTFs and blur kernels computed by simulate_image are written to
+    this directory and read back (memory-mapped where possible) on a cache
+    miss, so that restarted processes sharing the directory do not need to
+    recompute them.
+
+    :param disk_dir:
+        directory path, created if needed; None disables the disk store
+    """
+    _otf_cache.disk_dir = disk_dir
+
+
+def clear_otf_cache() -> None:
+    """Removes all in-memory entries from the OTF/PSF cache; the disk store is left untouched.
+
+    The grid maps cached by otf.radial_OTF are released as well.
+    """
+    _otf_cache.clear()
+    otf.functional._radius_map_cache.clear()
+
+
+def otf_cache_info() -> Dict[str, int]:
+    """Returns the hit, miss and disk hit counts, the number of entries and their total size."""
+    return _otf_cache.info()
+
+
+# simulate_image evaluates the system OTF on a grid whose spacing leaves about
+# this fraction of the estimated blur kernel energy outside the kernel's field
+# of view; see otf_grid
+otf_grid_tol = 3e-3
+
+# simulate_image_tiled processes the reference image in tiles of this many
+# pixels per side
+simulation_tile_size = 1024
+
+# bounds on the number of samples per axis of the grid chosen by otf_grid; the
+# upper bound is the fixed grid that simulate_image used before
+otf_grid_min_size = 33
+otf_grid_max_size = 1501
+
+
+def otf_grid(
+    sensor: Sensor,
+    scenario: Scenario,
+    wavelengths: np.ndarray,
+    ref_ifov: float,
+    slant_range: float,
+    tol: float = otf_grid_tol,
+    size: Optional[int] = None,
+) -> Tuple[int, float]:
+    """Chooses the square grid of spatial frequencies on which simulate_image evaluates the system OTF.
+
+    The grid extends to the smaller of the diffraction cutoff at the shortest
+    wavelength and the Nyquist frequency of the reference image; the blur
+    kernel cannot be sampled beyond either.  Its spacing, df, sets the field
+    of view of the blur kernel, 1 / df, to twice the radius that holds all but
+    about a fraction 'tol' of the kernel's energy, estimated from the
+    diffraction, detector, jitter, drift, turbulence and filter blur, and
+    rounded up to a whole number of reference pixels so that otf_to_psf
+    resamples the kernel without stretching it.
+
+    :param sensor:
+        virtual sensor definition
+    :param scenario:
+        specification of the deployment of the virtual sensor
+    :param wavelengths:
+        wavelengths at which the OTF is evaluated (m)
+    :param ref_ifov:
+        angular sampling of the reference image (rad)
+    :param slant_range:
+        distance between the sensor and the target (m)
+    :param tol:
+        fraction of the blur kernel energy allowed outside its field of view,
+        where it wraps around; smaller values give finer, larger grids
+    :param size:
+        if given, the number of samples per axis (rounded up to an odd number),
+        which overrides 'tol'; the grid then spans the same extent, so a size
+        of 1501 reproduces the fixed grid of earlier versions for reference
+        images sampled finer than the cutoff
+
+    :return:
+        n:
+            number of samples per axis (odd)
+        df:
+            sample spacing (rad^-1); 0 if the sensor has no cutoff frequency
+    """
+    extent = min(sensor.D / np.min(wavelengths), 0.5 / ref_ifov)
+
+    if size is not None:
+        n = 2 * (int(size) // 2) + 1
+        return n, 2.0 * extent / (n - 1)
+    if not extent > 0:
+        return otf_grid_min_size, 0.0
+
+    # the field of view is an odd number, m, of reference pixels, so that the
+    # kernel has a center pixel, with between otf_grid_min_size and
+    # otf_grid_max_size samples out to the extent
+    radius = _blur_radius(sensor, scenario, wavelengths, slant_range, tol)
+    m = max(2.0 * radius / ref_ifov, (otf_grid_min_size - 1) / (2.0 * extent * ref_ifov))
+    m_max = (otf_grid_max_size - 1) / (2.0 * extent * ref_ifov)
+    m = min(2 * int(np.ceil((m - 1.0) / 2.0)) + 1, 2 * int(np.floor((m_max - 1.0) / 2.0 + 1e-9)) + 1)
+    df = 1.0 / (m * ref_ifov)
+
+    n = 2 * int(np.ceil(extent / df - 1e-9)) + 1
+
+    return n, df
+
+
+def _blur_radius(
+    sensor: Sensor, scenario: Scenario, wavelengths: np.ndarray, slant_range: float, tol: float
+) -> float:
+    """Estimates the angular radius (rad) that holds all but about a fraction 'tol' of the blur kernel's energy.
+
+    The radii of the blur sources are added, which overestimates the
+    radius of their convolution.
+    """
+    # the energy of an Airy pattern outside radius r approaches
+    # 2 lambda / (pi^2 r D), and a central obscuration puts more of it in the
+    # rings
+    radius = 2.0 * np.max(wavelengths) / (np.pi**2 * sensor.D * tol * (1.0 - sensor.eta))
+
+    # half diagonal of the (aggregated) detector footprint
+    radius += np.hypot(
+        sensor.w_x + (sensor.n_aggregate - 1) * sensor.p_x,
+        sensor.w_y + (sensor.n_aggregate - 1) * sensor.p_y,
+    ) / (2.0 * sensor.f)
+
+    # Gaussian jitter and linear drift
+    radius += np.sqrt(-2.0 * np.log(tol)) * max(sensor.s_x, sensor.s_y)
+    radius += np.hypot(sensor.da_x, sensor.da_y) * sensor.int_time * sensor.n_tdi / 2.0
+
+    # the energy of the long exposure turbulence kernel outside radius r is
+    # about 0.1 (r r0 / lambda)^(-5/3)
+    if scenario.cn2_at_1m > 0.0:
+        wavelength = np.min(wavelengths)
+        r0 = otf.slant_path_coherence_diameter(
+            scenario.altitude, slant_range, scenario.ha_wind_speed, scenario.cn2_at_1m
+        ) * (wavelength / 1.0e-6) ** (6.0 / 5.0)
+        radius += wavelength / r0 * (0.1 / tol) ** (3.0 / 5.0)
+
+    # half diagonal of the filter kernel, which is sampled at the detector pitch
+    if sensor.filter_kernel.shape[0] > 1:
+        radius += np.sqrt(2.0) * max(sensor.filter_kernel.shape) / 2.0 * sensor.p_x / sensor.f
+
+    return radius
 
 
 def instantaneous_FOV(w: int, f: int) -> float:  # noqa: N802
@@ -140,8 +301,297 @@ def img_to_reflectance(
     return ref_img
 
 
+class _Simulation:
+    """Radiometry, system OTF and blur kernels shared by the images simulated for a sensor and scenario.
+
+    :param sensor:
+        virtual sensor definition
+    :param scenario:
+        specification of the deployment of the virtual sensor
+    :param otf_tol:
+        tolerance of the OTF grid; see otf_grid
+    :param otf_size:
+        number of OTF grid samples per axis; see otf_grid
+    :param workers:
+        number of threads blurring and resampling tiles of each image, or None
+        to process the whole image at once; see apply_otf_to_image
+    :param gaussian_threshold:
+        photoelectron count above which photon noise is drawn from a Gaussian;
+        see noise.add_noise
+
+    :raises: ValueError if cutoff Frequency matrix u_rng is not monotonically
+             increasing
+    """
+
+    def __init__(
+        self,
+        sensor: Sensor,
+        scenario: Scenario,
+        otf_tol: float = otf_grid_tol,
+        otf_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        gaussian_threshold: Optional[float] = None,
+    ) -> None:
+        # integration time (s)
+        int_time = sensor.int_time
+
+        (
+            ref,
+            pe,
+            spectral_weights,
+        ) = radiance.reflectance_to_photoelectrons(scenario.atm, sensor, int_time)
+
+        wavelengths = spectral_weights[0]
+        weights = spectral_weights[1]
+
+        self.sensor = sensor
+        self.scenario = scenario
+        self.int_time = int_time
+        self.slant_range = np.sqrt(scenario.altitude**2 + scenario.ground_range**2)
+
+        # cut down the wavelength range to only the regions of interest
+        self.mtf_wavelengths = wavelengths[weights > 0.0]
+        self.mtf_weights = weights[weights > 0.0]
+
+        # Assume if nothing else cuts us off first, diffraction will set the limit
+        # for spatial frequency that the imaging system can resolve (1/rad).
+        self.cutoff_frequency = sensor.D / np.min(self.mtf_wavelengths)
+
+        self.otf_tol = otf_tol
+        self.otf_size = otf_size
+        self.workers = workers
+        self.gaussian_threshold = gaussian_threshold
+
+        # the OTF depends only on the sensor, the scenario and its grid, and
+        # the blur kernel additionally on the reference image sampling, so
+        # both are cached
+        self.sensor_fingerprint = sensor.fingerprint()
+        self.scenario_fingerprint = scenario.fingerprint()
+        self.ifov = (sensor.p_x + sensor.p_y) / 2 / sensor.f
+
+        # Standard deviation of additive Gaussian noise (e.g. read noise,
+        # quantization). Should be the RSS value if multiple terms are combined.
+        # This should not include photon noise.
+        quantization_noise = noise.quantization_noise(sensor.max_n, sensor.bit_depth)
+        self.g_noise = np.sqrt(quantization_noise**2.0 + sensor.read_noise**2.0)
+
+        # maps reflectance to photoelectrons
+        self.reflectance_to_pe = interpolate.interp1d(ref, pe)
+
+    def otf_grid(self, gsd: float) -> Tuple[int, float]:
+        """Returns the number of samples per axis and the spacing (rad^-1) of the OTF grid for a reference GSD (m)."""
+        return otf_grid(
+            self.sensor,
+            self.scenario,
+            self.mtf_wavelengths,
+            2 * np.arctan(gsd / 2 / self.slant_range),
+            self.slant_range,
+            tol=self.otf_tol,
+            size=self.otf_size,
+        )
+
+    def system_otf(self, gsd: float) -> Tuple[np.ndarray, float]:
+        """Returns the system OTF and its sample spacing (rad^-1) on the grid for a reference GSD (m)."""
+        n, df = self.otf_grid(gsd)
+
+        def compute_otf() -> Tuple[np.ndarray, float]:
+            if df <= 0:
+                raise ValueError("Cutoff frequency values must be increasing.")
+
+            u_rng = df * np.arange(-(n // 2), n // 2 + 1.0)
+            v_rng = u_rng[::-1]
+
+            # meshgrid of spatial frequencies
+            uu, vv = np.meshgrid(u_rng, v_rng)
+
+            system_otf = otf.common_OTFs(
+                self.sensor,
+                self.scenario,
+                uu,
+                vv,
+                self.mtf_wavelengths,
+                self.mtf_weights,
+                self.slant_range,
+                self.int_time,
+            ).system_OTF
+
+            return system_otf, df
+
+        return _otf_cache.get(
+            ("otf", self.sensor_fingerprint, self.scenario_fingerprint, n, df), compute_otf
+        )
+
+    def psf(self, gsd: float) -> np.ndarray:
+        """Returns the blur kernel sampled at the reference image GSD (m)."""
+        n, df = self.otf_grid(gsd)
+
+        def compute_psf() -> np.ndarray:
+            system_otf, df = self.system_otf(gsd)
+            return otf.otf_to_psf(system_otf, df, 2 * np.arctan(gsd / 2 / self.slant_range))
+
+        return _otf_cache.get(
+            ("psf", self.sensor_fingerprint, self.scenario_fingerprint, n, df, float(gsd)), compute_psf
+        )
+
+    @instrumentation.instrumented("simulate_image")
+    def simulate(
+        self, ref_img: RefImage, rng: Optional[noise.RNGLike] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the true, blurred and noisy images for ref_img; see simulate_image."""
+        true_img, blur_img = self.blur(ref_img)
+
+        with instrumentation.stage("simulate_image.noise"):
+            # add photon noise (all sources) and dark current noise, and any
+            # noise from Gaussian sources, e.g. read_noise, quantization
+            noisy_img = noise.add_noise(blur_img, self.g_noise, rng, self.gaussian_threshold)
+
+        return true_img, blur_img, noisy_img
+
+    @instrumentation.instrumented("simulate_frames")
+    def simulate_frames(
+        self, ref_img: RefImage, n_frames: int, reduction: Optional[str], rng: Optional[noise.RNGLike]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the true and blurred images and the noisy frames for ref_img; see simulate_frames."""
+        if reduction not in (None, "sum", "mean"):
+            raise ValueError(f"Unknown frame reduction '{reduction}'.")
+        if n_frames < 1:
+            raise ValueError("n_frames must be at least 1.")
+
+        true_img, blur_img = self.blur(ref_img)
+
+        with instrumentation.stage("simulate_frames.noise"):
+            if reduction is not None:
+                # the sum of n_frames independent frames has Poisson photon
+                # noise of n_frames times the mean and Gaussian noise of
+                # sqrt(n_frames) times the deviation, so it is drawn directly
+                frames = noise.add_noise(
+                    n_frames * blur_img, np.sqrt(n_frames) * self.g_noise, rng, self.gaussian_threshold
+                )
+                if reduction == "mean":
+                    frames /= n_frames
+            else:
+                frame_rngs: List[Optional[np.random.SeedSequence]] = [None] * n_frames
+                if rng is not None:
+                    frame_rngs = list(_seed_sequence(rng).spawn(n_frames))
+                frames = np.empty((n_frames,) + blur_img.shape)
+                for n in range(n_frames):
+                    noise.add_noise(blur_img, self.g_noise, frame_rngs[n], self.gaussian_threshold, out=frames[n])
+
+        return true_img, blur_img, frames
+
+    def blur(self, ref_img: RefImage) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the true and the blurred and resampled images for ref_img, in photoelectrons."""
+        with instrumentation.stage("simulate_image.reflectance_to_pe"):
+            # Convert to reference image into a floating point reflectance image.
+            reflectance_img = img_to_reflectance(
+                ref_img.img, ref_img.pix_values, ref_img.refl_values
+            )
+
+            # Convert the reflectance image to photoelectrons.
+            true_img = self.reflectance_to_pe(reflectance_img)
+
+        # the system OTF and blur kernel, computed or read from the cache
+        with instrumentation.stage("simulate_image.psf"):
+            system_otf, df = self.system_otf(ref_img.gsd)
+            psf = self.psf(ref_img.gsd)
+
+        # blur and resample the image
+        blur_img, _ = otf.apply_otf_to_image(
+            true_img,
+            ref_img.gsd,
+            self.slant_range,
+            system_otf,
+            df,
+            self.ifov,
+            psf=psf,
+            workers=self.workers,
+        )
+
+        if blur_img.shape[0] > ref_img.img.shape[0]:
+            logging.warn(
+                "The simulated image has oversampled the"
+                " reference image!  This result should not be"
+                " trusted!!"
+            )
+
+        return true_img, blur_img
+
+    @instrumentation.instrumented("simulate_image_tiled")
+    def simulate_tiled(
+        self, ref_img: RefImage, out_dir: Optional[str], tile_size: int, rng: Optional[noise.RNGLike] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the true, blurred and noisy images for ref_img computed tile by tile; see simulate_image_tiled."""
+        if not otf.functional.is_usable:
+            raise ImportError(
+                "OpenCV not found. Please install 'pybsm[graphics]' or 'pybsm[headless]'."
+            )
+
+        img = ref_img.img
+        psf = self.psf(ref_img.gsd)
+
+        # the output grid of resample_2D, and the reference rows and columns
+        # each output pixel interpolates between
+        dx_in = ref_img.gsd / self.slant_range
+        out_shape = otf.functional._resampled_shape(img.shape, dx_in, self.ifov)
+        if out_shape[0] > img.shape[0]:
+            logging.warn(
+                "The simulated image has oversampled the"
+                " reference image!  This result should not be"
+                " trusted!!"
+            )
+        rows = otf.functional._linear_resize_coefficients(img.shape[0], out_shape[0])
+        cols = otf.functional._linear_resize_coefficients(img.shape[1], out_shape[1])
+
+        true_img = _output_array(out_dir, "true_img", img.shape)
+        blur_img = _output_array(out_dir, "blur_img", out_shape + img.shape[2:])
+        noisy_img = _output_array(out_dir, "noisy_img", out_shape + img.shape[2:])
+
+        # the true image is computed pixel by pixel
+        for (y_0, y_1), (x_0, x_1) in otf.functional._tiles(img.shape[:2], (tile_size, tile_size)):
+            with instrumentation.stage("simulate_image_tiled.reflectance_to_pe"):
+                reflectance_img = img_to_reflectance(
+                    np.asarray(img[y_0:y_1, x_0:x_1]), ref_img.pix_values, ref_img.refl_values
+                )
+                true_img[y_0:y_1, x_0:x_1] = self.reflectance_to_pe(reflectance_img)
+
+        # each output tile is interpolated from a halo-padded block of the
+        # true image, and draws its noise from its own stream
+        out_tile = (
+            max(1, tile_size * out_shape[0] // img.shape[0]),
+            max(1, tile_size * out_shape[1] // img.shape[1]),
+        )
+        tiles = list(otf.functional._tiles(out_shape, out_tile))
+        tile_rngs: List[Optional[np.random.SeedSequence]] = [None] * len(tiles)
+        if rng is not None:
+            tile_rngs = list(_seed_sequence(rng).spawn(len(tiles)))
+        for n, tile in enumerate(tiles):
+            (y_0, y_1), (x_0, x_1) = tile
+            blur_tile = otf.functional._filter_resample_tile(true_img, psf, rows, cols, tile, "simulate_image_tiled")
+            blur_img[y_0:y_1, x_0:x_1] = blur_tile
+
+            with instrumentation.stage("simulate_image_tiled.noise"):
+                # add photon noise (all sources) and dark current noise, and
+                # any noise from Gaussian sources, e.g. read_noise, quantization
+                noise.add_noise(
+                    blur_tile, self.g_noise, tile_rngs[n], self.gaussian_threshold, out=noisy_img[y_0:y_1, x_0:x_1]
+                )
+
+        for array in (true_img, blur_img, noisy_img):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+        return true_img, blur_img, noisy_img
+
+
 def simulate_image(
-    ref_img: RefImage, sensor: Sensor, scenario: Scenario
+    ref_img: RefImage,
+    sensor: Sensor,
+    scenario: Scenario,
+    otf_tol: float = otf_grid_tol,
+    otf_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    rng: Optional[noise.RNGLike] = None,
+    gaussian_threshold: Optional[float] = None,
 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """Simulates radiometrically accurate imagery collected through a sensor.
 
@@ -164,6 +614,27 @@ def simulate_image(
     :param scenario:
         Specification of the deployment of the virtual sensor within the world
         relative to the target.
+    :param otf_tol:
+        Fraction of the blur kernel energy allowed outside the field of view
+        of the OTF grid; smaller values give finer, larger grids. See otf_grid.
+    :param otf_size:
+        If given, the number of OTF grid samples per axis, which overrides
+        'otf_tol'; 1501 reproduces the fixed grid of earlier versions.
+    :param workers:
+        If given, the image is blurred and resampled in halo-padded tiles on
+        a pool of this many threads. The result is identical for any number
+        of workers and matches the whole-image result up to floating point
+        rounding; see apply_otf_to_image. The tile timings are recorded as
+        the instrumentation stages "apply_otf_to_image.filter" and
+        "apply_otf_to_image.resample".
+    :param rng:
+        A numpy.random.Generator, or a seed (an int or a SeedSequence) for
+        one, from which the noise is drawn. If None, the legacy global
+        np.random state is used, as in earlier versions.
+    :param gaussian_threshold:
+        If given, the photon noise of pixels above this many photoelectrons
+        is drawn from a Gaussian approximation, which is faster; see
+        noise.add_noise.
 
     :return:
         true_img:
@@ -182,88 +653,300 @@ def simulate_image(
         met if imggsd <= rng/(4*coff). In practice this is easily done by
         upsampling imgin.
 
+    :NOTE:
+        The system OTF and blur kernel are cached keyed on sensor.fingerprint(),
+        scenario.fingerprint(), the OTF grid and the reference image GSD; see
+        set_otf_cache_size and set_otf_cache_dir.
+
     :raises: ValueError if cutoff Frequency matrix u_rng is not monotonically
              increasing
     """
-    # integration time (s)
-    int_time = sensor.int_time
-
-    (
-        ref,
-        pe,
-        spectral_weights,
-    ) = radiance.reflectance_to_photoelectrons(scenario.atm, sensor, int_time)
+    return _Simulation(sensor, scenario, otf_tol, otf_size, workers, gaussian_threshold).simulate(ref_img, rng)
+
+
+def simulate_images(
+    ref_imgs: Union[Iterable[RefImage], np.ndarray],
+    sensor: Sensor,
+    scenario: Scenario,
+    gsd: Optional[float] = None,
+    pix_values: Optional[np.ndarray] = None,
+    refl_values: Optional[np.ndarray] = None,
+    otf_tol: float = otf_grid_tol,
+    otf_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    rng: Optional[noise.RNGLike] = None,
+    gaussian_threshold: Optional[float] = None,
+) -> Union[
+    Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    Tuple[np.ndarray, np.ndarray, np.ndarray],
+]:
+    """Simulates many reference images collected through the same sensor and scenario.
+
+    The radiometry, system OTF and blur kernel are computed once and shared,
+    so the per-image cost is only the blurring, resampling and noise; see
+    simulate_image for the per-image processing.
+
+    :param ref_imgs:
+        either an iterable of RefImage, or an (N, H, W) array of reference
+        images that all have the GSD 'gsd'
+    :param sensor:
+        virtual sensor definition
+    :param scenario:
+        specification of the deployment of the virtual sensor within the world
+        relative to the target
+    :param gsd:
+        spatial sampling of the images in an (N, H, W) array (m); ignored for
+        an iterable of RefImage
+    :param pix_values:
+        pixel count values mapped to 'refl_values' for every image in an
+        (N, H, W) array; if None, they are derived from each image as RefImage
+        does
+    :param refl_values:
+        reflectance values associated with 'pix_values'
+    :param otf_tol:
+        tolerance of the OTF grid; see simulate_image
+    :param otf_size:
+        number of OTF grid samples per axis; see simulate_image
+    :param workers:
+        number of threads blurring and resampling tiles of each image; see
+        simulate_image
+    :param rng:
+        a numpy.random.Generator, or a seed (an int or a SeedSequence) for
+        one; every image draws its noise from an independent stream spawned
+        from it.  If None, the legacy global np.random state is used
+    :param gaussian_threshold:
+        photoelectron count above which photon noise is drawn from a
+        Gaussian; see simulate_image
 
-    wavelengths = spectral_weights[0]
-    weights = spectral_weights[1]
+    :return:
+        for an iterable of RefImage, a generator of (true_img, blur_img,
+        noisy_img) tuples as returned by simulate_image, consumed lazily;
+        for an (N, H, W) array, the tuple (true_imgs, blur_imgs, noisy_imgs)
+        of preallocated arrays stacked along the first axis
 
-    slant_range = np.sqrt(scenario.altitude**2 + scenario.ground_range**2)
+    :raises:
+        ValueError:
+            if an array of images is not 3D or 'gsd' is not given with it, or
+            if cutoff Frequency matrix u_rng is not monotonically increasing
+    """
+    if isinstance(ref_imgs, np.ndarray):
+        if ref_imgs.ndim != 3:
+            raise ValueError("An array of reference images must have shape (N, H, W).")
+        if gsd is None:
+            raise ValueError("gsd must be given with an array of reference images.")
+        simulation = _Simulation(sensor, scenario, otf_tol, otf_size, workers, gaussian_threshold)
+        return _simulate_image_stack(ref_imgs, simulation, gsd, pix_values, refl_values, rng)
+
+    return _simulate_image_iter(ref_imgs, sensor, scenario, otf_tol, otf_size, workers, gaussian_threshold, rng)
+
+
+def simulate_frames(
+    ref_img: RefImage,
+    sensor: Sensor,
+    scenario: Scenario,
+    n_frames: Optional[int] = None,
+    reduction: Optional[str] = None,
+    rng: Optional[noise.RNGLike] = None,
+    otf_tol: float = otf_grid_tol,
+    otf_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    gaussian_threshold: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Simulates a stack of frames of the same scene collected through a sensor.
 
-    # cut down the wavelength range to only the regions of interest
-    mtf_wavelengths = wavelengths[weights > 0.0]
-    mtf_weights = weights[weights > 0.0]
+    The radiometry, system OTF, blur kernel and blurred image are computed
+    once, and only the noise differs between frames, so this is much faster
+    than calling simulate_image for every frame; see simulate_image for the
+    processing.
 
-    # Assume if nothing else cuts us off first, diffraction will set the limit
-    # for spatial frequency that the imaging system can resolve (1/rad).
-    cutoff_frequency = sensor.D / np.min(mtf_wavelengths)
+    :param ref_img:
+        reference image to use as the source view of the world
+    :param sensor:
+        virtual sensor definition
+    :param scenario:
+        specification of the deployment of the virtual sensor within the world
+        relative to the target
+    :param n_frames:
+        number of frames; defaults to sensor.frame_stacks, the number of
+        frames added together in the SNR of niirs
+    :param reduction:
+        None to return every frame, or "sum" or "mean" to return the sum or
+        the average of the frames.  A reduction is drawn directly from its
+        distribution (the sum of the frames has photon noise of n_frames times
+        the mean and Gaussian noise of sqrt(n_frames) times the deviation),
+        so the frames are never generated and it costs a single frame
+    :param rng:
+        a numpy.random.Generator, or a seed (an int or a SeedSequence) for
+        one; every frame draws its noise from an independent stream spawned
+        from it, so the first frames do not depend on n_frames.  If None, the
+        legacy global np.random state is used
+    :param otf_tol:
+        tolerance of the OTF grid; see simulate_image
+    :param otf_size:
+        number of OTF grid samples per axis; see simulate_image
+    :param workers:
+        number of threads blurring and resampling tiles of the image; see
+        simulate_image
+    :param gaussian_threshold:
+        photoelectron count above which photon noise is drawn from a
+        Gaussian; see simulate_image
 
-    u_rng = np.linspace(-1.0, 1.0, 1501) * cutoff_frequency
-    v_rng = np.linspace(1.0, -1.0, 1501) * cutoff_frequency
+    :return:
+        true_img:
+            the true image in units of photoelectrons
+        blur_img:
+            the image after blurring and resampling is applied to true_img
+            (still units of photoelectrons)
+        frames:
+            the (n_frames, H, W) stack of noisy frames, or their sum or
+            average with the shape of blur_img (still units of photoelectrons)
 
-    # meshgrid of spatial frequencies out to the optics cutoff
-    uu, vv = np.meshgrid(u_rng, v_rng)
+    :raises:
+        ValueError:
+            if reduction is not None, "sum" or "mean", if n_frames is less
+            than 1, or if cutoff Frequency matrix u_rng is not monotonically
+            increasing
+    """
+    simulation = _Simulation(sensor, scenario, otf_tol, otf_size, workers, gaussian_threshold)
+    return simulation.simulate_frames(
+        ref_img, sensor.frame_stacks if n_frames is None else n_frames, reduction, rng
+    )
 
-    system_otf = otf.common_OTFs(
-        sensor,
-        scenario,
-        uu,
-        vv,
-        mtf_wavelengths,
-        mtf_weights,
-        slant_range,
-        int_time,
-    ).system_OTF
 
-    df = (abs(u_rng[1] - u_rng[0]) + abs(v_rng[0] - v_rng[1])) / 2
+def simulate_image_tiled(
+    ref_img: RefImage,
+    sensor: Sensor,
+    scenario: Scenario,
+    out_dir: Optional[str] = None,
+    tile_size: int = simulation_tile_size,
+    otf_tol: float = otf_grid_tol,
+    otf_size: Optional[int] = None,
+    rng: Optional[noise.RNGLike] = None,
+    gaussian_threshold: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Simulates imagery collected through a sensor tile by tile, for reference images too large for memory.
 
-    if df <= 0:
-        raise ValueError("Cutoff frequency values must be increasing.")
+    The results match simulate_image up to floating point error, except for
+    the noise, which is drawn tile by tile.  The reference image is read one
+    block at a time, so it can be a np.memmap (e.g. from
+    np.load(path, mmap_mode="r")), and with 'out_dir' the results are written
+    to memory-mapped files, so the memory used depends on 'tile_size' and the
+    blur kernel size rather than on the image size.
 
-    ifov = (sensor.p_x + sensor.p_y) / 2 / sensor.f
+    :param ref_img:
+        reference image to use as the source view of the world; give
+        'pix_values' and 'refl_values' to RefImage for memory-mapped images,
+        since otherwise RefImage computes percentiles of the whole image
+    :param sensor:
+        virtual sensor definition
+    :param scenario:
+        specification of the deployment of the virtual sensor within the world
+        relative to the target
+    :param out_dir:
+        if given, an existing directory in which the results are created as
+        the memory-mapped files 'true_img.npy', 'blur_img.npy' and
+        'noisy_img.npy' (read them back with np.load(path, mmap_mode="r"));
+        otherwise the results are in-memory arrays
+    :param tile_size:
+        side length of the tiles in reference image pixels; each blurred tile
+        also reads a halo of half the blur kernel size around it
+    :param otf_tol:
+        tolerance of the OTF grid; see simulate_image
+    :param otf_size:
+        number of OTF grid samples per axis; see simulate_image
+    :param rng:
+        a numpy.random.Generator, or a seed (an int or a SeedSequence) for
+        one; every tile draws its noise from an independent stream spawned
+        from it, so the noise depends on 'tile_size' but not on the order in
+        which tiles are processed.  If None, the legacy global np.random
+        state is used
+    :param gaussian_threshold:
+        photoelectron count above which photon noise is drawn from a
+        Gaussian; see simulate_image
 
-    # Standard deviation of additive Gaussian noise (e.g. read noise,
-    # quantization). Should be the RSS value if multiple terms are combined.
-    # This should not include photon noise.
-    quantization_noise = noise.quantization_noise(sensor.max_n, sensor.bit_depth)
-    g_noise = np.sqrt(quantization_noise**2.0 + sensor.read_noise**2.0)
+    :return:
+        true_img:
+            the true image in units of photoelectrons
+        blur_img:
+            the image after blurring and resampling is applied to true_img
+            (still units of photoelectrons)
+        noisy_img:
+            the blur image with photon (Poisson) noise and gaussian noise
+            applied (still units of photoelectrons)
 
-    # Convert to reference image into a floating point reflectance image.
-    reflectance_img = img_to_reflectance(
-        ref_img.img, ref_img.pix_values, ref_img.refl_values
-    )
+    :raises: ValueError if cutoff Frequency matrix u_rng is not monotonically
+             increasing
+    """
+    simulation = _Simulation(sensor, scenario, otf_tol, otf_size, gaussian_threshold=gaussian_threshold)
+    return simulation.simulate_tiled(ref_img, out_dir, tile_size, rng)
 
-    # Convert the reflectance image to photoelectrons.
-    f = interpolate.interp1d(ref, pe)
-    true_img = f(reflectance_img)
 
-    # blur and resample the image
-    blur_img, _ = otf.apply_otf_to_image(
-        true_img, ref_img.gsd, slant_range, system_otf, df, ifov
-    )
+def _output_array(out_dir: Optional[str], name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    """Returns an uninitialized float64 array, memory-mapped to 'name'.npy in out_dir if it is given."""
+    if out_dir is None:
+        return np.empty(shape)
+    return np.lib.format.open_memmap(os.path.join(out_dir, name + ".npy"), mode="w+", dtype=np.float64, shape=shape)
 
-    # add photon noise (all sources) and dark current noise
-    poisson_noisy_img = np.random.poisson(lam=blur_img)
-    # add any noise from Gaussian sources, e.g. read_noise, quantizaiton
-    noisy_img = np.random.normal(poisson_noisy_img, g_noise)
 
-    if noisy_img.shape[0] > ref_img.img.shape[0]:
-        logging.warn(
-            "The simulated image has oversampled the"
-            " reference image!  This result should not be"
-            " trusted!!"
-        )
+def _seed_sequence(rng: noise.RNGLike) -> np.random.SeedSequence:
+    """Returns the SeedSequence from which independent noise streams are spawned for rng.
 
-    return true_img, blur_img, noisy_img
+    A Generator cannot be spawned from in all supported numpy versions, so it
+    seeds a new SeedSequence instead.
+    """
+    if isinstance(rng, np.random.SeedSequence):
+        return rng
+    if isinstance(rng, np.random.Generator):
+        return np.random.SeedSequence(rng.integers(2**32, size=4).tolist())
+    return np.random.SeedSequence(rng)
+
+
+def _simulate_image_iter(
+    ref_imgs: Iterable[RefImage],
+    sensor: Sensor,
+    scenario: Scenario,
+    otf_tol: float,
+    otf_size: Optional[int],
+    workers: Optional[int],
+    gaussian_threshold: Optional[float],
+    rng: Optional[noise.RNGLike],
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    simulation: Optional[_Simulation] = None
+    seed_sequence = None if rng is None else _seed_sequence(rng)
+    for ref_img in ref_imgs:
+        if simulation is None:
+            simulation = _Simulation(sensor, scenario, otf_tol, otf_size, workers, gaussian_threshold)
+        # spawning one stream at a time gives the same streams as spawning
+        # them all at once
+        yield simulation.simulate(ref_img, None if seed_sequence is None else seed_sequence.spawn(1)[0])
+
+
+def _simulate_image_stack(
+    ref_imgs: np.ndarray,
+    simulation: _Simulation,
+    gsd: float,
+    pix_values: Optional[np.ndarray],
+    refl_values: Optional[np.ndarray],
+    rng: Optional[noise.RNGLike],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    image_rngs: List[Optional[np.random.SeedSequence]] = [None] * ref_imgs.shape[0]
+    if rng is not None:
+        image_rngs = list(_seed_sequence(rng).spawn(ref_imgs.shape[0]))
+    true_imgs = np.empty(ref_imgs.shape)
+    blur_imgs = np.empty((0,))
+    noisy_imgs = np.empty((0,))
+    for n in range(ref_imgs.shape[0]):
+        ref_img = RefImage(ref_imgs[n], gsd, pix_values, refl_values)
+        true_img, blur_img, noisy_img = simulation.simulate(ref_img, image_rngs[n])
+        if n == 0:
+            # every image has the same size, so the first determines the output
+            blur_imgs = np.empty((ref_imgs.shape[0],) + blur_img.shape)
+            noisy_imgs = np.empty((ref_imgs.shape[0],) + noisy_img.shape)
+        true_imgs[n] = true_img
+        blur_imgs[n] = blur_img
+        noisy_imgs[n] = noisy_img
+
+    return true_imgs, blur_imgs, noisy_imgs
 
 
 def stretch_contrast_convert_8bit(
@@ -16,7 +16,6 @@ Maintainer: Kitware, Inc. <nrtk@kitware.com>
 # 3rd party imports
 from typing import Optional, Tuple
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 from .scenario import Scenario
@@ -117,6 +116,9 @@ class RefImage:
         return sensor, scenario
 
     def show(self) -> None:
+        # pyplot is slow to import, so it is only imported for plotting
+        import matplotlib.pyplot as plt
+
         h, w = self.img.shape[:2]
         plt.imshow(
             self.img,
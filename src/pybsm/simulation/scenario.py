@@ -35,7 +35,7 @@ class Scenario:
         with 5 km visibility)
     :parameter altitude:
         sensor height above ground level in meters; the database includes the
-        following altitude options: 2 32.55 75 150 225 500 meters, 1000 to
+        following altitude options: 2 32.5 75 150 225 500 meters, 1000 to
         12000 in 1000 meter steps, and 14000 to 20000 in 2000 meter steps,
         24500
     :parameter ground_range:
@@ -149,17 +149,27 @@ class Scenario:
             (direct radiance + diffuse radiance) * surface reflectance
 
             NOTE: Units for columns 1 through 5 are in radiance W/(sr m^2 m).
+            The returned array is read-only.
 
         """
         if self._atm is None:
-            # Read in and cache results.
-            if self._interp:
-                self._atm = utils.load_database_atmosphere(
-                    self.altitude, self.ground_range, self.ihaze
-                )
-            else:
-                self._atm = utils.load_database_atmosphere_no_interp(
-                    self.altitude, self.ground_range, self.ihaze
-                )
+            # Read in and cache results. The array is shared through the
+            # process-wide atmosphere cache and is read-only.
+            self._atm = utils.get_atmosphere(
+                self.altitude, self.ground_range, self.ihaze, self._interp
+            )
 
         return self._atm
+
+    def fingerprint(self) -> str:
+        """Return a hash of every attribute that affects the simulated OTF and radiometry.
+
+        Scenarios with equal fingerprints produce identical simulation
+        results; the name and the loaded atmosphere (which is determined by
+        the other attributes) are not included.
+
+        :return:
+            fingerprint:
+                hexadecimal digest that is stable across processes
+        """
+        return utils.attribute_fingerprint(self, exclude=("name", "_atm"))
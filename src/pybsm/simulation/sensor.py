@@ -18,6 +18,8 @@ from typing import Optional
 
 import numpy as np
 
+from pybsm import utils
+
 
 class Sensor:
     """Example details of the camera system.
@@ -136,6 +138,16 @@ class Sensor:
     # The number of frames to be added together for improved SNR.
     frame_stacks: int
 
+    # The number of detectors aggregated into each pixel in the x and y
+    # directions (see pybsm.otf.functional.detector_OTF_with_aggregation).
+    n_aggregate: int
+
+    # Ratio of the TDI clocking rate to the image motion rate.  When set, the
+    # TDI mismatch blur of pybsm.otf.functional.tdi_OTF is applied along the
+    # y direction with tdi_phases_n clock phases per transfer.
+    tdi_beta: Optional[float]
+    tdi_phases_n: int
+
     def __init__(
         self,
         name: str,
@@ -230,3 +242,19 @@ class Sensor:
         # actually used anywhere downstream.
         self.filter_kernel = np.array([1])
         self.frame_stacks = 1
+        self.n_aggregate = 1
+        self.tdi_beta = None
+        self.tdi_phases_n = 1
+
+    def fingerprint(self) -> str:
+        """Return a hash of every attribute that affects the simulated OTF and radiometry.
+
+        Sensors with equal fingerprints produce identical simulation results;
+        the name is not included.  The fingerprint reflects the current
+        attribute values, so it changes when an attribute is modified.
+
+        :return:
+            fingerprint:
+                hexadecimal digest that is stable across processes
+        """
+        return utils.attribute_fingerprint(self, exclude=("name",))
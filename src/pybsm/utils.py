@@ -14,13 +14,20 @@ Public release approval for version 0.1: 88ABW-2018-5226
 Maintainer: Kitware, Inc. <nrtk@kitware.com>
 """
 # standard library imports
-import inspect
+import functools
+import hashlib
 import os
+import threading
 import warnings
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
 
 # 3rd party imports
 import numpy as np
 
+# local imports
+from pybsm import instrumentation
+
 # new in version 0.2.  We filter warnings associated with calculations in the
 # function circularApertureOTF.  These invalid values are caught as NaNs and
 # appropriately replaced.
@@ -30,8 +37,522 @@ warnings.filterwarnings("ignore", r"invalid value encountered in true_divide")
 warnings.filterwarnings("ignore", r"divide by zero encountered in true_divide")
 
 # find the current path (used to locate the atmosphere database)
-# dir_path = os.path.dirname(os.path.abspath(__file__))
-dir_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
+dir_path = os.path.dirname(os.path.abspath(__file__))
+
+# location of the MODTRAN atmosphere database and of its packed, single-file
+# copy (see build_atmosphere_database)
+atms_path = os.path.join(dir_path, "atms")
+packed_atmosphere_path = os.path.join(atms_path, "atmospheres.npy")
+
+# each database record holds 5 columns sampled at 1371 wavelengths from 0.3 to
+# 14 micrometers in 0.01 micrometer steps
+_N_WAVELENGTHS = 1371
+_N_COLUMNS = 5
+_wavelengths = np.expand_dims(1e-6 * np.linspace(0.3, 14.0, _N_WAVELENGTHS), axis=1)
+
+_no_atm_message = "No atm file found for provided condition. Change values or use interpolation as necessary."
+
+# database altitudes and ground ranges (m) used for interpolation; ground
+# ranges beyond the horizon at a given altitude are not in the database
+_altitude_grid = np.array(
+    [2.0, 32.5, 75.0, 150.0, 225.0, 500.0]
+    + list(np.arange(1000.0, 12000.01, 1000.0))
+    + list(np.arange(14000.0, 20000.01, 2000.0))
+)
+_ground_range_grid = np.concatenate(
+    [
+        [0.0, 100.0, 500.0],
+        np.arange(1000.0, 20000.01, 1000.0),
+        np.arange(22000.0, 80000.01, 2000.0),
+        np.arange(85000.0, 300000.01, 5000.0),
+    ]
+)
+
+
+def _atmosphere_key(altitude: float, ground_range: float, ihaze: int) -> Tuple[float, float, float]:
+    """Returns the dictionary key used to index a database record.
+
+    Altitude and ground range are rounded to the millimeter so that the
+    lookup does not depend on floating point error in the m <-> km conversion
+    (e.g. 32.5 m / 1000.0 is not exactly 0.0325 km).
+    """
+    return float(ihaze), round(float(altitude), 3), round(float(ground_range), 3)
+
+
+@functools.lru_cache(maxsize=None)
+def _decoder_index(atms_dir: str) -> Dict[Tuple[float, float, float], int]:
+    """Parses 'fileDecoder.csv' once and maps each record key to its file number."""
+    decoder = np.genfromtxt(os.path.join(atms_dir, "fileDecoder.csv"), delimiter=",", skip_header=1)
+    return {
+        _atmosphere_key(altitude * 1000.0, ground_range * 1000.0, ihaze): int(index)
+        for index, altitude, ground_range, ihaze in decoder[:, :4]
+    }
+
+
+def _read_atmosphere_file(atms_dir: str, file_index: int) -> np.ndarray:
+    """Reads a single database record with radiance columns converted to W/(sr m^2 m)."""
+    raw_data = np.fromfile(
+        os.path.join(atms_dir, str(file_index) + ".bin"),
+        dtype=np.float32,
+        count=-1,
+    )
+
+    raw_data = raw_data.reshape((_N_WAVELENGTHS, _N_COLUMNS), order="F")
+    raw_data[:, 1:5] = raw_data[:, 1:5] / 1e-10  # convert radiance columns to W/(sr m^2 m)
+
+    return raw_data
+
+
+class AtmosphereDatabase:
+    """Packed, memory-mapped copy of the MODTRAN atmosphere database.
+
+    All records are stored in one float32 array of shape
+    (ihaze, altitude, ground_range, 1371, 5) that is memory-mapped rather than
+    read, so a lookup is a zero-copy slice instead of a file open.  Grid points
+    without a record (ground ranges beyond the horizon) are zero-filled and
+    flagged as invalid.
+
+    :param path:
+        path to the packed database written by build_atmosphere_database; the
+        index is read from the '_index.npz' file next to it
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.data = np.load(path, mmap_mode="r")
+        with np.load(_atmosphere_index_path(path)) as index:
+            # grid coordinates; altitudes and ground ranges are in meters
+            self.ihaze_values = index["ihaze"]
+            self.altitudes = index["altitude"]
+            self.ground_ranges = index["ground_range"]
+            self.valid = index["valid"]
+
+        self._index = {
+            _atmosphere_key(self.altitudes[j], self.ground_ranges[k], self.ihaze_values[i]): (int(i), int(j), int(k))
+            for i, j, k in np.argwhere(self.valid)
+        }
+
+    def record_index(self, altitude: float, ground_range: float, ihaze: int) -> Tuple[int, int, int]:
+        """Returns the (ihaze, altitude, ground_range) grid index of a record.
+
+        :raises:
+            IndexError:
+                if the database has no record for the provided condition
+        """
+        try:
+            return self._index[_atmosphere_key(altitude, ground_range, ihaze)]
+        except KeyError:
+            raise IndexError(_no_atm_message) from None
+
+    def lookup(self, altitude: float, ground_range: float, ihaze: int) -> np.ndarray:
+        """Returns a read-only (1371, 5) view of a record; see load_database_atmosphere_view."""
+        return self.data[self.record_index(altitude, ground_range, ihaze)]
+
+
+def _atmosphere_index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + "_index.npz"
+
+
+def build_atmosphere_database(path: Optional[str] = None, atms_dir: Optional[str] = None) -> str:
+    """Packs every record of the atmosphere database into a single memory-mappable file.
+
+    This is a one-time build step.  Once the packed file exists at the default
+    location it is memory-mapped when pybsm.utils is imported; use
+    load_atmosphere_database to activate a packed file written elsewhere.
+
+    :param path:
+        output file (.npy); defaults to 'atmospheres.npy' in the database
+        directory.  The record index is written alongside it with an
+        '_index.npz' suffix.
+    :param atms_dir:
+        directory containing 'fileDecoder.csv' and the *.bin records; defaults
+        to the database shipped with pyBSM
+
+    :return:
+        path:
+            location of the packed database
+    """
+    if atms_dir is None:
+        atms_dir = atms_path
+    if path is None:
+        path = packed_atmosphere_path
+
+    decoder = _decoder_index(atms_dir)
+    ihaze_values = np.unique([key[0] for key in decoder])
+    altitudes = np.unique([key[1] for key in decoder])
+    ground_ranges = np.unique([key[2] for key in decoder])
+    valid = np.zeros((ihaze_values.size, altitudes.size, ground_ranges.size), dtype=bool)
+
+    # write to temporary files first so that a partially built database is
+    # never picked up by load_atmosphere_database
+    tmp_path = path + ".tmp.npy"
+    tmp_index_path = path + ".tmp_index.npz"
+    data = np.lib.format.open_memmap(
+        tmp_path,
+        mode="w+",
+        dtype=np.float32,
+        shape=valid.shape + (_N_WAVELENGTHS, _N_COLUMNS),
+    )
+    for (ihaze, altitude, ground_range), file_index in decoder.items():
+        if not os.path.isfile(os.path.join(atms_dir, str(file_index) + ".bin")):
+            continue
+        i = np.searchsorted(ihaze_values, ihaze)
+        j = np.searchsorted(altitudes, altitude)
+        k = np.searchsorted(ground_ranges, ground_range)
+        data[i, j, k] = _read_atmosphere_file(atms_dir, file_index)
+        valid[i, j, k] = True
+    data.flush()
+    del data
+
+    np.savez(
+        tmp_index_path,
+        ihaze=ihaze_values,
+        altitude=altitudes,
+        ground_range=ground_ranges,
+        valid=valid,
+    )
+    os.replace(tmp_index_path, _atmosphere_index_path(path))
+    os.replace(tmp_path, path)
+
+    return path
+
+
+# packed database used by the load_database_atmosphere* functions, if any
+_atmosphere_database: Optional[AtmosphereDatabase] = None
+
+
+def load_atmosphere_database(path: Optional[str] = None) -> AtmosphereDatabase:
+    """Memory-maps a packed atmosphere database and uses it for all subsequent lookups.
+
+    :param path:
+        packed database written by build_atmosphere_database; defaults to the
+        location used by build_atmosphere_database
+
+    :return:
+        database:
+            the memory-mapped database
+
+    :raises:
+        FileNotFoundError:
+            if the packed database has not been built
+    """
+    global _atmosphere_database
+
+    if path is None:
+        path = packed_atmosphere_path
+    _atmosphere_database = AtmosphereDatabase(path)
+
+    return _atmosphere_database
+
+
+if os.path.isfile(packed_atmosphere_path) and os.path.isfile(_atmosphere_index_path(packed_atmosphere_path)):
+    load_atmosphere_database()
+
+
+def load_database_atmosphere_view(altitude: float, ground_range: float, ihaze: int) -> np.ndarray:
+    """Returns the raw (1371, 5) database record for an altitude, ground range and ihaze.
+
+    With a packed database (see build_atmosphere_database) this is a
+    read-only, zero-copy view into the memory-mapped file; otherwise the
+    record is read from its individual *.bin file.  Columns are TRANS, PTH
+    THRML, SURF EMIS, SOL SCAT and GRND RFLT, i.e. the columns 1 through 5 of
+    load_database_atmosphere_no_interp (no wavelength column).
+
+    :raises:
+        IndexError:
+            if the database has no record for the provided condition
+    """
+    if _atmosphere_database is not None:
+        return _atmosphere_database.lookup(altitude, ground_range, ihaze)
+
+    try:
+        file_index = _decoder_index(atms_path)[_atmosphere_key(altitude, ground_range, ihaze)]
+    except KeyError:
+        raise IndexError(_no_atm_message) from None
+    if not os.path.isfile(os.path.join(atms_path, str(file_index) + ".bin")):
+        raise IndexError(_no_atm_message)
+
+    return _read_atmosphere_file(atms_path, file_index)
+
+
+def _sizeof(value: Any) -> int:
+    """Returns the number of bytes held by a cached value (arrays and tuples of arrays)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(v) for v in value)
+    return 0
+
+
+def _make_read_only(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _make_read_only(v)
+    return value
+
+
+def attribute_fingerprint(obj: Any, exclude: Tuple[str, ...] = ()) -> str:
+    """Returns a hash of the attributes of obj that is stable across processes.
+
+    Arrays are hashed by dtype, shape and contents; other values by type and
+    repr.  Used by Sensor.fingerprint and Scenario.fingerprint.
+
+    :param obj:
+        object whose attributes (vars(obj)) are hashed
+    :param exclude:
+        names of attributes to leave out, e.g. ones that do not affect results
+
+    :return:
+        fingerprint:
+            hexadecimal SHA-1 digest
+    """
+    digest = hashlib.sha1()
+
+    def update(value: Any) -> None:
+        if isinstance(value, np.ndarray):
+            digest.update(f"ndarray{value.dtype.str}{value.shape}".encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (list, tuple)):
+            digest.update(f"{type(value).__name__}{len(value)}".encode())
+            for v in value:
+                update(v)
+        else:
+            digest.update(f"{type(value).__name__}:{value!r};".encode())
+
+    for name in sorted(vars(obj)):
+        if name not in exclude:
+            digest.update(name.encode())
+            update(vars(obj)[name])
+
+    return digest.hexdigest()
+
+
+# format of the entries in the disk store of LRUCache.  It is part of the key
+# of every stored entry, together with the version of pybsm, so increment it
+# whenever a change to pybsm (e.g. to how the OTF or blur kernel is computed)
+# makes previously stored entries stale
+_disk_cache_format = 1
+
+
+@functools.lru_cache(maxsize=None)
+def _package_version() -> str:
+    """Returns the installed version of pybsm, or an empty string if it is not installed."""
+    from importlib.metadata import PackageNotFoundError
+
+    import pybsm
+
+    try:
+        return str(pybsm.__version__)
+    except PackageNotFoundError:
+        return ""
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the total size of its entries.
+
+    Cached numpy arrays are made read-only so that callers sharing an entry
+    cannot corrupt it; copy the array before modifying it.
+
+    :param max_bytes:
+        maximum total size of the cached arrays in bytes; the least recently
+        used entries are evicted when it is exceeded.  An entry larger than
+        max_bytes is returned but not cached.
+    :param disk_dir:
+        optional directory used as a persistent backing store.  Entries that
+        are arrays (stored as memory-mapped .npy files) or tuples of arrays
+        and numbers (stored as .npz files) are written there when computed and
+        read back on a miss, e.g. by a restarted process.  Keys must have a
+        repr that is stable across processes.  Entries written by another
+        version of pybsm are ignored.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None) -> None:
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the entry for key, calling compute() to create it on a miss.
+
+        On a miss the disk store, if any, is checked before calling compute().
+        compute() is called without holding the lock, so concurrent misses on
+        the same key may compute the value more than once; exceptions raised
+        by compute() propagate and nothing is cached.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = self._load(key)
+        if value is None:
+            value = compute()
+            self._save(key, value)
+        else:
+            with self._lock:
+                self.disk_hits += 1
+
+        value = _make_read_only(value)
+        self.put(key, value)
+
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores value under key, evicting least recently used entries as needed."""
+        nbytes = _sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self._current_bytes += nbytes
+            self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        """Changes the size limit, evicting entries if the cache is now too large."""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def clear(self) -> None:
+        """Removes all in-memory entries and resets the counters; the disk store is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
+
+    def info(self) -> Dict[str, int]:
+        """Returns the hit, miss and disk hit counts, the number of entries and their total size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "current_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self) -> None:
+        while self._current_bytes > self.max_bytes:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._current_bytes -= nbytes
+
+    def _disk_path(self, key: Hashable) -> str:
+        versioned_key = (_disk_cache_format, _package_version(), key)
+        return os.path.join(str(self.disk_dir), hashlib.sha1(repr(versioned_key).encode()).hexdigest())
+
+    def _load(self, key: Hashable) -> Any:
+        """Returns the entry for key from the disk store, or None if it is not there."""
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        if os.path.isfile(path + ".npy"):
+            return np.load(path + ".npy", mmap_mode="r")
+        if os.path.isfile(path + ".npz"):
+            with np.load(path + ".npz") as data:
+                values = [data[f"arr_{i}"] for i in range(len(data.files))]
+            return tuple(v[()] if v.ndim == 0 else v for v in values)
+        return None
+
+    def _save(self, key: Hashable, value: Any) -> None:
+        """Writes an entry to the disk store; entries that are not arrays or tuples are not stored."""
+        if self.disk_dir is None:
+            return
+        if isinstance(value, np.ndarray):
+            suffix = ".npy"
+        elif isinstance(value, tuple) and all(isinstance(v, (np.ndarray, int, float, np.number)) for v in value):
+            suffix = ".npz"
+        else:
+            return
+
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._disk_path(key)
+        # write to a temporary file so that other processes never read a
+        # partially written entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}"
+        if suffix == ".npy":
+            np.save(tmp_path, value)
+        else:
+            np.savez(tmp_path, *value)
+        os.replace(tmp_path, path + suffix)
+
+
+# process-wide cache of loaded and interpolated atmospheres (one entry is
+# 1371 x 6 float64, about 66 kB)
+_atmosphere_cache = LRUCache(max_bytes=64 * 2**20)
+
+
+@instrumentation.instrumented("atmosphere")
+def get_atmosphere(altitude: float, ground_range: float, ihaze: int, interp: bool = False) -> np.ndarray:
+    """Returns a cached, read-only atmosphere from the pre-calculated MODTRAN database.
+
+    This is the shared entry point used by Scenario.atm, niirs and niirs5.
+    The same atmosphere is loaded (and interpolated) only once per process
+    while it remains in the cache; see set_atmosphere_cache_size,
+    clear_atmosphere_cache and atmosphere_cache_info.
+
+    :param altitude:
+        sensor height above ground level in meters
+    :param ground_range:
+        distance *on the ground* between the target and sensor in meters
+    :param ihaze:
+        MODTRAN code for visibility, valid options are ihaze = 1 (Rural
+        extinction with 23 km visibility) or ihaze = 2 (Rural extinction
+        with 5 km visibility)
+    :param interp:
+        if True, linearly interpolate between database atmospheres (see
+        load_database_atmosphere), otherwise the altitude and ground range
+        must be in the database (see load_database_atmosphere_no_interp)
+
+    :return:
+        atm:
+            read-only atmosphere array with the same columns as
+            load_database_atmosphere_no_interp; copy it before modifying
+
+    :raises:
+        IndexError:
+            if the atmosphere is not in the database or not within the range
+            of the database for interpolation
+    """
+    key = (float(altitude), float(ground_range), float(ihaze), bool(interp))
+    if interp:
+        return _atmosphere_cache.get(key, lambda: load_database_atmosphere(altitude, ground_range, ihaze))
+    return _atmosphere_cache.get(key, lambda: load_database_atmosphere_no_interp(altitude, ground_range, ihaze))
+
+
+def set_atmosphere_cache_size(max_bytes: int) -> None:
+    """Sets the maximum total size in bytes of the atmosphere cache (0 disables caching)."""
+    _atmosphere_cache.resize(max_bytes)
+
+
+def clear_atmosphere_cache() -> None:
+    """Empties the atmosphere cache and resets its hit and miss counters."""
+    _atmosphere_cache.clear()
+
+
+def atmosphere_cache_info() -> Dict[str, int]:
+    """Returns the hits, misses, entries, current_bytes and max_bytes of the atmosphere cache."""
+    return _atmosphere_cache.info()
 
 
 def load_database_atmosphere_no_interp(
@@ -44,7 +565,7 @@ def load_database_atmosphere_no_interp(
 
     :param altitude:
         sensor height above ground level in meters.  The database includes the
-        following altitude options: 2 32.55 75 150 225 500 meters, 1000 to
+        following altitude options: 2 32.5 75 150 225 500 meters, 1000 to
         12000 in 1000 meter steps, and 14000 to 20000 in 2000 meter steps,
         24500 meters
     :param ground_range:
@@ -79,35 +600,10 @@ def load_database_atmosphere_no_interp(
             + diffuse radiance) * surface reflectance
     :NOTE: units for columns 1 through 5 are in radiance W/(sr m^2 m)
     """
-    # decoder maps filenames to atmospheric attributes
-    atm_path = os.path.join(dir_path, "atms", "fileDecoder.csv")
-    decoder = np.genfromtxt(atm_path, delimiter=",", skip_header=1)
-
-    decoder = decoder[decoder[:, 3] == ihaze]  # downselects to the right ihaze mode
-    decoder = decoder[
-        decoder[:, 1] == altitude / 1000.0
-    ]  # downselects to the right altitude
-    decoder = decoder[
-        decoder[:, 2] == ground_range / 1000.0
-    ]  # downselects to the right ground range
-
-    if not os.path.isfile(dir_path + "/atms/" + str(int(decoder[0, 0])) + ".bin"):
-        raise IndexError("No atm file found for provided condition. Change values or use interpolation as necessary.")
-    raw_data = np.fromfile(
-        dir_path + "/atms/" + str(int(decoder[0, 0])) + ".bin",
-        dtype=np.float32,
-        count=-1,
-    )
-
-    raw_data = raw_data.reshape((1371, 5), order="F")
-    raw_data[:, 1:5] = (
-        raw_data[:, 1:5] / 1e-10
-    )  # convert radiance columns to W/(sr m^2 m)
+    raw_data = load_database_atmosphere_view(altitude, ground_range, ihaze)
 
     # append wavelength as first column
-    wavelength = 1e-6 * np.linspace(0.3, 14.0, 1371)
-    wavelength = np.expand_dims(wavelength, axis=1)
-    atm = np.hstack((wavelength, raw_data))
+    atm = np.hstack((_wavelengths, raw_data))
 
     return atm
 
@@ -156,92 +652,105 @@ def load_database_atmosphere(
             + diffuse radiance) * surface reflectance
     :NOTE: units for columns 1 through 5 are in radiance W/(sr m^2 m)
     """
+    return load_database_atmosphere_batch(np.array([altitude]), np.array([ground_range]), ihaze)[0]
 
-    def get_ground_range_array(max_ground_range: float) -> np.ndarray:
-        """Returns an array of ground ranges that are valid in the precalculated MODTRAN database.
 
-        :param max_ground_range:
-            largest ground Range of interest (m)
-
-        :return:
-            g:
-                array of ground ranges less than max_ground_range (m)
-        """
-        g = np.array([0.0, 100.0, 500.0])
-        g = np.append(g, np.arange(1000.0, 20000.01, 1000.0))
-        g = np.append(g, np.arange(22000.0, 80000.01, 2000.0))
-        g = np.append(g, np.arange(85000.0, 300000.01, 5000.0))
-        g = g[g <= max_ground_range]
-        return g
-
-    def alt_atm_interp(
-        low_alt: float,
-        high_alt: float,
-        altitude: float,
-        ground_range: float,
-        ihaze: int,
-    ) -> np.ndarray:
-        # this is an internal function for interpolating atmospheres across
-        # altitudes
-        low_atm = load_database_atmosphere_no_interp(low_alt, ground_range, ihaze)
-        if low_alt != high_alt:
-            high_atm = load_database_atmosphere_no_interp(high_alt, ground_range, ihaze)
-            low_weight = 1 - ((altitude - low_alt) / (high_alt - low_alt))
-            high_weight = (altitude - low_alt) / (high_alt - low_alt)
-            atm = low_weight * low_atm + high_weight * high_atm
-        else:
-            atm = low_atm
-        return atm
+def load_database_atmosphere_batch(
+    altitudes: np.ndarray, ground_ranges: np.ndarray, ihaze: Union[int, np.ndarray]
+) -> np.ndarray:
+    """Linear interpolation of the pre-calculated MODTRAN atmospheres at many points at once.
+
+    Equivalent to calling load_database_atmosphere for each point, but the
+    bracketing database atmospheres are found with a single search against
+    the database grids, each distinct database atmosphere is loaded only once
+    and the interpolation is carried out on whole arrays.
+
+    :param altitudes:
+        sensor heights above ground level in meters
+    :param ground_ranges:
+        distances *on the ground* between the target and sensor in meters,
+        same length as altitudes
+    :param ihaze:
+        MODTRAN code for visibility, valid options are ihaze = 1 (Rural
+        extinction with 23 km visibility) or ihaze = 2 (Rural extinction
+        with 5 km visibility); a single value or one value per point
 
-    # define arrays of all possible altitude and ground ranges
-    altitude_array = np.array(
-        [
-            2,
-            32.55,
-            75,
-            150,
-            225,
-            500,
-            1000,
-            2000,
-            3000,
-            4000,
-            5000,
-            6000,
-            7000,
-            8000,
-            9000,
-            10000,
-            11000,
-            12000,
-            14000,
-            16000,
-            18000,
-            20000,
-        ]
+    :return:
+        atm:
+            stacked atmospheres of shape (N, 1371, 6) where atm[i] has the
+            columns documented in load_database_atmosphere
+
+    :raises:
+        IndexError:
+            if a point is outside of the range of the database or one of the
+            database atmospheres needed to interpolate it does not exist
+    """
+    altitudes, ground_ranges, ihaze = np.broadcast_arrays(
+        np.ravel(altitudes).astype(float), np.ravel(ground_ranges).astype(float), np.ravel(ihaze)
     )
-    ground_ranges = get_ground_range_array(301e3)
 
-    if altitude < min(altitude_array) or altitude > max(altitude_array):
+    if np.any(altitudes < _altitude_grid[0]) or np.any(altitudes > _altitude_grid[-1]):
         raise IndexError("Altitude not within range of acceptable values (2,20000)")
-    if ground_range < min(ground_ranges) or ground_range > max(ground_ranges):
+    if np.any(ground_ranges < _ground_range_grid[0]) or np.any(ground_ranges > _ground_range_grid[-1]):
         raise IndexError("Ground Range not within range of acceptable values (0,300000)")
+
     # find the database altitudes and ground ranges that bound the values of
-    # interest
-    low_alt = altitude_array[altitude_array <= altitude][-1]
-    high_alt = altitude_array[altitude_array >= altitude][0]
-    low_range = ground_ranges[ground_ranges <= ground_range][-1]
-    high_range = ground_ranges[ground_ranges >= ground_range][0]
-
-    # first interpolate across the low and high altitudes
-    # then interpolate across ground range
-    atm_low_range = alt_atm_interp(low_alt, high_alt, altitude, low_range, ihaze)
-    if low_range != high_range:
-        atm_high_range = alt_atm_interp(low_alt, high_alt, altitude, high_range, ihaze)
-        low_weight = 1 - ((ground_range - low_range) / (high_range - low_range))
-        high_weight = (ground_range - low_range) / (high_range - low_range)
-        atm = low_weight * atm_low_range + high_weight * atm_high_range
-    else:
-        atm = atm_low_range
+    # interest (low == high when a value is on the grid)
+    low_alt = np.searchsorted(_altitude_grid, altitudes, side="right") - 1
+    high_alt = np.searchsorted(_altitude_grid, altitudes, side="left")
+    low_range = np.searchsorted(_ground_range_grid, ground_ranges, side="right") - 1
+    high_range = np.searchsorted(_ground_range_grid, ground_ranges, side="left")
+
+    alt_weight = _interpolation_weight(_altitude_grid, low_alt, high_alt, altitudes)
+    range_weight = _interpolation_weight(_ground_range_grid, low_range, high_range, ground_ranges)
+
+    # load each distinct database atmosphere at the corners once
+    corners = np.stack(
+        [
+            np.concatenate([ihaze, ihaze, ihaze, ihaze]),
+            np.concatenate([low_alt, high_alt, low_alt, high_alt]),
+            np.concatenate([low_range, low_range, high_range, high_range]),
+        ],
+        axis=1,
+    )
+    unique_corners, corner_index = np.unique(corners, axis=0, return_inverse=True)
+    records = _load_grid_records(unique_corners)
+    corner_index = corner_index.reshape(4, -1)
+
+    atm = np.empty((altitudes.size, _N_WAVELENGTHS, _N_COLUMNS + 1))
+    atm[:, :, 0] = _wavelengths[:, 0]
+
+    # first interpolate across the low and high altitudes, then interpolate
+    # across ground range
+    a = alt_weight[:, np.newaxis, np.newaxis]
+    r = range_weight[:, np.newaxis, np.newaxis]
+    atm_low_range = (1 - a) * records[corner_index[0]] + a * records[corner_index[1]]
+    atm_high_range = (1 - a) * records[corner_index[2]] + a * records[corner_index[3]]
+    atm[:, :, 1:] = (1 - r) * atm_low_range + r * atm_high_range
 
     return atm
+
+
+def _interpolation_weight(grid: np.ndarray, low: np.ndarray, high: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Returns the weight of the high grid point (0 where the value is on the grid)."""
+    span = grid[high] - grid[low]
+    return np.divide(values - grid[low], span, out=np.zeros_like(values), where=span != 0)
+
+
+def _load_grid_records(corners: np.ndarray) -> np.ndarray:
+    """Returns the (N, 1371, 5) database records for rows of (ihaze, altitude index, ground range index)."""
+    records = np.empty((len(corners), _N_WAVELENGTHS, _N_COLUMNS))
+    if _atmosphere_database is not None:
+        # a single gather from the memory-mapped database
+        index = np.array(
+            [
+                _atmosphere_database.record_index(_altitude_grid[j], _ground_range_grid[k], i)
+                for i, j, k in corners
+            ]
+        ).reshape(-1, 3)
+        records[:] = _atmosphere_database.data[index[:, 0], index[:, 1], index[:, 2]]
+    else:
+        for n, (i, j, k) in enumerate(corners):
+            records[n] = get_atmosphere(_altitude_grid[j], _ground_range_grid[k], i)[:, 1:]
+
+    return records
@@ -0,0 +1,42 @@
+from typing import Any
+
+import numpy as np
+import pytest
+
+from pybsm import simulation, utils
+
+
+def _synthetic_atmosphere(altitude: float, ground_range: float, ihaze: int, interp: Any = False) -> np.ndarray:
+    """Smooth stand-in for a database atmosphere."""
+    wavelengths = 1e-6 * np.linspace(0.3, 14.0, 1371)
+    trans = np.full(wavelengths.shape, np.exp(-(altitude + ground_range) / 2e5 / ihaze))
+    solar = 1e7 * np.exp(-(((wavelengths - 0.6e-6) / 0.3e-6) ** 2))
+    atm = np.stack([wavelengths, trans, 0.05 * solar, 1e-3 * solar, 0.1 * ihaze * solar, trans * solar], axis=1)
+    atm.setflags(write=False)
+    return atm
+
+
+@pytest.fixture
+def synthetic_atmosphere(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Replaces the atmosphere database, which is not always available, with a synthetic atmosphere."""
+    monkeypatch.setattr(utils, "get_atmosphere", _synthetic_atmosphere)
+
+
+@pytest.fixture
+def isolated_otf_cache(monkeypatch: pytest.MonkeyPatch) -> utils.LRUCache:
+    """Gives the test an empty, memory-only OTF cache of its own."""
+    cache = utils.LRUCache(2**30)
+    monkeypatch.setattr(simulation.functional, "_otf_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def sensor() -> simulation.Sensor:
+    return simulation.Sensor(
+        "test", 0.275, 4.0, 0.008e-3, np.array([0.5e-6, 0.66e-6]), int_time=30e-3, read_noise=25.0, max_n=96000
+    )
+
+
+@pytest.fixture
+def scenario() -> simulation.Scenario:
+    return simulation.Scenario("test", 1, 9000.0, 0.0)
@@ -0,0 +1,94 @@
+import json
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+from pybsm import instrumentation, simulation
+
+
+@pytest.fixture(autouse=True)
+def reset_instrumentation() -> Iterator[None]:
+    yield
+    instrumentation.disable_instrumentation()
+    instrumentation.clear_instrumentation()
+
+
+class TestInstrumentation:
+    def test_disabled(self) -> None:
+        """Check that nothing is recorded while instrumentation is disabled."""
+        assert not instrumentation.instrumentation_enabled()
+        assert instrumentation.stage("a") is instrumentation.stage("b")
+        with instrumentation.stage("a"):
+            pass
+        assert instrumentation.instrumentation_info() == {}
+
+    def test_stages(self) -> None:
+        """Check that the calls of stages and instrumented functions are aggregated."""
+        calls: List[Tuple[str, float, Optional[int]]] = []
+        callback = lambda *args: calls.append(args)  # noqa: E731
+
+        @instrumentation.instrumented("function")
+        def function(x: int) -> int:
+            with instrumentation.stage("function.inner"):
+                return 2 * x
+
+        instrumentation.enable_instrumentation()
+        instrumentation.add_instrumentation_callback(callback)
+        assert function(1) == 2
+        assert function(2) == 4
+        instrumentation.remove_instrumentation_callback(callback)
+        with pytest.raises(ValueError):  # noqa: PT011
+            instrumentation.remove_instrumentation_callback(callback)
+        function(3)
+
+        info = instrumentation.instrumentation_info()
+        assert set(info) == {"function", "function.inner"}
+        for stats in info.values():
+            assert stats["calls"] == 3
+            assert 0.0 <= stats["min_time"] <= stats["max_time"] <= stats["total_time"]
+            assert "peak_memory" not in stats
+        assert info["function.inner"]["total_time"] <= info["function"]["total_time"]
+        assert [name for name, _, _ in calls] == ["function.inner", "function"] * 2
+        assert all(peak_memory is None for _, _, peak_memory in calls)
+
+        assert json.loads(instrumentation.instrumentation_to_json()) == info
+
+    def test_track_memory(self) -> None:
+        """Check that the peak allocation of nested stages is recorded."""
+        instrumentation.enable_instrumentation(track_memory=True)
+        with instrumentation.stage("outer"):
+            with instrumentation.stage("inner"):
+                a = np.ones(10**6)
+            del a
+            b = np.ones(10**5)
+        del b
+
+        info = instrumentation.instrumentation_info()
+        assert 8e6 <= info["inner"]["peak_memory"] < 9e6
+        assert info["outer"]["peak_memory"] >= info["inner"]["peak_memory"]
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_image(self, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that the stages of simulate_image are recorded."""
+        ref_img = simulation.RefImage(np.tile(np.arange(64.0), (64, 1)), gsd=0.005)
+
+        instrumentation.enable_instrumentation()
+        simulation.simulate_image(ref_img, sensor, scenario)
+        simulation.simulate_image(ref_img, sensor, scenario)
+
+        info = instrumentation.instrumentation_info()
+        for name in [
+            "simulate_image",
+            "simulate_image.reflectance_to_pe",
+            "simulate_image.psf",
+            "simulate_image.noise",
+            "apply_otf_to_image",
+            "apply_otf_to_image.filter",
+            "apply_otf_to_image.resample",
+            "reflectance_to_photoelectrons",
+        ]:
+            assert info[name]["calls"] == 2
+        # the OTF and blur kernel are cached after the first simulation
+        for name in ["common_OTFs", "common_OTFs.aperture", "common_OTFs.turbulence", "otf_to_psf"]:
+            assert info[name]["calls"] == 1
@@ -0,0 +1,140 @@
+import copy
+
+import numpy as np
+import pytest
+
+from pybsm.metrics import functional
+from pybsm.simulation import Scenario, Sensor
+
+
+def _sensor(name: str, D: float = 0.275, p: float = 0.008e-3, sharpen: bool = False) -> Sensor:  # noqa: N803
+    f = 4.0
+    sensor = Sensor(
+        name,
+        D,
+        f,
+        p,
+        np.array([0.5e-6, 0.66e-6]),
+        eta=0.4,
+        int_time=30e-3,
+        read_noise=25.0,
+        max_n=96000,
+        bit_depth=11.9,
+        s_x=0.25 * p / f,
+        s_y=0.25 * p / f,
+        da_x=10.0 * p / f,
+        da_y=0.3 * p / f,
+        pv=0.05,
+    )
+    if sharpen:
+        sensor.filter_kernel = np.array([[0.0, -1.0, 0.0], [-1.0, 5.0, -1.0], [0.0, -1.0, 0.0]])
+    return sensor
+
+
+def _scenario(altitude: float, ground_range: float, cn2_at_1m: float = 1.7e-14) -> Scenario:
+    return Scenario("test", 1, altitude, ground_range, aircraft_speed=100.0, ha_wind_speed=21.0, cn2_at_1m=cn2_at_1m)
+
+
+@pytest.mark.usefixtures("synthetic_atmosphere")
+class TestNiirsBatch:
+    @pytest.mark.parametrize("grid", [False, True])
+    def test_niirs_batch(self, grid: bool) -> None:
+        """Check that batched results match niirs and that the inputs are not modified."""
+        # the third sensor covers detector aggregation, TDI mismatch and an
+        # anisotropic wavefront error
+        sensor = _sensor("c", p=0.006e-3)
+        sensor.n_aggregate = 2
+        sensor.n_tdi = 4.0
+        sensor.tdi_beta = 0.95
+        sensor.L_y = 0.5 * sensor.D
+        sensors = [_sensor("a"), _sensor("b", D=0.2, sharpen=True), sensor]
+        scenarios = [_scenario(9000.0, 60000.0), _scenario(3000.0, 0.0, cn2_at_1m=0.0), _scenario(9000.0, 20000.0)]
+        results = functional.niirs_batch(sensors, scenarios, grid=grid)
+
+        assert results["niirs"].shape == ((9,) if grid else (3,))
+        for n in range(results["niirs"].size):
+            sensor = sensors[results["sensor_index"][n]]
+            scenario = scenarios[results["scenario_index"][n]]
+            nm = functional.niirs(copy.deepcopy(sensor), copy.deepcopy(scenario))
+            for name in ["niirs", "niirs_4", "rer_gm", "eho_gm", "ng", "gsd_gm", "gsd_gp", "elev_angle"]:
+                assert np.isclose(results[name][n], getattr(nm, name), rtol=1e-10, atol=0.0)
+            assert np.isclose(results["snr"][n], nm.snr.snr, rtol=1e-10, atol=0.0)
+        assert scenarios[0].target_reflectance == 0.15
+        assert scenarios[0].background_reflectance == 0.07
+
+    def test_niirs5_batch(self) -> None:
+        """Check that batched GIQE 5 results match niirs5 and that the sensor keeps its filter."""
+        sensor = _sensor("a", sharpen=True)
+        scenarios = [_scenario(9000.0, 60000.0), _scenario(9000.0, 20000.0)]
+        results = functional.niirs5_batch([sensor], scenarios)
+
+        assert sensor.filter_kernel.shape == (3, 3)
+        for n, scenario in enumerate(scenarios):
+            nm = functional.niirs5(copy.deepcopy(sensor), copy.deepcopy(scenario))
+            for name in ["niirs", "rer", "rer_0", "rer_90", "gsd_x", "gsd_w", "elev_angle"]:
+                assert np.isclose(results[name][n], getattr(nm, name), rtol=1e-10, atol=0.0)
+
+    @pytest.mark.parametrize("sharpen", [False, True])
+    def test_niirs_lazy_otf(self, sharpen: bool) -> None:
+        """Check that the edge terms from the OTF slices match those from the deferred 2-D OTF."""
+        sensor = _sensor("a", sharpen=sharpen)
+        nm = functional.niirs(sensor, _scenario(9000.0, 60000.0))
+        sensor.D = 0.1  # must not affect the deferred OTF
+        assert nm.uu.shape == (101, 101)
+        rer, eho = functional.giqe_edge_terms(np.abs(nm.otf.system_OTF), nm.df, nm.ifov_x, nm.ifov_y)
+        assert np.isclose(nm.rer_gm, rer)
+        assert np.isclose(nm.eho_gm, eho)
+
+        nm = functional.niirs5(_sensor("a", sharpen=sharpen), _scenario(9000.0, 60000.0))
+        rer_0, rer_90 = functional.giqe5_RER(np.abs(nm.otf.system_OTF), nm.df, nm.ifov_x, nm.ifov_y)
+        assert np.isclose(nm.rer_0, rer_0)
+        assert np.isclose(nm.rer_90, rer_90)
+
+    def test_niirs_batch_value_error(self) -> None:
+        """Cover mismatched sensor and scenario lengths."""
+        with pytest.raises(ValueError, match="must match"):
+            functional.niirs_batch([_sensor("a"), _sensor("b")], [_scenario(9000.0, 0.0)] * 3)
+
+
+class TestGIQE:
+    def test_arrays(self) -> None:
+        """Check that arrays are evaluated element-wise, on both sides of the GIQE 4 RER threshold."""
+        rer = np.array([0.5, 0.95])
+        gsd = np.array([0.3, 0.6])
+        snr = np.array([20.0, 80.0])
+        elev_angle = np.array([0.5, 1.2])
+        niirs = functional.giqe3(rer, gsd, 0.9, 1.2, snr)
+        niirs_4, gsd_gp = functional.giqe4(rer, gsd, 0.9, 1.2, snr, elev_angle)
+        niirs_5, gsd_w, rer_5 = functional.giqe5(rer, rer[::-1], gsd, snr, elev_angle)
+        for n in range(rer.size):
+            assert niirs[n] == functional.giqe3(rer[n], gsd[n], 0.9, 1.2, snr[n])
+            assert (niirs_4[n], gsd_gp[n]) == functional.giqe4(rer[n], gsd[n], 0.9, 1.2, snr[n], elev_angle[n])
+            assert (niirs_5[n], gsd_w[n], rer_5[n]) == functional.giqe5(
+                rer[n], rer[::-1][n], gsd[n], snr[n], elev_angle[n]
+            )
+
+
+class TestEdgeResponseTerms:
+    @pytest.mark.parametrize("sharpen", [False, True])
+    def test_matches_edge_response(self, sharpen: bool) -> None:
+        """Check the batched terms against edge_response for a stack of slices."""
+        df = 2000.0
+        ifov = 2e-6
+        frequencies = df * np.arange(300)
+        mtf_slices = np.stack([np.exp(-frequencies / scale) for scale in [5e4, 1e5, 2e5]])
+        if sharpen:
+            mtf_slices *= 1.0 + 0.8 * np.sin(np.pi * frequencies / frequencies[-1])
+        rer, eho = functional.edge_response_terms(mtf_slices.reshape(3, 1, -1), df, ifov)
+        assert rer.shape == (3, 1)
+        assert eho.shape == (3, 1)
+
+        for n in range(3):
+            er = [functional.edge_response(d, mtf_slices[n], df, ifov) for d in np.arange(1.0, 3.25, 0.25)]
+            expected_eho = er[1] if np.all(np.diff(er) > 0) else np.max(er)
+            expected_rer = functional.edge_response(0.5, mtf_slices[n], df, ifov) - functional.edge_response(
+                -0.5, mtf_slices[n], df, ifov
+            )
+            assert np.isclose(rer[n, 0], expected_rer)
+            assert np.isclose(eho[n, 0], expected_eho)
+            assert np.isclose(functional.relative_edge_response(mtf_slices[n], df, ifov), expected_rer)
+            assert np.isclose(functional.edge_height_overshoot(mtf_slices[n], df, ifov), expected_eho)
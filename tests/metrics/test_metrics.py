@@ -1,6 +1,12 @@
+import pickle
+from typing import Callable
+
+import numpy as np
 import pytest
 
-from pybsm.metrics import Metrics
+from pybsm.metrics import Metrics, functional
+from pybsm.otf import OTF
+from pybsm.simulation import Scenario, Sensor
 
 
 class TestMetrics:
@@ -16,3 +22,46 @@ class TestMetrics:
         """Check if created metrics matches expected parameters."""
         metrics = Metrics(name)
         assert name == metrics.name
+
+    def test_lazy_otf(self) -> None:
+        """Check that a deferred OTF is computed once, on first access."""
+        metrics = Metrics("Test")
+        with pytest.raises(AttributeError):
+            metrics.otf  # noqa: B018
+
+        calls = []
+        otf = OTF()
+
+        def compute() -> tuple:
+            calls.append(1)
+            return np.zeros(2), np.ones(2), otf
+
+        metrics.set_lazy_otf(compute)
+        assert not calls
+        assert metrics.otf is otf
+        assert np.array_equal(metrics.uu, np.zeros(2))
+        assert np.array_equal(metrics.vv, np.ones(2))
+        assert len(calls) == 1
+
+    def test_lazy_otf_setter(self) -> None:
+        """Check that an assigned value is not overwritten by a pending OTF."""
+        metrics = Metrics("Test")
+        otf = OTF()
+        metrics.set_lazy_otf(lambda: (np.zeros(2), np.ones(2), otf))
+        metrics.uu = np.full(2, 3.0)
+        assert np.array_equal(metrics.uu, np.full(2, 3.0))
+        assert np.array_equal(metrics.vv, np.ones(2))
+        assert metrics.otf is otf
+
+    @pytest.mark.usefixtures("synthetic_atmosphere")
+    @pytest.mark.parametrize("niirs", [functional.niirs, functional.niirs5])
+    def test_pickle(self, niirs: Callable[[Sensor, Scenario], Metrics], sensor: Sensor, scenario: Scenario) -> None:
+        """Check that the metrics of niirs and niirs5 survive a pickle round trip, before and after the OTF is used."""
+        metrics = niirs(sensor, scenario)
+        restored = pickle.loads(pickle.dumps(metrics))
+        assert restored.niirs == metrics.niirs
+        assert np.array_equal(restored.uu, metrics.uu)
+        assert np.array_equal(restored.otf.system_OTF, metrics.otf.system_OTF)
+
+        restored = pickle.loads(pickle.dumps(metrics))
+        assert np.array_equal(restored.vv, metrics.vv)
@@ -1,5 +1,5 @@
 from contextlib import nullcontext as does_not_raise
-from typing import ContextManager
+from typing import ContextManager, Optional
 
 import numpy as np
 import pytest
@@ -65,3 +65,49 @@ class TestNoise:
         """Test quantization_noise with normal inputs and expected outputs."""
         output = noise.quantization_noise(pe_range, bit_depth)
         assert np.isclose(output, expected)
+
+    def test_add_noise_legacy(self) -> None:
+        """Check that without rng the noise is drawn from the global state as in earlier versions."""
+        blur_img = np.linspace(0.0, 100.0, 200).reshape((10, 20))
+        np.random.seed(0)
+        expected = np.random.normal(np.random.poisson(lam=blur_img), 2.0)
+        np.random.seed(0)
+        assert np.array_equal(noise.add_noise(blur_img, 2.0), expected)
+
+    @pytest.mark.parametrize("gaussian_threshold", [None, 20.0])
+    def test_add_noise_rng(self, gaussian_threshold: Optional[float]) -> None:
+        """Check that noise drawn from a seed is reproducible, and written to non-contiguous outputs."""
+        blur_img = np.linspace(0.0, 100.0, 200).reshape((10, 20))
+        noisy_img = noise.add_noise(blur_img, 2.0, 0, gaussian_threshold)
+        assert noisy_img.dtype == np.float64
+        assert np.array_equal(noise.add_noise(blur_img, 2.0, np.random.default_rng(0), gaussian_threshold), noisy_img)
+        assert np.array_equal(
+            noise.add_noise(blur_img, 2.0, np.random.SeedSequence(0), gaussian_threshold), noisy_img
+        )
+        assert not np.array_equal(noise.add_noise(blur_img, 2.0, 1, gaussian_threshold), noisy_img)
+
+        out = np.zeros((10, 30))
+        result = noise.add_noise(blur_img, 2.0, 0, gaussian_threshold, out=out[:, 5:25])
+        assert np.shares_memory(result, out)
+        assert np.array_equal(out[:, 5:25], noisy_img)
+
+    @pytest.mark.parametrize(
+        ("mean", "gaussian_threshold"),
+        [
+            (5.0, None),
+            (50.0, None),
+            (5.0, 20.0),
+            (50.0, 20.0),
+        ],
+    )
+    def test_add_noise_statistics(self, mean: float, gaussian_threshold: Optional[float]) -> None:
+        """Check the mean and variance of the photon plus additive noise, with and without the Gaussian fast path."""
+        blur_img = np.full((500, 400), mean)
+        noisy_img = noise.add_noise(blur_img, 3.0, 0, gaussian_threshold)
+        assert np.isclose(noisy_img.mean(), mean, rtol=0.0, atol=0.05)
+        assert np.isclose(noisy_img.var(), mean + 9.0, rtol=0.02)
+        # only counts below the threshold are Poisson, i.e. integer before
+        # the additive noise
+        is_poisson = gaussian_threshold is None or mean <= gaussian_threshold
+        photons = noise.add_noise(blur_img, 0.0, 0, gaussian_threshold)
+        assert ((photons % 1 == 0) == is_poisson).all()
@@ -1,12 +1,13 @@
 import unittest.mock as mock
 from contextlib import nullcontext as does_not_raise
-from typing import Callable, ContextManager, Dict, Tuple
+from typing import Callable, ContextManager, Dict, List, Tuple
 
 import numpy as np
 import pytest
 from syrupy.assertion import SnapshotAssertion
 
-from pybsm import otf
+from pybsm import otf, simulation, utils
+from pybsm.geospatial import altitude_along_slant_path
 from pybsm.simulation import Scenario, Sensor
 
 try:
@@ -200,6 +201,44 @@ class TestOTFHelper:
         output = otf.weighted_by_wavelength(wavelengths, weights, my_function)
         assert np.isclose(output, expected).all()
 
+    @pytest.mark.parametrize(
+        ("wavelengths", "weights"),
+        [
+            (np.array([]), np.array([])),
+            (np.array([]), np.array([0.0])),
+            (np.array([0.0]), np.array([])),
+            (np.array([1.0, 2.0]), np.array([1.0])),
+        ],
+    )
+    def test_weighted_by_wavelength_vectorized_index_error(self, wavelengths: np.ndarray, weights: np.ndarray) -> None:
+        """Cover cases where IndexError occurs with vectorized models."""
+        with pytest.raises(IndexError):
+            otf.weighted_by_wavelength(wavelengths, weights, lambda wavelengths: wavelengths, vectorized=True)
+
+    @pytest.mark.parametrize("max_bytes", [1, 2**20])
+    def test_weighted_by_wavelength_vectorized(self, max_bytes: int) -> None:
+        """Check that the chunked tensor contraction matches the per-wavelength loop."""
+        uu, vv = np.meshgrid(np.linspace(-1.0, 1.0, 11), np.linspace(1.0, -1.0, 11))
+        wavelengths = np.linspace(0.5e-6, 0.66e-6, 17)
+        weights = np.linspace(1.0, 2.0, 17)
+
+        expected = otf.weighted_by_wavelength(
+            wavelengths,
+            weights,
+            lambda wavelengths: otf.circular_aperture_OTF(uu * 4e5, vv * 4e5, wavelengths, 0.275, 0.4),
+        )
+        output = otf.weighted_by_wavelength(
+            wavelengths,
+            weights,
+            lambda wavelengths: otf.circular_aperture_OTF(
+                uu * 4e5, vv * 4e5, wavelengths[:, np.newaxis, np.newaxis], 0.275, 0.4
+            ),
+            vectorized=True,
+            max_bytes=max_bytes,
+        )
+        assert output.shape == uu.shape
+        assert np.isclose(output, expected).all()
+
     @pytest.mark.parametrize(
         ("D", "R", "R0"),
         [
@@ -457,6 +496,139 @@ class TestApplyOTFToImage:
         assert np.isclose(output[0], expected[0], atol=5e-20).all()
         assert np.isclose(output[1], expected[1], atol=5e-20).all()
 
+    @pytest.mark.parametrize(
+        ("img_shape", "psf_shape"),
+        [
+            ((64, 67), (31, 32)),
+            ((20, 23), (301, 300)),
+            ((1, 9), (5, 5)),
+        ],
+    )
+    def test_apply_otf_to_image_fft(self, img_shape: Tuple[int, int], psf_shape: Tuple[int, int]) -> None:
+        """Check that frequency domain filtering matches cv2.filter2D, including for kernels larger than the image."""
+        rng = np.random.default_rng(0)
+        ref_img = rng.random(img_shape)
+        psf = rng.random(psf_shape)
+        psf /= psf.sum()
+        outputs = [
+            otf.apply_otf_to_image(ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, 1.0, psf=psf, method=method)
+            for method in ["direct", "fft", "auto"]
+        ]
+        for output in outputs[1:]:
+            assert np.isclose(output[0], outputs[0][0], rtol=0.0, atol=1e-12).all()
+
+    def test_apply_otf_to_image_otf_method(self) -> None:
+        """Check that filtering with the resampled OTF attenuates a sinusoid by the MTF."""
+        sigma = 5e3
+        u_rng = np.linspace(-1.0, 1.0, 1501) * 2e4
+        uu, vv = np.meshgrid(u_rng, u_rng[::-1])
+        otf_value = np.exp(-(uu**2 + vv**2) / (2 * sigma**2))
+        ref_img = np.tile(np.sin(np.arange(128) / 5.0), (128, 1))
+        dx = 2 * np.arctan(0.005 / 2 / 1000.0)
+
+        output = otf.apply_otf_to_image(
+            ref_img, 0.005, 1000.0, otf_value, u_rng[1] - u_rng[0], 0.005 / 1000.0, method="otf"
+        )
+        frequency = 1 / (10 * np.pi) / dx
+        expected = np.exp(-(frequency**2) / (2 * sigma**2)) * ref_img
+        assert output[0].shape == ref_img.shape
+        # away from the reflected borders
+        assert np.isclose(output[0][30:-30, 30:-30], expected[30:-30, 30:-30], atol=1e-5).all()
+        assert np.isclose(output[1].sum(), 1.0)
+
+    @pytest.mark.parametrize(
+        ("img_shape", "psf_shape", "ifov"),
+        [
+            ((64, 67), (5, 5), 4.3),
+            ((97, 80), (8, 9), 10.0),
+            ((40, 50, 3), (9, 7), 3.0),
+            ((20, 23), (41, 40), 2.5),
+            ((30, 25), (3, 3), 0.7),
+        ],
+    )
+    def test_apply_otf_to_image_fused(
+        self, img_shape: Tuple[int, ...], psf_shape: Tuple[int, int], ifov: float
+    ) -> None:
+        """Check that evaluating the kernel only at the output samples matches filtering and resampling."""
+        rng = np.random.default_rng(0)
+        ref_img = rng.random(img_shape)
+        psf = rng.random(psf_shape)
+        psf /= psf.sum()
+        direct = otf.apply_otf_to_image(ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf, method="direct")
+        fused = otf.apply_otf_to_image(ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf, method="fused")
+        assert fused[0].shape == direct[0].shape
+        assert np.isclose(fused[0], direct[0], rtol=0.0, atol=1e-12).all()
+        assert np.array_equal(fused[1], direct[1])
+
+        # evaluated in blocks of output rows
+        blocks = otf.functional._filter_resample_fused(ref_img, psf, 1.0, ifov, block_bytes=1)
+        assert np.isclose(blocks, direct[0], rtol=0.0, atol=1e-12).all()
+
+    @pytest.mark.parametrize(
+        ("psf_shape", "ifov", "expected"),
+        [
+            ((9, 9), 12.0, True),
+            ((9, 9), 5.0, False),
+            ((21, 21), 2.5, False),
+        ],
+    )
+    def test_apply_otf_to_image_auto_fused(self, psf_shape: Tuple[int, int], ifov: float, expected: bool) -> None:
+        """Check that method="auto" evaluates the kernel only at the output samples when that is less work."""
+        ref_img = np.random.default_rng(0).random((120, 130))
+        psf = np.full(psf_shape, 1.0 / np.prod(psf_shape))
+        fused = otf.functional._filter_resample_fused
+        with mock.patch.object(otf.functional, "_filter_resample_fused", wraps=fused) as fused_mock:
+            otf.apply_otf_to_image(ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf)
+        assert fused_mock.called == expected
+
+    @pytest.mark.parametrize(
+        ("img_shape", "psf_shape", "ifov"),
+        [
+            ((100, 130), (21, 21), 2.5),
+            ((64, 61), (5, 7), 1.0),
+            ((40, 50, 3), (31, 30), 3.0),
+            ((30, 40), (101, 101), 1.7),
+        ],
+    )
+    def test_apply_otf_to_image_workers(
+        self, img_shape: Tuple[int, ...], psf_shape: Tuple[int, int], ifov: float
+    ) -> None:
+        """Check that tiled filtering gives the same result for any number of workers, close to the whole image."""
+        rng = np.random.default_rng(0)
+        ref_img = rng.random(img_shape)
+        psf = rng.random(psf_shape)
+        psf /= psf.sum()
+        whole = otf.apply_otf_to_image(ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf)
+
+        tiles: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        serial = otf.apply_otf_to_image(
+            ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf, workers=1, tile_size=16,
+            tile_callback=lambda tile, elapsed: tiles.append(tile),
+        )
+        threaded = otf.apply_otf_to_image(
+            ref_img, 1.0, 1.0, np.ones((3, 3)), 1.0, ifov, psf=psf, workers=4, tile_size=16
+        )
+
+        assert np.array_equal(threaded[0], serial[0])
+        assert serial[0].shape == whole[0].shape
+        assert np.isclose(serial[0], whole[0], rtol=1e-12, atol=0.0).all()
+        assert np.array_equal(serial[1], whole[1])
+        # the tiles cover the output exactly once
+        coverage = np.zeros(serial[0].shape[:2], dtype=int)
+        for (y_0, y_1), (x_0, x_1) in tiles:
+            coverage[y_0:y_1, x_0:x_1] += 1
+        assert len(tiles) > 1
+        assert (coverage == 1).all()
+
+    def test_apply_otf_to_image_value_error(self) -> None:
+        """Cover cases where ValueError occurs."""
+        with pytest.raises(ValueError, match="Unknown filtering method"):
+            otf.apply_otf_to_image(np.ones((10, 10)), 1.0, 1.0, np.ones((10, 10)), 1.0, 1.0, method="dft")
+        with pytest.raises(ValueError, match="workers"):
+            otf.apply_otf_to_image(np.ones((10, 10)), 1.0, 1.0, np.ones((10, 10)), 1.0, 1.0, workers=0)
+        with pytest.raises(ValueError, match="Tiled filtering"):
+            otf.apply_otf_to_image(np.ones((10, 10)), 1.0, 1.0, np.ones((10, 10)), 1.0, 1.0, method="fft", workers=2)
+
 
 @pytest.mark.skipif(
                     not is_usable,
@@ -506,6 +678,32 @@ class TestOTFToPSF:
         output = otf.otf_to_psf(otf_value, df, dx_out)
         assert np.isclose(output, expected, atol=5e-20).all()
 
+    @pytest.mark.parametrize("energy_threshold", [0.5, 0.95, 0.99])
+    def test_otf_to_psf_energy_curve(self, energy_threshold: float) -> None:
+        """Check that the kernel is cropped to the first candidate square holding energy_threshold."""
+        u = np.arange(201.0) - 100
+        otf_value = np.exp(-(u[:, None] ** 2 + u**2) / 2.0)
+        psf, energy_curve = otf.otf_to_psf(
+            otf_value, 1.0, 1 / 201, energy_threshold=energy_threshold, return_energy_curve=True
+        )
+        assert np.array_equal(energy_curve[0], np.arange(1, 202))
+        assert np.all(np.diff(energy_curve[1]) >= -1e-12)
+        assert np.isclose(energy_curve[1, -1], 1.0)
+        assert np.isclose(psf.sum(), 1.0)
+
+        candidates = np.arange(10, 201, 5)
+        k_size = candidates[np.argmax(energy_curve[1, candidates - 1] > energy_threshold)]
+        assert psf.shape == (k_size + (k_size - 201) % 2,) * 2
+
+        # the same crop without the curve
+        assert np.array_equal(otf.otf_to_psf(otf_value, 1.0, 1 / 201, energy_threshold=energy_threshold), psf)
+
+    def test_otf_to_psf_small(self) -> None:
+        """Check that an OTF too small for any candidate square gives the whole kernel."""
+        output = otf.otf_to_psf(np.ones((9, 9)), 1.0, 1 / 9)
+        assert output.shape == (9, 9)
+        assert np.isclose(output[4, 4], 1.0)
+
 
 class TestCTEOTF:
     @pytest.mark.parametrize(
@@ -788,6 +986,18 @@ class TestDetectorOTFWithAggregation:
         output = otf.detector_OTF_with_aggregation(u, v, w_x, w_y, p_x, p_y, f, n)
         assert np.isclose(output, expected, atol=5e-34).all()
 
+    @pytest.mark.parametrize("n", [1, 2, 3, 4, 7])
+    def test_matches_sum(self, n: int) -> None:
+        """Check the closed form against the explicit cosine sum, including at integer multiples of f / p."""
+        u = np.concatenate([np.linspace(-2.5, 2.5, 201), [1.0 + 1e-12, 2.0 - 1e-12]]) * 2e5
+        v = u[::-1]
+        output = otf.detector_OTF_with_aggregation(u, v, 4e-6, 4e-6, 5e-6, 5e-6, 1.0, n)
+        ii = np.arange(n) - (n - 1) / 2.0
+        agg_u = np.cos(2.0 * np.pi * np.outer(5e-6 * u, ii)).sum(axis=1) / n
+        agg_v = np.cos(2.0 * np.pi * np.outer(5e-6 * v, ii)).sum(axis=1) / n
+        expected = agg_u * agg_v * np.sinc(4e-6 * u) * np.sinc(4e-6 * v)
+        assert np.isclose(output, expected, rtol=1e-9, atol=1e-12).all()
+
 
 class TestDiffusionOTF:
     @pytest.mark.parametrize(
@@ -990,7 +1200,8 @@ class TestTdiOTF:
                 10.0,
                 10,
                 10.0,
-                np.array([1.28752754e-15+4.58661209e-16j, 1.28752754e-15+4.58661209e-16j]),
+                # an exact zero of the TDI sum
+                np.array([0.0 + 0.0j, 0.0 + 0.0j]),
             ),
         ],
     )
@@ -1000,7 +1211,22 @@ class TestTdiOTF:
     ) -> None:
         """Test cte_OTF with normal inputs and expected outputs."""
         output = otf.tdi_OTF(u_or_v, w, n_tdi, phases_n, beta, f)
-        assert np.isclose(output, expected, atol=5e-34).all()
+        # values at zeros of the OTF are only defined up to rounding error
+        assert np.isclose(output, expected, atol=1e-15).all()
+
+    @pytest.mark.parametrize(
+        ("n_tdi", "phases_n", "beta"),
+        [(64, 4, 1.05), (16, 3, 0.9), (2.5, 1, 1.2), (8, 2, 1.0)],
+    )
+    def test_matches_sum(self, n_tdi: float, phases_n: int, beta: float) -> None:
+        """Check the closed form against the explicit sum, including near its singular points."""
+        u = np.linspace(-3.0, 3.0, 201) * 1e5
+        u = np.concatenate([u, 4.0 / (8e-6 * abs(beta - 1.0) + 1e-30) * np.array([1.0, 1.0 + 1e-12])])
+        xx = 8e-6 * u / (4.0 * beta)
+        expected = sum(np.exp(-2.0j * np.pi * xx * (beta - 1.0) * ii) for ii in np.arange(0, n_tdi * phases_n))
+        expected = np.sinc(xx) * expected / (n_tdi * phases_n)
+        output = otf.tdi_OTF(u, 8e-6, n_tdi, phases_n, beta, 4.0)
+        assert np.isclose(output, expected, rtol=1e-9, atol=1e-12).all()
 
 
 class TestWavefrontOTF2:
@@ -1079,6 +1305,24 @@ class TestSliceOTF:
         output = otf.slice_otf(otf_input, ang)
         assert np.isclose(output, expected, atol=5e-34).all()
 
+    @pytest.mark.parametrize("ang", [0.0, 0.3, np.pi / 2, 2.0, np.pi, 4.0, -np.pi / 4])
+    def test_linear_otf(self, ang: float) -> None:
+        """Check that slices of a linear function of (u, v) are exact in every quadrant."""
+        u, v = np.meshgrid(np.linspace(-1.0, 1.0, 101), np.linspace(1.0, -1.0, 101))
+        r = np.arange(0.0, 1.0, 0.02)
+        output = otf.slice_otf(2.0 * u + 3.0 * v + 1j * u, ang)
+        expected = 2.0 * r * np.cos(ang) + 3.0 * r * np.sin(ang) + 1j * r * np.cos(ang)
+        assert np.isclose(output, expected).all()
+
+    def test_many_angles(self) -> None:
+        """Check that an array of angles returns one slice per angle."""
+        otf_input = np.random.default_rng(0).random((51, 51))
+        angles = np.array([0.0, 0.5, np.pi / 2])
+        output = otf.slice_otf(otf_input, angles)
+        assert output.shape == (3, 25)
+        for n in range(len(angles)):
+            assert np.array_equal(output[n], otf.slice_otf(otf_input, angles[n]))
+
 
 class TestPolychromaticTurbulenceOTF:
     @pytest.mark.parametrize(
@@ -1536,6 +1780,49 @@ class TestPolychromaticTurbulenceOTF:
         assert np.isclose(output[1], expected[1]).all()
 
 
+class TestSlantPathCoherenceDiameter:
+    @staticmethod
+    def path_r0(altitude: float, slant_range: float, ha_wind_speed: float, cn2_at_1m: float) -> float:
+        """The coherence diameter from the sampled slant path."""
+        z_path, h_path = altitude_along_slant_path(0.0, altitude, slant_range)
+        cn2 = otf.hufnagel_valley_turbulence_profile(h_path, ha_wind_speed, cn2_at_1m)
+        return otf.coherence_diameter(1.0e-6, z_path, cn2)
+
+    @pytest.mark.parametrize(
+        ("altitude", "slant_range", "ha_wind_speed", "cn2_at_1m"),
+        [(9000.0, 60000.0, 21.0, 1.7e-14), (100.0, 200.0, 5.0, 1.0e-13), (20000.0, 300000.0, 30.0, 1.0e-15)],
+    )
+    def test(self, altitude: float, slant_range: float, ha_wind_speed: float, cn2_at_1m: float) -> None:
+        """Check scalar, cached, batched and adaptive results against the sampled slant path."""
+        expected = self.path_r0(altitude, slant_range, ha_wind_speed, cn2_at_1m)
+        output = otf.slant_path_coherence_diameter(altitude, slant_range, ha_wind_speed, cn2_at_1m)
+        assert isinstance(output, float)
+        assert np.isclose(output, expected, rtol=1e-12)
+        assert otf.slant_path_coherence_diameter(altitude, slant_range, ha_wind_speed, cn2_at_1m) == output
+
+        output = otf.slant_path_coherence_diameter(altitude, slant_range, ha_wind_speed, cn2_at_1m, rtol=1e-8)
+        assert np.isclose(output, expected, rtol=1e-7)
+
+    def test_batch(self) -> None:
+        """Check that arrays of geometries broadcast and match the scalar results."""
+        altitude = np.array([[1000.0], [9000.0]])
+        slant_range = np.array([10000.0, 20000.0, 60000.0])
+        for rtol in [None, 1e-8]:
+            output = otf.slant_path_coherence_diameter(altitude, slant_range, 21.0, 1.7e-14, rtol=rtol)
+            assert output.shape == (2, 3)
+            for i in range(2):
+                for j in range(3):
+                    expected = otf.slant_path_coherence_diameter(altitude[i, 0], slant_range[j], 21.0, 1.7e-14)
+                    assert np.isclose(output[i, j], expected, rtol=1e-7 if rtol else 1e-12)
+
+    def test_zero_division(self) -> None:
+        """Cover cases where ZeroDivision occurs."""
+        with pytest.raises(ZeroDivisionError):
+            otf.slant_path_coherence_diameter(1.0, 0.0, 1.0, 1.0)
+        with pytest.raises(ZeroDivisionError):
+            otf.slant_path_coherence_diameter(1.0, np.array([1.0, 0.0]), 1.0, 1.0)
+
+
 class TestDetectorOTF:
     @pytest.mark.parametrize(
         ("u", "v", "w_x", "w_y", "f"),
@@ -1990,6 +2277,68 @@ class TestCommonOTFs:
         )
         self.check_otf(output, **expected)
 
+    @pytest.mark.parametrize(("L_y", "n_aggregate", "tdi_beta"), [(0.275, 1, None), (0.1, 3, 1.02)])
+    def test_grid(self, L_y: float, n_aggregate: int, tdi_beta: float) -> None:  # noqa: N803
+        """Check that a frequency grid gives the same OTFs as evaluating each of its points."""
+        sensor = Sensor("test_sensor", 0.275, 4.0, 8e-6, np.array([0.5e-6, 0.66e-6]), s_x=5e-7, da_x=2e-5, pv=0.05)
+        sensor.L_y = L_y
+        sensor.n_aggregate = n_aggregate
+        sensor.tdi_beta = tdi_beta
+        scenario = Scenario("test_scenario", 1, 9000.0, 60000.0, aircraft_speed=100.0)
+        wavelengths = np.linspace(0.5e-6, 0.66e-6, 9)
+        weights = np.linspace(1.0, 2.0, 9)
+        cutoff = sensor.D / wavelengths.min()
+        uu, vv = np.meshgrid(np.linspace(-1.0, 1.0, 201) * cutoff, np.linspace(1.0, -1.0, 201) * cutoff)
+
+        args = (wavelengths, weights, 60000.0, 0.03)
+        output = otf.common_OTFs(sensor, scenario, uu, vv, *args)
+        expected = otf.common_OTFs(sensor, scenario, uu.ravel(), vv.ravel(), *args)
+        for name in ["ap_OTF", "turb_OTF", "det_OTF", "tdi_OTF", "jit_OTF", "drft_OTF", "wav_OTF", "system_OTF"]:
+            assert getattr(output, name).shape == uu.shape
+            assert np.isclose(getattr(output, name).ravel(), getattr(expected, name), rtol=0, atol=2e-5).all()
+
+
+class TestRadialOTF:
+    def test_grid(self) -> None:
+        """Check interpolation of the radial profile onto a grid against direct evaluation."""
+        wavelengths = np.array([0.5e-6, 0.6e-6])
+        cutoff = 0.275 / wavelengths.min()
+        uu, vv = np.meshgrid(np.linspace(-1.0, 1.0, 301) * cutoff, np.linspace(1.0, -1.0, 301) * cutoff)
+
+        def profile(rho: np.ndarray) -> np.ndarray:
+            wavs = wavelengths.reshape((2,) + (1,) * rho.ndim)
+            return otf.circular_aperture_OTF(rho, np.zeros_like(rho), wavs, 0.275, 0.4)
+
+        output = otf.radial_OTF(uu, vv, profile)
+        expected = profile(np.sqrt(uu**2 + vv**2))
+        assert output.shape == (2, 301, 301)
+        assert np.isclose(output, expected, rtol=0, atol=2e-5).all()
+        assert (output[:, 150, 150] == expected[:, 150, 150]).all()
+
+    def test_map_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Check that the grid map is cached compactly and released by clear_otf_cache."""
+        cache = utils.LRUCache(2**30)
+        monkeypatch.setattr(otf.functional, "_radius_map_cache", cache)
+        uu, vv = np.meshgrid(np.linspace(-1.0, 1.0, 101), np.linspace(1.0, -1.0, 101))
+
+        output = otf.radial_OTF(uu, vv, lambda rho: rho, n_samples=64)
+        assert output.dtype == np.float64
+        assert np.isclose(output, np.sqrt(uu**2 + vv**2), rtol=0, atol=1e-3).all()
+        otf.radial_OTF(uu, vv, lambda rho: rho, n_samples=64)
+        assert cache.info()["hits"] == 1
+        # an int32 index and a float32 weight per grid point, plus the radii
+        assert cache.info()["current_bytes"] == 101 * 101 * 8 + 64 * 8
+
+        simulation.clear_otf_cache()
+        assert len(cache) == 0
+
+    def test_direct(self) -> None:
+        """Check that inputs that are not a grid are evaluated directly."""
+        u = np.array([0.0, 3.0, 1.0e5])
+        v = np.array([0.0, 4.0, 2.0e5])
+        output = otf.radial_OTF(u, v, lambda rho: rho)
+        assert np.isclose(output, np.sqrt(u**2 + v**2), rtol=1e-15, atol=0).all()
+
 
 class TestTurbulenceOTF:
     @pytest.mark.parametrize(
@@ -2258,6 +2607,19 @@ class TestFilterOTF:
         output = otf.filter_OTF(u, v, kernel, ifov)
         assert np.isclose(output, expected, atol=5e-20).all()
 
+    def test_wrap_and_kernel_change(self) -> None:
+        """Check Nyquist wrapping on a grid and that modifying a kernel in place changes its OTF."""
+        ifov = 2e-6
+        nyquist = 0.5 / ifov
+        u, v = np.meshgrid(np.linspace(-0.9, 0.9, 7) * nyquist, np.linspace(0.9, -0.9, 5) * nyquist)
+        kernel = np.array([[0.0, -1.0, 0.0], [-1.0, 5.0, -1.0], [0.0, -1.0, 0.0]])
+        output = otf.filter_OTF(u, v, kernel, ifov)
+        assert output.shape == (5, 7)
+        assert np.isclose(otf.filter_OTF(u + 2 * nyquist, v - 4 * nyquist, kernel, ifov), output).all()
+
+        kernel[1, 1] = 4.0
+        assert not np.isclose(otf.filter_OTF(u, v, kernel, ifov), output).all()
+
 
 class TestWavefrontOTF:
     @pytest.mark.parametrize(
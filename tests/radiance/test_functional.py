@@ -980,6 +980,85 @@ class TestReflectanceToPhotoelectrons:
         assert np.isclose(output[1], expected[1]).all()
         assert np.isclose(output[2], expected[2]).all()
 
+    @staticmethod
+    def _synthetic_atm() -> np.ndarray:
+        wavelengths = 1e-6 * np.linspace(0.3, 14.0, 1371)
+        solar = 1e7 * np.exp(-(((wavelengths - 0.6e-6) / 0.3e-6) ** 2))
+        return np.stack(
+            [wavelengths, np.full(wavelengths.shape, 0.7), 1e4 + 0.05 * solar, 1e3 + 1e-3 * solar, 0.1 * solar, solar],
+            axis=1,
+        )
+
+    @pytest.mark.parametrize(
+        ("sensor", "target_temp"),
+        [
+            (Sensor("Test", 0.2, 1.0, 10e-6, np.array([0.5e-6, 0.7e-6]), dark_current=100.0, max_n=int(1e12)), 300),
+            (
+                Sensor("Test", 0.1, 0.3, 15e-6, np.array([3e-6, 5e-6]), optics_emissivity=0.1, max_n=int(1e12)),
+                250,
+            ),
+        ],
+    )
+    def test_reflectance_to_photoelectrons_closed_form(self, sensor: Sensor, target_temp: float) -> None:
+        """Check the closed form mapping against the signal rate at each reflectance."""
+        atm = self._synthetic_atm()
+        reflectance = np.linspace(0.0, 1.0, 7)
+        ref, pe, _ = radiance.reflectance_to_photoelectrons(atm, sensor, 0.01, target_temp, reflectance)
+
+        band = atm[(atm[:, 0] >= sensor.opt_trans_wavelengths[0]) & (atm[:, 0] <= sensor.opt_trans_wavelengths[-1])]
+        other_irradiance = radiance.optics_self_emission(
+            band[:, 0], sensor.optics_temperature, sensor.optics_emissivity, 1.0, sensor.D, sensor.f
+        ) + radiance.cold_shield_self_emission(band[:, 0], sensor.cold_shield_temperature, sensor.D, sensor.f)
+        for i in range(ref.size):
+            rate, _, _ = radiance.signal_rate(
+                band[:, 0],
+                radiance.total_radiance(band, ref[i], target_temp),
+                np.ones(band.shape[0]),
+                sensor.D,
+                sensor.f,
+                sensor.w_x,
+                sensor.w_y,
+                np.ones(band.shape[0]),
+                other_irradiance,
+                sensor.dark_current,
+            )
+            assert np.isclose(pe[i], rate * 0.01)
+
+    def test_reflectance_to_photoelectrons_int_times(self) -> None:
+        """Check that each integration time is scaled for saturation independently."""
+        sensor = Sensor("Test", 0.2, 1.0, 10e-6, np.array([0.5e-6, 0.7e-6]), max_n=96000)
+        atm = self._synthetic_atm()
+        int_times = np.array([1e-9, 1e-3, 1.0])
+        ref, pe, spectral_weights = radiance.reflectance_to_photoelectrons(atm, sensor, int_times)
+
+        assert pe.shape == (3, 100)
+        assert pe[0].max() < sensor.max_n
+        assert np.isclose(pe[1:].max(axis=1), sensor.max_n).all()
+        for i in range(int_times.size):
+            expected = radiance.reflectance_to_photoelectrons(atm, sensor, int_times[i])
+            assert np.isclose(pe[i], expected[1]).all()
+            assert np.isclose(spectral_weights, expected[2]).all()
+
+    def test_reflectance_to_photoelectrons_batch(self) -> None:
+        """Check that the batched mapping matches one call per sensor."""
+        sensors = [
+            Sensor("Test", 0.2, 1.0, 10e-6, np.array([0.5e-6, 0.7e-6])),
+            Sensor("Test", 0.1, 1.0, 5e-6, np.array([0.4e-6, 0.9e-6])),
+        ]
+        atm = self._synthetic_atm()
+        ref, pe, spectral_weights = radiance.reflectance_to_photoelectrons_batch(
+            atm, sensors, [1e-4, 2e-4], reflectance=np.linspace(0.0, 1.0, 11)
+        )
+
+        assert pe.shape == (2, 11)
+        for i, int_time in enumerate([1e-4, 2e-4]):
+            expected = radiance.reflectance_to_photoelectrons(atm, sensors[i], int_time, reflectance=ref)
+            assert np.isclose(pe[i], expected[1]).all()
+            assert np.isclose(spectral_weights[i], expected[2]).all()
+
+        with pytest.raises(ValueError):  # noqa: PT011
+            radiance.reflectance_to_photoelectrons_batch(atm, sensors, [1e-4, 2e-4, 3e-4])
+
     @pytest.mark.parametrize(
         (
             "L",
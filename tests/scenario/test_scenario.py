@@ -185,3 +185,14 @@ class TestScenario:
         atm = scenario.atm
         assert scenario._atm is not None
         assert np.isclose(atm, expected).all()
+
+    def test_fingerprint(self) -> None:
+        """Check that the fingerprint ignores the name and loaded atmosphere but tracks the geometry."""
+        scenario = Scenario("test", 1, 1000.0, 0.0)
+        other = Scenario("other", 1, 1000.0, 0.0)
+        other._atm = np.ones((2, 6))
+        assert scenario.fingerprint() == other.fingerprint()
+
+        other.altitude = 2000.0
+        assert scenario.fingerprint() != other.fingerprint()
+        assert scenario.fingerprint() != Scenario("test", 1, 1000.0, 0.0, interp=True).fingerprint()
@@ -1,3 +1,6 @@
+from pathlib import Path
+from typing import Any
+
 import numpy as np
 import pytest
 
@@ -69,3 +72,251 @@ class TestUtils:
         """Test load_database_atmosphere with normal inputs and expected outputs."""
         output = utils.load_database_atmosphere(altitude, ground_range, ihaze)
         assert np.isclose(output, expected).all()
+
+
+def _write_synthetic_database(atms_dir: Path) -> None:
+    """Writes a tiny atmosphere database with two records and one missing file."""
+    atms_dir.mkdir()
+    (atms_dir / "fileDecoder.csv").write_text(
+        "Index, Altitude (km), Ground Range (km), IHAZE\n1,0.0325,0,1,\n2,1,0.5,1,\n3,1,0.5,2,\n"
+    )
+    for index in (1, 2):
+        raw_data = np.arange(1371 * 5, dtype=np.float32) * index * 1e-10
+        raw_data.tofile(atms_dir / f"{index}.bin")
+
+
+class TestAtmosphereDatabase:
+    def test_decoder_index(self) -> None:
+        """Check that records are found despite floating point error in the km to m conversion."""
+        decoder = utils._decoder_index(utils.atms_path)
+        assert decoder[utils._atmosphere_key(32.5, 0.0, 1)] == 9
+        assert decoder[utils._atmosphere_key(75.0, 100.0, 2)] > 0
+        assert len(decoder) == 3430
+
+    def test_build_and_lookup(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Check that packed records match the individual files and are read-only views."""
+        atms_dir = tmp_path / "atms"
+        _write_synthetic_database(atms_dir)
+        path = utils.build_atmosphere_database(str(tmp_path / "atmospheres.npy"), atms_dir=str(atms_dir))
+
+        database = utils.AtmosphereDatabase(path)
+        assert database.data.shape == (2, 2, 2, 1371, 5)
+        assert database.valid.sum() == 2
+
+        expected = utils._read_atmosphere_file(str(atms_dir), 2)
+        view = database.lookup(1000.0, 500.0, 1)
+        assert np.array_equal(view, expected)
+        assert not view.flags.writeable
+
+        monkeypatch.setattr(utils, "_atmosphere_database", None)
+        assert utils.load_atmosphere_database(path) is utils._atmosphere_database
+        atm = utils.load_database_atmosphere_no_interp(32.5, 0.0, 1)
+        assert atm.shape == (1371, 6)
+        assert np.array_equal(atm[:, 1:], utils._read_atmosphere_file(str(atms_dir), 1))
+        assert np.isclose(atm[[0, -1], 0], [0.3e-6, 14e-6]).all()
+
+    @pytest.mark.parametrize(
+        ("ihaze", "altitude", "ground_range"),
+        [
+            (2, 1000.0, 500.0),
+            (1, 1000.0, 0.0),
+            (1, 2.0, 0.0),
+        ],
+    )
+    def test_lookup_index_error(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        ihaze: int,
+        altitude: float,
+        ground_range: float,
+    ) -> None:
+        """Cover missing records and grid points without a record."""
+        atms_dir = tmp_path / "atms"
+        _write_synthetic_database(atms_dir)
+        path = utils.build_atmosphere_database(str(tmp_path / "atmospheres.npy"), atms_dir=str(atms_dir))
+
+        monkeypatch.setattr(utils, "_atmosphere_database", utils.AtmosphereDatabase(path))
+        with pytest.raises(IndexError):
+            utils.load_database_atmosphere_view(altitude, ground_range, ihaze)
+
+
+class TestLRUCache:
+    def test_eviction(self) -> None:
+        """Check that least recently used entries are evicted once the size limit is exceeded."""
+        cache = utils.LRUCache(max_bytes=2 * 80)
+        cache.get("a", lambda: np.zeros(10))
+        cache.get("b", lambda: np.zeros(10))
+        cache.get("a", lambda: np.ones(10))
+        cache.get("c", lambda: np.zeros(10))
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.info() == {
+            "hits": 1,
+            "misses": 3,
+            "disk_hits": 0,
+            "entries": 2,
+            "current_bytes": 160,
+            "max_bytes": 160,
+        }
+
+        cache.resize(80)
+        assert len(cache) == 1
+        assert "c" in cache
+
+        cache.clear()
+        assert cache.info() == {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "entries": 0,
+            "current_bytes": 0,
+            "max_bytes": 80,
+        }
+
+    def test_read_only(self) -> None:
+        """Check that cached arrays cannot be modified by callers."""
+        cache = utils.LRUCache(max_bytes=1000)
+        value = cache.get("a", lambda: np.zeros(10))
+        assert value is cache.get("a", lambda: np.ones(10))
+        with pytest.raises(ValueError, match="read-only"):
+            value[0] = 1.0
+
+    def test_oversized_entry(self) -> None:
+        """Check that entries larger than the cache are returned but not stored."""
+        cache = utils.LRUCache(max_bytes=10)
+        assert cache.get("a", lambda: np.zeros(10)).shape == (10,)
+        assert len(cache) == 0
+
+    def test_exception_not_cached(self) -> None:
+        """Check that a failed computation leaves the cache unchanged."""
+        cache = utils.LRUCache(max_bytes=1000)
+
+        def compute() -> np.ndarray:
+            raise IndexError
+
+        with pytest.raises(IndexError):
+            cache.get("a", compute)
+        assert len(cache) == 0
+
+    def test_disk_store(self, tmp_path: Path) -> None:
+        """Check that arrays and tuples are read back from the disk store by a new cache."""
+        cache = utils.LRUCache(max_bytes=1000, disk_dir=str(tmp_path))
+        cache.get(("array", 1.0), lambda: np.arange(10.0))
+        cache.get(("tuple", 1.0), lambda: (np.arange(3) + 1j, 0.5))
+        cache.get(("other", 1.0), lambda: "not stored")
+        assert len(list(tmp_path.iterdir())) == 2
+
+        restarted = utils.LRUCache(max_bytes=1000, disk_dir=str(tmp_path))
+
+        def compute() -> np.ndarray:
+            raise AssertionError("entry should be loaded from disk")
+
+        array = restarted.get(("array", 1.0), compute)
+        assert isinstance(array, np.memmap)
+        assert np.array_equal(array, np.arange(10.0))
+        otf, df = restarted.get(("tuple", 1.0), compute)
+        assert np.array_equal(otf, np.arange(3) + 1j)
+        assert df == 0.5
+        assert restarted.info()["disk_hits"] == 2
+
+    @pytest.mark.parametrize(("name", "value"), [("_disk_cache_format", -1), ("_package_version", lambda: "0.0.0")])
+    def test_disk_store_version(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, name: str, value: Any) -> None:
+        """Check that entries written by another version of pybsm or of the disk format are not read back."""
+        utils.LRUCache(max_bytes=1000, disk_dir=str(tmp_path)).get(("array", 1.0), lambda: np.arange(10.0))
+        monkeypatch.setattr(utils, name, value)
+
+        restarted = utils.LRUCache(max_bytes=1000, disk_dir=str(tmp_path))
+        assert np.array_equal(restarted.get(("array", 1.0), lambda: np.ones(10)), np.ones(10))
+        assert restarted.info()["disk_hits"] == 0
+
+
+class TestAtmosphereCache:
+    def test_get_atmosphere(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Check that repeated requests are served from the cache."""
+        atms_dir = tmp_path / "atms"
+        _write_synthetic_database(atms_dir)
+        path = utils.build_atmosphere_database(str(tmp_path / "atmospheres.npy"), atms_dir=str(atms_dir))
+        monkeypatch.setattr(utils, "_atmosphere_database", utils.AtmosphereDatabase(path))
+        monkeypatch.setattr(utils, "_atmosphere_cache", utils.LRUCache(max_bytes=2**20))
+
+        atm = utils.get_atmosphere(1000.0, 500.0, 1)
+        assert atm is utils.get_atmosphere(1000.0, 500.0, 1)
+        assert not atm.flags.writeable
+        assert np.array_equal(atm, utils.load_database_atmosphere_no_interp(1000.0, 500.0, 1))
+        assert utils.atmosphere_cache_info()["hits"] == 1
+        assert utils.atmosphere_cache_info()["misses"] == 1
+
+        with pytest.raises(IndexError):
+            utils.get_atmosphere(1000.0, 500.0, 2)
+        assert utils.atmosphere_cache_info()["entries"] == 1
+
+        utils.set_atmosphere_cache_size(0)
+        assert utils.atmosphere_cache_info()["entries"] == 0
+        utils.clear_atmosphere_cache()
+        assert utils.atmosphere_cache_info()["misses"] == 0
+
+
+class TestLoadDatabaseAtmosphereBatch:
+    @pytest.fixture
+    def database(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> np.ndarray:
+        """Synthetic 2 x 3 grid database; returns the records indexed by (altitude, ground range)."""
+        altitudes = np.array([1000.0, 2000.0])
+        ground_ranges = np.array([0.0, 500.0, 1000.0])
+        records = np.random.default_rng(0).random((2, 3, 1371, 5)).astype(np.float32)
+
+        atms_dir = tmp_path / "atms"
+        atms_dir.mkdir()
+        rows = ["Index, Altitude (km), Ground Range (km), IHAZE"]
+        for j, altitude in enumerate(altitudes):
+            for k, ground_range in enumerate(ground_ranges):
+                index = len(rows)
+                rows.append(f"{index},{altitude / 1000.0},{ground_range / 1000.0},1,")
+                (records[j, k] * np.float32(1e-10)).tofile(atms_dir / f"{index}.bin")
+        (atms_dir / "fileDecoder.csv").write_text("\n".join(rows) + "\n")
+
+        monkeypatch.setattr(utils, "atms_path", str(atms_dir))
+        monkeypatch.setattr(utils, "_altitude_grid", altitudes)
+        monkeypatch.setattr(utils, "_ground_range_grid", ground_ranges)
+        monkeypatch.setattr(utils, "_atmosphere_database", None)
+        monkeypatch.setattr(utils, "_atmosphere_cache", utils.LRUCache(max_bytes=2**20))
+
+        return np.stack(
+            [[utils._read_atmosphere_file(str(atms_dir), 3 * j + k + 1) for k in range(3)] for j in range(2)]
+        )
+
+    @pytest.mark.parametrize("packed", [False, True])
+    def test_matches_bilinear(self, database: np.ndarray, tmp_path: Path, packed: bool) -> None:
+        """Check batched results against bilinear interpolation and against load_database_atmosphere."""
+        if packed:
+            utils.load_atmosphere_database(utils.build_atmosphere_database(str(tmp_path / "atmospheres.npy")))
+
+        altitudes = np.array([1000.0, 1250.0, 2000.0, 1500.0])
+        ground_ranges = np.array([0.0, 500.0, 750.0, 100.0])
+        output = utils.load_database_atmosphere_batch(altitudes, ground_ranges, 1)
+
+        assert output.shape == (4, 1371, 6)
+        assert np.isclose(output[:, [0, -1], 0], [0.3e-6, 14e-6]).all()
+        assert np.array_equal(output[0, :, 1:], database[0, 0])
+        assert np.isclose(output[1, :, 1:], 0.75 * database[0, 1] + 0.25 * database[1, 1]).all()
+        assert np.isclose(output[2, :, 1:], 0.5 * database[1, 1] + 0.5 * database[1, 2]).all()
+        low_range = 0.5 * database[0, 0] + 0.5 * database[1, 0]
+        high_range = 0.5 * database[0, 1] + 0.5 * database[1, 1]
+        assert np.isclose(output[3, :, 1:], 0.8 * low_range + 0.2 * high_range).all()
+        for i in range(len(altitudes)):
+            assert np.array_equal(output[i], utils.load_database_atmosphere(altitudes[i], ground_ranges[i], 1))
+
+    @pytest.mark.parametrize(
+        ("ihaze", "altitudes", "ground_ranges"),
+        [
+            (1, [1000.0, 999.0], [0.0, 0.0]),
+            (1, [1000.0, 1000.0], [0.0, 1001.0]),
+            (2, [1000.0], [0.0]),
+            ([1, 2], [1000.0, 1000.0], [0.0, 0.0]),
+        ],
+    )
+    def test_index_error(self, database: np.ndarray, ihaze: int, altitudes: list, ground_ranges: list) -> None:
+        """Cover points outside of the grid and missing database atmospheres."""
+        with pytest.raises(IndexError):
+            utils.load_database_atmosphere_batch(np.array(altitudes), np.array(ground_ranges), ihaze)
@@ -269,3 +269,17 @@ class TestSensor:
         """Check if created sensor matches expected parameters."""
         sensor = Sensor(name, d, f, p_x, opt_trans_wavelengths)
         self.check_sensor(sensor, name, d, f, p_x, opt_trans_wavelengths)
+
+    def test_fingerprint(self) -> None:
+        """Check that the fingerprint ignores the name and tracks every other attribute."""
+        sensor = self.create_default_sensor()
+        other = self.create_default_sensor()
+        other.name = "other"
+        assert sensor.fingerprint() == other.fingerprint()
+
+        other.pv = 0.1
+        assert sensor.fingerprint() != other.fingerprint()
+
+        other = self.create_default_sensor()
+        other.filter_kernel = np.array([[1.0]])
+        assert sensor.fingerprint() != other.fingerprint()
@@ -48,7 +48,7 @@ class TestRefImage:
         output = ref_image.estimate_capture_parameters(altitude)
         assert output == snapshot
 
-    @mock.patch("pybsm.simulation.ref_image.plt")
+    @mock.patch("matplotlib.pyplot")
     def test_show_method(self, mock_plt: mock.MagicMock, snapshot: SnapshotAssertion) -> None:
         img = plt.imread(IMAGE_PATH)
         gsd = 3.19 / 160.0
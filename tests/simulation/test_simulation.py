@@ -1,7 +1,10 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
 import numpy as np
 import pytest
 
-from pybsm import simulation
+from pybsm import otf, simulation, utils
 
 
 class TestSimulation:
@@ -62,3 +65,215 @@ class TestSimulation:
         """Test img_to_reflectance with normal inputs and expected outputs."""
         output = simulation.img_to_reflectance(img, pix_values, refl_values)
         assert np.isclose(output, expected).all()
+
+    @pytest.mark.usefixtures("synthetic_atmosphere")
+    def test_simulate_image_otf_cache(
+        self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path, sensor: simulation.Sensor, scenario: simulation.Scenario
+    ) -> None:
+        """Check that the OTF and blur kernel are reused, including from the disk store."""
+        monkeypatch.setattr(simulation.functional, "_otf_cache", utils.LRUCache(2**30, disk_dir=str(tmp_path)))
+
+        ref_img = simulation.RefImage(np.tile(np.arange(64.0), (64, 1)), gsd=0.005)
+
+        _, blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario)
+        simulation.clear_otf_cache()
+        sensor.name = "renamed"
+        _, cached_blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario)
+        assert simulation.otf_cache_info()["disk_hits"] == 2
+        assert np.array_equal(blur_img, cached_blur_img)
+
+        simulation.simulate_image(ref_img, sensor, scenario)
+        assert simulation.otf_cache_info()["hits"] == 2
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_images(self, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that batched simulation of a generator and of an array matches simulate_image."""
+        imgs = np.stack([np.tile(np.arange(64.0), (64, 1)), np.tile(np.arange(64.0)[:, None], (1, 64))])
+        pix_values = np.array([0.0, 63.0])
+        refl_values = np.array([0.05, 0.5])
+        ref_imgs = [simulation.RefImage(img, 0.005, pix_values, refl_values) for img in imgs]
+
+        np.random.seed(0)
+        expected = [simulation.simulate_image(ref_img, sensor, scenario) for ref_img in ref_imgs]
+
+        np.random.seed(0)
+        results = list(simulation.simulate_images(iter(ref_imgs), sensor, scenario))
+        assert len(results) == len(expected)
+        for n in range(len(expected)):
+            for i in range(3):
+                assert np.array_equal(results[n][i], expected[n][i])
+
+        np.random.seed(0)
+        stacks = simulation.simulate_images(imgs, sensor, scenario, gsd=0.005, pix_values=pix_values,
+                                            refl_values=refl_values)
+        for n in range(len(expected)):
+            for i in range(3):
+                assert np.array_equal(stacks[i][n], expected[n][i])
+
+    @pytest.mark.parametrize(
+        ("imgs", "gsd"),
+        [
+            (np.zeros((4, 4)), 0.005),
+            (np.zeros((1, 4, 4)), None),
+        ],
+    )
+    def test_simulate_images_value_error(
+        self, imgs: np.ndarray, gsd: Optional[float], sensor: simulation.Sensor, scenario: simulation.Scenario
+    ) -> None:
+        """Cover cases where ValueError occurs."""
+        with pytest.raises(ValueError):  # noqa: PT011
+            simulation.simulate_images(imgs, sensor, scenario, gsd=gsd)
+
+    @pytest.mark.parametrize("gsd", [0.005, 0.05, 0.5])
+    @pytest.mark.usefixtures("synthetic_atmosphere")
+    def test_otf_grid(self, gsd: float, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that the OTF grid is odd, bounded and spans a whole, odd number of reference pixels."""
+        wavelengths = 1e-6 * np.linspace(0.5, 0.66, 17)
+        ref_ifov = 2 * np.arctan(gsd / 2 / 9000.0)
+
+        n, df = simulation.otf_grid(sensor, scenario, wavelengths, ref_ifov, 9000.0)
+        assert n % 2 == 1
+        assert simulation.otf_grid_min_size <= n <= simulation.otf_grid_max_size
+        m = 1.0 / (df * ref_ifov)
+        assert np.isclose(m, np.round(m))
+        assert np.round(m) % 2 == 1
+        # the grid reaches the smaller of the cutoff and the reference Nyquist
+        extent = min(sensor.D / wavelengths.min(), 0.5 / ref_ifov)
+        assert df * (n // 2) >= extent * (1.0 - 1e-9)
+
+        n_fine, _ = simulation.otf_grid(sensor, scenario, wavelengths, ref_ifov, 9000.0, tol=1e-4)
+        assert n_fine >= n
+
+        n, df = simulation.otf_grid(sensor, scenario, wavelengths, ref_ifov, 9000.0, size=100)
+        assert n == 101
+        assert np.isclose(df * 50, extent)
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_image_otf_tol(self, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that the default OTF grid blurs like a much finer one."""
+        rng = np.random.default_rng(0)
+        ref_img = simulation.RefImage(rng.random((128, 128)), gsd=0.005)
+
+        _, blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario)
+        _, fine_blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario, otf_tol=1e-4)
+        assert blur_img.shape == fine_blur_img.shape
+        assert np.abs(blur_img - fine_blur_img).max() < 1e-2 * np.ptp(fine_blur_img)
+
+    @pytest.mark.parametrize(
+        ("shape", "gsd", "tile_size"),
+        [
+            ((96, 128), 0.005, 32),
+            ((77, 90), 0.007, 1024),
+            ((64, 64, 3), 0.004, 20),
+        ],
+    )
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_image_tiled(
+        self,
+        tmp_path: Path,
+        shape: Tuple[int, ...],
+        gsd: float,
+        tile_size: int,
+        sensor: simulation.Sensor,
+        scenario: simulation.Scenario,
+    ) -> None:
+        """Check that tiled simulation of a memory-mapped image is seamless against simulate_image."""
+        rng = np.random.default_rng(0)
+        np.save(tmp_path / "ref.npy", (255 * rng.random(shape)).astype(np.uint8))
+        img = np.load(tmp_path / "ref.npy", mmap_mode="r")
+        pix_values = np.array([0.0, 255.0])
+        refl_values = np.array([0.05, 0.95])
+        ref_img = simulation.RefImage(img, gsd, pix_values, refl_values)
+
+        true_img, blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario)
+        results = simulation.simulate_image_tiled(ref_img, sensor, scenario, out_dir=str(tmp_path), tile_size=tile_size)
+        for result in results:
+            assert isinstance(result, np.memmap)
+        assert np.array_equal(results[0], true_img)
+        assert np.allclose(results[1], blur_img, rtol=1e-12, atol=0.0)
+        assert results[2].shape == blur_img.shape
+        assert np.array_equal(np.load(tmp_path / "blur_img.npy"), results[1])
+
+        in_memory = simulation.simulate_image_tiled(ref_img, sensor, scenario, tile_size=tile_size)
+        assert not isinstance(in_memory[1], np.memmap)
+        assert np.array_equal(in_memory[1], results[1])
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_image_rng(self, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that noise drawn from a seed is reproducible, with independent streams per image and tile."""
+        rng = np.random.default_rng(0)
+        imgs = rng.random((3, 64, 64))
+        ref_imgs = [simulation.RefImage(img, 0.005) for img in imgs]
+
+        _, blur_img, noisy_img = simulation.simulate_image(ref_imgs[0], sensor, scenario, rng=1)
+        assert np.array_equal(simulation.simulate_image(ref_imgs[0], sensor, scenario, rng=1)[2], noisy_img)
+        assert not np.array_equal(simulation.simulate_image(ref_imgs[0], sensor, scenario, rng=2)[2], noisy_img)
+        fast = simulation.simulate_image(ref_imgs[0], sensor, scenario, rng=1, gaussian_threshold=0.0)[2]
+        assert fast.shape == noisy_img.shape
+        # the Gaussian approximation has the mean and variance of the exact noise
+        assert np.abs((fast - blur_img).mean()) < 4 * (fast - blur_img).std() / np.sqrt(fast.size)
+        assert np.isclose((fast - blur_img).var(), (noisy_img - blur_img).var(), rtol=0.2)
+
+        results = list(simulation.simulate_images(iter(ref_imgs), sensor, scenario, rng=1))
+        stacks = simulation.simulate_images(imgs, sensor, scenario, gsd=0.005, rng=np.random.SeedSequence(1))
+        for n in range(len(ref_imgs)):
+            assert np.array_equal(stacks[2][n], results[n][2])
+        # the same blurred image gets a different stream in every position
+        same = list(simulation.simulate_images([ref_imgs[0]] * 2, sensor, scenario, rng=1))
+        assert not np.array_equal(same[0][2], same[1][2])
+
+        tiled = [
+            simulation.simulate_image_tiled(ref_imgs[0], sensor, scenario, tile_size=16, rng=np.random.default_rng(3))
+            for _ in range(2)
+        ]
+        assert np.array_equal(tiled[0][2], tiled[1][2])
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_frames(self, sensor: simulation.Sensor, scenario: simulation.Scenario) -> None:
+        """Check that frames share the blurred image, have independent noise, and reduce to the right statistics."""
+        sensor.frame_stacks = 4
+        ref_img = simulation.RefImage(np.random.default_rng(0).random((96, 96)), gsd=0.005)
+
+        np.random.seed(0)
+        true_img, blur_img, noisy_img = simulation.simulate_image(ref_img, sensor, scenario)
+        np.random.seed(0)
+        results = simulation.simulate_frames(ref_img, sensor, scenario)
+        assert np.array_equal(results[0], true_img)
+        assert np.array_equal(results[1], blur_img)
+        assert results[2].shape == (4,) + blur_img.shape
+        assert np.array_equal(results[2][0], noisy_img)
+        assert not np.array_equal(results[2][1], results[2][0])
+
+        frames = simulation.simulate_frames(ref_img, sensor, scenario, n_frames=3, rng=0)[2]
+        assert np.array_equal(simulation.simulate_frames(ref_img, sensor, scenario, n_frames=5, rng=0)[2][:3], frames)
+
+        g_noise = simulation.functional._Simulation(sensor, scenario).g_noise
+        frame_sum = simulation.simulate_frames(ref_img, sensor, scenario, n_frames=10, reduction="sum", rng=1)[2]
+        assert frame_sum.shape == blur_img.shape
+        residual = (frame_sum - 10 * blur_img) / np.sqrt(10 * (blur_img + g_noise**2))
+        assert np.abs(residual.mean()) < 4 / np.sqrt(residual.size)
+        assert np.isclose(residual.std(), 1.0, atol=0.1)
+        frame_mean = simulation.simulate_frames(ref_img, sensor, scenario, n_frames=10, reduction="mean", rng=1)[2]
+        assert np.allclose(frame_mean, frame_sum / 10, rtol=1e-15, atol=0.0)
+
+        with pytest.raises(ValueError, match="Unknown frame reduction"):
+            simulation.simulate_frames(ref_img, sensor, scenario, reduction="median")
+        with pytest.raises(ValueError, match="n_frames"):
+            simulation.simulate_frames(ref_img, sensor, scenario, n_frames=0)
+
+    @pytest.mark.usefixtures("synthetic_atmosphere", "isolated_otf_cache")
+    def test_simulate_image_workers(
+        self, monkeypatch: pytest.MonkeyPatch, sensor: simulation.Sensor, scenario: simulation.Scenario
+    ) -> None:
+        """Check that threaded blurring does not depend on the number of workers and matches the whole image."""
+        monkeypatch.setattr(otf.functional, "filter_tile_size", 40)
+
+        rng = np.random.default_rng(0)
+        ref_img = simulation.RefImage(rng.random((150, 170)), gsd=0.005)
+
+        true_img, blur_img, _ = simulation.simulate_image(ref_img, sensor, scenario)
+        serial = simulation.simulate_image(ref_img, sensor, scenario, workers=1)
+        threaded = simulation.simulate_image(ref_img, sensor, scenario, workers=3)
+        assert np.array_equal(serial[0], true_img)
+        assert np.array_equal(threaded[1], serial[1])
+        assert np.allclose(serial[1], blur_img, rtol=1e-12, atol=0.0)
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+import pytest
+
+import pybsm
+
+
+@pytest.mark.parametrize("module", ["pybsm", "pybsm.metrics", "pybsm.otf", "pybsm.simulation"])
+def test_import_is_lightweight(module: str) -> None:
+    """Check that importing pyBSM does not import the slow optional and packaging modules."""
+    code = (
+        "import sys\n"
+        f"import {module}\n"
+        "slow = ('matplotlib', 'cv2', 'pkg_resources', 'importlib.metadata')\n"
+        "print(' '.join(m for m in slow if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+
+def test_version() -> None:
+    """Check that the version is looked up on first access."""
+    from importlib.metadata import version
+
+    assert pybsm.__version__ == version("pybsm")
+    with pytest.raises(AttributeError):
+        pybsm.__not_an_attribute__  # noqa: B018